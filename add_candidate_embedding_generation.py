@@ -0,0 +1,31 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_candidate_embedding_generation():
+    """Add the change counter that keeps refreshes from overwriting newer profile edits"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE candidate_embedding
+                ADD COLUMN IF NOT EXISTS generation INTEGER NOT NULL DEFAULT 0;
+            '''))
+            db.session.commit()
+            logger.info("Successfully added candidate embedding generation column")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding candidate embedding generation column: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_candidate_embedding_generation()
@@ -0,0 +1,37 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_candidate_embedding_staging():
+    """Add the table embeddings for a pending vectorizer version are staged in"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS candidate_embedding_staging (
+                    user_id INTEGER PRIMARY KEY REFERENCES "user" (id) ON DELETE CASCADE,
+                    model_version VARCHAR(40) NOT NULL,
+                    source_hash VARCHAR(64) NOT NULL,
+                    vector JSON NOT NULL,
+                    skills JSON,
+                    generation INTEGER NOT NULL DEFAULT 0
+                );
+            '''))
+            db.session.commit()
+            logger.info("Successfully added candidate embedding staging table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding candidate embedding staging table: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_candidate_embedding_staging()
@@ -0,0 +1,32 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_edit_decision_columns():
+    """Add the per-video edit decision list and render cache columns"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE video
+                ADD COLUMN IF NOT EXISTS edit_decisions JSON,
+                ADD COLUMN IF NOT EXISTS render_cache JSON;
+            '''))
+            db.session.commit()
+            logger.info("Successfully added edit decision columns to video table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding edit decision columns: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_edit_decision_columns()
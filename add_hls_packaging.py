@@ -0,0 +1,32 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_hls_columns():
+    """Add columns for the kept original upload and the HLS master playlist"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE video
+                ADD COLUMN IF NOT EXISTS original_filename VARCHAR(255),
+                ADD COLUMN IF NOT EXISTS hls_manifest VARCHAR(255);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added HLS columns to video table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding HLS columns: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_hls_columns()
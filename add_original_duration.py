@@ -0,0 +1,33 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_original_duration():
+    """Add the original upload's duration, backfilled for videos that were never edited"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE video ADD COLUMN IF NOT EXISTS original_duration FLOAT;
+                UPDATE video SET original_duration = duration
+                WHERE original_duration IS NULL
+                  AND (original_filename IS NULL OR original_filename = filename);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added original duration column to video table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding original duration column: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_original_duration()
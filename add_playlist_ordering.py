@@ -0,0 +1,58 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+POSITION_GAP = 1024
+
+def add_playlist_ordering():
+    """Deduplicate playlist entries, space positions out and add the ordering constraints"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                DELETE FROM playlist_video duplicate
+                USING playlist_video kept
+                WHERE duplicate.playlist_id = kept.playlist_id
+                  AND duplicate.video_id = kept.video_id
+                  AND duplicate.id > kept.id;
+            '''))
+            db.session.execute(text('''
+                UPDATE playlist_video
+                SET position = ranked.slot * :gap
+                FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY position, id) AS slot
+                    FROM playlist_video
+                ) AS ranked
+                WHERE playlist_video.id = ranked.id;
+            '''), {'gap': POSITION_GAP})
+            db.session.execute(text('''
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_constraint WHERE conname = 'uq_playlist_video_playlist_video'
+                    ) THEN
+                        ALTER TABLE playlist_video
+                        ADD CONSTRAINT uq_playlist_video_playlist_video UNIQUE (playlist_id, video_id);
+                    END IF;
+                END $$;
+                CREATE INDEX IF NOT EXISTS idx_playlist_video_playlist_position ON playlist_video(playlist_id, position);
+                DROP INDEX IF EXISTS idx_playlist_video_position;
+            '''))
+            db.session.commit()
+            logger.info("Successfully added playlist ordering constraints")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding playlist ordering constraints: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_playlist_ordering()
@@ -0,0 +1,33 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_playlist_version():
+    """Add the playlist version counter that keys the shared playlist page cache"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE playlist
+                ADD COLUMN IF NOT EXISTS view_count INTEGER DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS share_token VARCHAR(64) UNIQUE,
+                ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+            '''))
+            db.session.commit()
+            logger.info("Successfully added playlist version column")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding playlist version column: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_playlist_version()
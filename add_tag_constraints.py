@@ -0,0 +1,54 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_tag_constraints():
+    """Merge duplicate tag names and add the unique indexes the batched tag upserts rely on"""
+    try:
+        with app.app_context():
+            # Point associations of duplicate tags at the oldest tag of that name, then drop the duplicates
+            db.session.execute(text('''
+                CREATE TEMP TABLE tag_merge ON COMMIT DROP AS
+                SELECT tag.id AS duplicate_id, keeper.id AS keeper_id
+                FROM tag
+                JOIN (SELECT lower(name) AS name, MIN(id) AS id FROM tag GROUP BY lower(name)) AS keeper
+                  ON lower(tag.name) = keeper.name AND tag.id <> keeper.id;
+
+                INSERT INTO video_tag (video_id, tag_id, ai_suggested, confidence_score, created_at)
+                SELECT video_tag.video_id, tag_merge.keeper_id, video_tag.ai_suggested,
+                       video_tag.confidence_score, video_tag.created_at
+                FROM video_tag JOIN tag_merge ON video_tag.tag_id = tag_merge.duplicate_id
+                ON CONFLICT DO NOTHING;
+
+                INSERT INTO playlist_tag (playlist_id, tag_id, created_at)
+                SELECT playlist_tag.playlist_id, tag_merge.keeper_id, playlist_tag.created_at
+                FROM playlist_tag JOIN tag_merge ON playlist_tag.tag_id = tag_merge.duplicate_id
+                ON CONFLICT DO NOTHING;
+
+                DELETE FROM tag USING tag_merge WHERE tag.id = tag_merge.duplicate_id;
+
+                UPDATE tag SET name = lower(name) WHERE name <> lower(name);
+
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_tag_name ON tag (name);
+                CREATE UNIQUE INDEX IF NOT EXISTS video_tag_video_id_tag_id_key ON video_tag (video_id, tag_id);
+                CREATE UNIQUE INDEX IF NOT EXISTS playlist_tag_playlist_id_tag_id_key ON playlist_tag (playlist_id, tag_id);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added tag constraints")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding tag constraints: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_tag_constraints()
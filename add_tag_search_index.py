@@ -0,0 +1,32 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_tag_search_index():
+    """Add prefix and trigram indexes for tag name search"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                CREATE INDEX IF NOT EXISTS idx_tag_name_prefix ON tag (name text_pattern_ops);
+                CREATE INDEX IF NOT EXISTS idx_tag_name_trgm ON tag USING gin (name gin_trgm_ops);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added tag search indexes")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding tag search indexes: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_tag_search_index()
@@ -0,0 +1,30 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_thumbnail_index():
+    """Index video.thumbnail for thumbnail filename lookups"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                CREATE INDEX IF NOT EXISTS ix_video_thumbnail ON video(thumbnail);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added thumbnail index to video table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding thumbnail index: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_thumbnail_index()
@@ -0,0 +1,33 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_upload_expiry():
+    """Add an expiry time to chunked uploads, backfilled from their last activity"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE video_upload ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP;
+                UPDATE video_upload SET expires_at = COALESCE(updated_at, created_at, NOW()) + INTERVAL '24 hours'
+                WHERE expires_at IS NULL;
+                CREATE INDEX IF NOT EXISTS idx_video_upload_expires ON video_upload (expires_at);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added expiry column to video_upload table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding upload expiry column: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_upload_expiry()
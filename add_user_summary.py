@@ -0,0 +1,40 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_user_summary():
+    """Add the materialized per-user summary table and the message receiver index"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS user_summary (
+                    user_id INTEGER PRIMARY KEY REFERENCES "user" (id) ON DELETE CASCADE,
+                    video_count INTEGER NOT NULL DEFAULT 0,
+                    total_views INTEGER NOT NULL DEFAULT 0,
+                    total_likes INTEGER NOT NULL DEFAULT 0,
+                    playlist_count INTEGER NOT NULL DEFAULT 0,
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    unread_message_count INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_message_receiver_read ON message(receiver_id, read);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added user summary table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding user summary table: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_user_summary()
@@ -0,0 +1,51 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_video_jobs():
+    """Add the background job queue table and video processing status"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE video
+                ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'ready';
+            '''))
+
+            db.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS video_job (
+                    id SERIAL PRIMARY KEY,
+                    video_id INTEGER NOT NULL REFERENCES video(id) ON DELETE CASCADE,
+                    job_type VARCHAR(30) NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    payload JSON,
+                    result JSON,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    progress FLOAT DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_video_job_status_created ON video_job(status, created_at);
+                CREATE INDEX IF NOT EXISTS idx_video_job_video ON video_job(video_id);
+            '''))
+
+            db.session.commit()
+            logger.info("Successfully added video job queue table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding video job queue table: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_video_jobs()
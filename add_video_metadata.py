@@ -0,0 +1,36 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_video_metadata_columns():
+    """Add ffprobe metadata columns to the video table"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                ALTER TABLE video
+                ADD COLUMN IF NOT EXISTS duration FLOAT,
+                ADD COLUMN IF NOT EXISTS width INTEGER,
+                ADD COLUMN IF NOT EXISTS height INTEGER,
+                ADD COLUMN IF NOT EXISTS codec VARCHAR(30),
+                ADD COLUMN IF NOT EXISTS bitrate BIGINT,
+                ADD COLUMN IF NOT EXISTS container VARCHAR(50);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added metadata columns to video table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding video metadata columns: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_video_metadata_columns()
@@ -0,0 +1,45 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_video_uploads():
+    """Add the table tracking resumable chunked uploads"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS video_upload (
+                    id VARCHAR(36) PRIMARY KEY,
+                    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+                    filename VARCHAR(255) NOT NULL,
+                    original_filename VARCHAR(255) NOT NULL,
+                    total_size BIGINT NOT NULL,
+                    "offset" BIGINT NOT NULL DEFAULT 0,
+                    title VARCHAR(100) NOT NULL,
+                    description TEXT,
+                    script_content TEXT,
+                    status VARCHAR(20) NOT NULL DEFAULT 'uploading',
+                    video_id INTEGER REFERENCES video(id) ON DELETE SET NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_video_upload_user ON video_upload(user_id);
+            '''))
+            db.session.commit()
+            logger.info("Successfully added video upload table")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding video upload table: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_video_uploads()
@@ -0,0 +1,64 @@
+from flask import Flask
+from extensions import db
+from sqlalchemy import text
+import logging
+import os
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+db.init_app(app)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_view_stats_tables():
+    """Add the view event log, daily rollup table and rollup watermark"""
+    try:
+        with app.app_context():
+            db.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS video_view_event (
+                    id BIGSERIAL PRIMARY KEY,
+                    video_id INTEGER NOT NULL,
+                    viewer_type VARCHAR(20) NOT NULL,
+                    viewer_id INTEGER,
+                    viewed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_video_view_event_viewed_at
+                    ON video_view_event USING BRIN (viewed_at);
+            '''))
+
+            db.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS video_daily_stats (
+                    video_id INTEGER NOT NULL REFERENCES video(id) ON DELETE CASCADE,
+                    day DATE NOT NULL,
+                    owner_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+                    views INTEGER NOT NULL DEFAULT 0,
+                    employer_views INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (video_id, day)
+                );
+                CREATE INDEX IF NOT EXISTS idx_video_daily_stats_owner_day ON video_daily_stats(owner_id, day);
+            '''))
+
+            db.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS stats_rollup_state (
+                    name VARCHAR(50) PRIMARY KEY,
+                    last_event_id BIGINT NOT NULL DEFAULT 0,
+                    last_rebuilt_day DATE,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            '''))
+
+            db.session.execute(text('''
+                CREATE INDEX IF NOT EXISTS idx_video_user_views ON video(user_id, views DESC);
+            '''))
+
+            db.session.commit()
+            logger.info("Successfully added view stats tables")
+            return True
+    except Exception as e:
+        logger.error(f"Error adding view stats tables: {str(e)}")
+        db.session.rollback()
+        return False
+
+if __name__ == "__main__":
+    add_view_stats_tables()
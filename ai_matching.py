@@ -1,6 +1,18 @@
 """
 AI-powered talent matching service for connecting employers with suitable candidates.
 Uses scikit-learn for text vectorization and similarity scoring.
+
+Candidate vectors are not built per match: they live in the candidate
+embedding store (``candidate_embeddings.py``) and are refreshed in the
+background when a profile changes. A job is scored against all of them at
+once by ``match_scoring.py``.
+
+The vectorizer is fitted on the platform's corpus and loaded from disk (see
+``matching_model.py``). The three-sentence seed fit is only used until a
+model has been saved.
+
+"Candidates like this job / like this candidate" lookups go through the
+approximate nearest-neighbour index in ``candidate_index.py``.
 """
 
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -11,17 +23,29 @@ from typing import List, Dict, Tuple, Optional
 import logging
 from models import User, JobPosting, CandidateMatch, Video, Tag
 from extensions import db
+from candidate_embeddings import load_vectors, promote_staged, refresh_embeddings, stage_embeddings
+from match_scoring import MATCH_LIMIT, candidate_matrix, save_matches, score_job
+from candidate_index import DEFAULT_K, candidate_index
+from matching_model import (MODEL_CHECK_INTERVAL, clear_pending, current_version, fit_and_save, load_model,
+                            pending_version, refit_due, set_current)
 import importlib
+import time
 
 # Enhanced logging setup
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Version of the fallback vectorizer used before a corpus model has been saved.
+# Stored embeddings from any other version than the loaded one are recomputed.
+SEED_MODEL_VERSION = 'seed-1'
+
 class TalentMatchingService:
     def __init__(self):
         """Initialize the service with enhanced error handling and dependency checks"""
         self.is_initialized = False
         self.vectorizer = None
+        self.model_version = SEED_MODEL_VERSION
+        self._checked_at = 0.0
         logger.info("TalentMatchingService instance created")
 
     def _check_dependencies(self) -> bool:
@@ -48,7 +72,12 @@ class TalentMatchingService:
             if not self._check_dependencies():
                 raise RuntimeError("Required dependencies not available")
 
-            # Initialize vectorizer
+            if self._load_saved_model():
+                self.is_initialized = True
+                logger.info(f"TalentMatchingService initialized with model {self.model_version}")
+                return True
+
+            # No saved model yet: fall back to the seed vectorizer
             self.vectorizer = TfidfVectorizer(
                 max_features=1000,
                 stop_words='english',
@@ -62,6 +91,7 @@ class TalentMatchingService:
                 "data analysis statistics machine learning"
             ]
             self.vectorizer.fit(sample_text)
+            self.model_version = SEED_MODEL_VERSION
 
             # Verify transformation works
             test_transform = self.vectorizer.transform(["test text"])
@@ -77,80 +107,97 @@ class TalentMatchingService:
             logger.error(f"Failed to initialize TalentMatchingService: {str(e)}", exc_info=True)
             return False
 
+    def _load_saved_model(self, version: Optional[str] = None) -> bool:
+        """Switch to a saved corpus model (default: the current one); False if there is none"""
+        self._checked_at = time.monotonic()
+        loaded = load_model(version)
+        if loaded is None:
+            return False
+        self.model_version, self.vectorizer = loaded
+        return True
+
     def _ensure_initialized(self) -> bool:
-        """Ensure service is initialized before use"""
+        """Ensure service is initialized before use, picking up models saved by other processes"""
         if not self.is_initialized:
             return self.initialize()
+        if time.monotonic() - self._checked_at > MODEL_CHECK_INTERVAL:
+            self._checked_at = time.monotonic()
+            try:
+                version = current_version()
+                if version is not None and version != self.model_version:
+                    self._load_saved_model(version)
+                    logger.info(f"Switched to matching model {version}")
+            except Exception as e:
+                logger.error(f"Error loading matching model: {str(e)}")
         return True
 
+    def vectorize(self, texts: List[str]):
+        """Sparse TF-IDF rows for many texts in one call"""
+        if not self._ensure_initialized():
+            raise RuntimeError("TalentMatchingService is not initialized")
+        return self.vectorizer.transform(texts)
+
+    def refresh_embeddings(self, candidate_ids: Optional[List[int]] = None) -> int:
+        """Recompute stored embeddings that are missing, stale or from an older vectorizer"""
+        if not self._ensure_initialized():
+            return 0
+        try:
+            return refresh_embeddings(self.vectorize, self.model_version, candidate_ids)
+        except Exception as e:
+            logger.error(f"Error refreshing candidate embeddings: {str(e)}", exc_info=True)
+            db.session.rollback()
+            return 0
+
+    def candidate_vectors(self, candidate_ids: List[int]):
+        """Stored (ids, sparse rows, skills) for candidates; refreshing is left to the worker"""
+        return load_vectors(candidate_ids, len(self.vectorizer.vocabulary_), self.model_version)
+
     def create_candidate_profile_embedding(self, candidate: User) -> Optional[np.ndarray]:
-        """Generate embedding for a candidate's profile including videos and tags"""
+        """Stored embedding for a candidate's profile including videos and tags"""
         if not self._ensure_initialized():
             logger.error("Failed to initialize service for candidate embedding")
             return None
 
         try:
-            logger.debug(f"Creating embedding for candidate {candidate.id}")
-            profile_text = []
-
-            if candidate.first_name and candidate.last_name:
-                profile_text.append(f"{candidate.first_name} {candidate.last_name}")
-
-            for video in candidate.videos:
-                if video.title:
-                    profile_text.append(video.title)
-                if video.description:
-                    profile_text.append(video.description)
-                video_tags = [tag.name for tag in video.tags]
-                if video_tags:
-                    profile_text.append(" ".join(video_tags))
-
-            if not profile_text:
+            ids, matrix, _ = self.candidate_vectors([candidate.id])
+            if not ids or matrix[0].nnz == 0:
                 logger.warning(f"No profile text found for candidate {candidate.id}")
                 return None
-
-            combined_text = " ".join(profile_text)
-            embedding = self.vectorizer.transform([combined_text])
-            return embedding.toarray()[0]
+            return matrix[0].toarray()[0]
 
         except Exception as e:
-            logger.error(f"Error generating candidate embedding: {str(e)}", exc_info=True)
+            logger.error(f"Error loading candidate embedding: {str(e)}", exc_info=True)
             return None
 
+    def _job_text(self, job_posting: JobPosting) -> str:
+        job_text = [job_posting.title, job_posting.description]
+        if job_posting.requirements:
+            job_text.append(job_posting.requirements)
+        if job_posting.responsibilities:
+            job_text.append(job_posting.responsibilities)
+
+        # Add required and preferred skills
+        if job_posting.required_skills:
+            job_text.append(" ".join(job_posting.required_skills))
+        if job_posting.preferred_skills:
+            job_text.append(" ".join(job_posting.preferred_skills))
+        return " ".join(part for part in job_text if part)
+
+    def job_vector(self, job_posting: JobPosting):
+        """Sparse TF-IDF row for a job posting, or None if it has no text"""
+        combined_text = self._job_text(job_posting)
+        if not combined_text:
+            logger.warning(f"No job text found for posting {job_posting.id}")
+            return None
+        logger.debug(f"Generated job text of length {len(combined_text)}")
+        return self.vectorize([combined_text])
+
     def create_job_posting_embedding(self, job_posting: JobPosting) -> Optional[np.ndarray]:
         """Generate embedding for a job posting"""
         try:
-            self._ensure_initialized()
             logger.debug(f"Creating embedding for job posting {job_posting.id}")
-
-            job_text = []
-
-            # Add job information
-            job_text.append(job_posting.title)
-            job_text.append(job_posting.description)
-
-            if job_posting.requirements:
-                job_text.append(job_posting.requirements)
-            if job_posting.responsibilities:
-                job_text.append(job_posting.responsibilities)
-
-            # Add required and preferred skills
-            if job_posting.required_skills:
-                job_text.append(" ".join(job_posting.required_skills))
-            if job_posting.preferred_skills:
-                job_text.append(" ".join(job_posting.preferred_skills))
-
-            if not job_text:
-                logger.warning(f"No job text found for posting {job_posting.id}")
-                return None
-
-            # Combine all text
-            combined_text = " ".join(job_text)
-            logger.debug(f"Generated job text of length {len(combined_text)}")
-
-            # Transform the text using the fitted vectorizer
-            embedding = self.vectorizer.transform([combined_text])
-            return embedding.toarray()[0]
+            embedding = self.job_vector(job_posting)
+            return None if embedding is None else embedding.toarray()[0]
 
         except Exception as e:
             logger.error(f"Error generating job posting embedding: {str(e)}", exc_info=True)
@@ -176,18 +223,20 @@ class TalentMatchingService:
             logger.error(f"Error calculating match score: {str(e)}", exc_info=True)
             return 0.0
 
-    def analyze_skill_match(self, candidate: User, job_posting: JobPosting) -> Dict:
+    def analyze_skill_match(self, candidate: User, job_posting: JobPosting,
+                            candidate_skills: Optional[List[str]] = None) -> Dict:
         """Analyze how well candidate's skills match job requirements"""
         try:
             logger.debug(f"Analyzing skill match for candidate {candidate.id} and job {job_posting.id}")
 
-            # Collect skills from video tags
-            candidate_skills = set()
-            for video in candidate.videos:
-                candidate_skills.update(tag.name.lower() for tag in video.tags)
+            # Skills are the candidate's video tags, kept with the stored embedding
+            if candidate_skills is None:
+                _, _, skills = self.candidate_vectors([candidate.id])
+                candidate_skills = skills[0] if skills else []
+            candidate_skills = set(candidate_skills)
 
-            required_skills = set(skill.lower() for skill in job_posting.required_skills)
-            preferred_skills = set(skill.lower() for skill in job_posting.preferred_skills)
+            required_skills = set(skill.lower() for skill in job_posting.required_skills or [])
+            preferred_skills = set(skill.lower() for skill in job_posting.preferred_skills or [])
 
             # Calculate matches
             matched_required = candidate_skills.intersection(required_skills)
@@ -217,88 +266,145 @@ class TalentMatchingService:
                 'total_skill_match_percentage': 0
             }
 
-    def match_candidates_to_job(self, 
-                              job_posting: JobPosting, 
-                              candidates: List[User], 
-                              threshold: float = 0.6) -> List[Tuple[User, float, Dict]]:
-        """Find and rank matching candidates for a job posting"""
+    def match_candidates_to_job(self,
+                              job_posting: JobPosting,
+                              candidates: Optional[List[User]] = None,
+                              threshold: float = 0.6,
+                              limit: Optional[int] = MATCH_LIMIT) -> List[Tuple[User, float, Dict]]:
+        """Find and rank the best ``limit`` candidates for a job posting.
+
+        Scores the given candidates, or every stored candidate when ``candidates``
+        is None, in one sparse product (see ``match_scoring``).
+        """
         try:
-            self._ensure_initialized()
+            if not self._ensure_initialized():
+                raise RuntimeError("TalentMatchingService is not initialized")
             logger.info(f"Starting candidate matching for job {job_posting.id}")
 
-            job_embedding = self.create_job_posting_embedding(job_posting)
-            if job_embedding is None:
+            job_vector = self.job_vector(job_posting)
+            if job_vector is None:
                 raise ValueError(f"Failed to create embedding for job posting {job_posting.id}")
 
-            matches = []
-            processed_count = 0
-
-            for candidate in candidates:
-                try:
-                    # Skip if candidate is not a job seeker
-                    if candidate.user_type != 'jobseeker':
-                        continue
-
-                    # Generate candidate embedding
-                    candidate_embedding = self.create_candidate_profile_embedding(candidate)
-                    if candidate_embedding is None:
-                        logger.warning(f"Skipping candidate {candidate.id} - failed to create embedding")
-                        continue
-
-                    # Calculate match score
-                    match_score = self.calculate_match_score(candidate_embedding, job_embedding)
-
-                    # Only include matches above threshold
-                    if match_score >= threshold:
-                        # Analyze skill matches
-                        skill_match_details = self.analyze_skill_match(candidate, job_posting)
-
-                        try:
-                            # Create or update CandidateMatch record
-                            match_record = CandidateMatch.query.filter_by(
-                                job_posting_id=job_posting.id,
-                                candidate_id=candidate.id
-                            ).first()
-
-                            if match_record is None:
-                                match_record = CandidateMatch(
-                                    job_posting_id=job_posting.id,
-                                    candidate_id=candidate.id,
-                                    match_score=match_score,
-                                    skill_match_details=skill_match_details
-                                )
-                                db.session.add(match_record)
-                            else:
-                                match_record.match_score = match_score
-                                match_record.skill_match_details = skill_match_details
-                                match_record.updated_at = db.func.now()
-
-                            matches.append((candidate, match_score, skill_match_details))
-                            processed_count += 1
-
-                        except Exception as db_error:
-                            logger.error(f"Database error processing match for candidate {candidate.id}: {str(db_error)}")
-                            db.session.rollback()
-                            continue
-
-                except Exception as candidate_error:
-                    logger.error(f"Error processing candidate {candidate.id}: {str(candidate_error)}")
-                    continue
+            rows = None
+            users = {}
+            if candidates is not None:
+                users = {candidate.id: candidate for candidate in candidates if candidate.user_type == 'jobseeker'}
+            snapshot = candidate_matrix.current(self.model_version, len(self.vectorizer.vocabulary_))
+            if candidates is not None:
+                rows = snapshot.rows_for(users)
+
+            scored = score_job(
+                snapshot, job_vector,
+                [skill.lower() for skill in job_posting.required_skills or []],
+                [skill.lower() for skill in job_posting.preferred_skills or []],
+                rows=rows, limit=limit, threshold=threshold
+            )
 
             try:
+                save_matches(job_posting.id, scored)
                 db.session.commit()
-                logger.info(f"Successfully processed {processed_count} candidates for job {job_posting.id}")
+                logger.info(f"Successfully processed {len(scored)} candidates for job {job_posting.id}")
             except Exception as commit_error:
                 logger.error(f"Error committing matches to database: {str(commit_error)}")
                 db.session.rollback()
 
-            # Sort matches by score in descending order
-            matches.sort(key=lambda x: x[1], reverse=True)
-            return matches
+            missing = [candidate_id for candidate_id, _, _ in scored if candidate_id not in users]
+            if missing:
+                users.update({user.id: user for user in User.query.filter(User.id.in_(missing)).all()})
+            return [(users[candidate_id], score, details)
+                    for candidate_id, score, details in scored if candidate_id in users]
 
         except Exception as e:
             logger.error(f"Error in match_candidates_to_job: {str(e)}", exc_info=True)
             return []
 
+    def find_similar_candidates(self, vector, k: int = DEFAULT_K,
+                                exclude: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """Top-k (candidate id, score) for a query vector from the ANN index.
+
+        Falls back to exact scoring over every stored vector while no index
+        exists for the current model version.
+        """
+        exclude = exclude or []
+        results = candidate_index.search(vector, self.model_version, k=k, exclude=exclude)
+        if results is not None:
+            return results
+
+        logger.warning(f"No candidate index for model {self.model_version}, scoring exhaustively")
+        snapshot = candidate_matrix.current(self.model_version, len(self.vectorizer.vocabulary_))
+        scored = score_job(snapshot, vector, [], [], limit=k + len(exclude), threshold=-1.0)
+        return [(candidate_id, score) for candidate_id, score, _ in scored if candidate_id not in exclude][:k]
+
+    def candidates_like_job(self, job_posting: JobPosting, k: int = DEFAULT_K) -> List[Tuple[int, float]]:
+        """Candidates whose profiles are closest to a job posting"""
+        try:
+            if not self._ensure_initialized():
+                return []
+            vector = self.job_vector(job_posting)
+            return [] if vector is None else self.find_similar_candidates(vector, k)
+        except Exception as e:
+            logger.error(f"Error finding candidates for job {job_posting.id}: {str(e)}", exc_info=True)
+            return []
+
+    def candidates_like_candidate(self, candidate_id: int, k: int = DEFAULT_K) -> List[Tuple[int, float]]:
+        """Candidates whose profiles are closest to another candidate's"""
+        try:
+            if not self._ensure_initialized():
+                return []
+            vector = candidate_index.vector_for(candidate_id, self.model_version)
+            if vector is None:
+                ids, matrix, _ = self.candidate_vectors([candidate_id])
+                if not ids or matrix[0].nnz == 0:
+                    return []
+                vector = matrix[0]
+            return self.find_similar_candidates(vector, k, exclude=[candidate_id])
+        except Exception as e:
+            logger.error(f"Error finding candidates like {candidate_id}: {str(e)}", exc_info=True)
+            return []
+
 # Initialize the global talent matching service
-talent_matcher = TalentMatchingService()
\ No newline at end of file
+talent_matcher = TalentMatchingService()
+
+def refresh_candidate_embeddings() -> int:
+    """Periodic task: recompute stale candidate embeddings"""
+    return talent_matcher.refresh_embeddings()
+
+def refit_matching_model(force: bool = False) -> Optional[str]:
+    """Periodic task: refit the vectorizer when the corpus changed, then stage and promote it.
+
+    Each call does one step: a corpus check and fit, or one batch of staged
+    embeddings, or the promotion that makes the new version current. Returns
+    the version that became current, if any.
+    """
+    pending = pending_version()
+    if pending is None:
+        if not force and not refit_due():
+            return None
+        version = fit_and_save(force=force)
+        if version is None or current_version() == version:
+            return version
+        pending = version
+
+    loaded = load_model(pending)
+    if loaded is None:
+        clear_pending()
+        return None
+    _, vectorizer = loaded
+    try:
+        if stage_embeddings(vectorizer.transform, pending):
+            return None
+        promote_staged(pending)
+    except Exception as e:
+        logger.error(f"Error staging embeddings for model {pending}: {str(e)}", exc_info=True)
+        db.session.rollback()
+        return None
+    set_current(pending)
+    talent_matcher._load_saved_model(pending)
+    logger.info(f"Matching model {pending} is now current")
+    return pending
+
+def sync_candidate_index() -> None:
+    """Periodic task: apply embedding changes to the ANN index, rebuilding it when due"""
+    if not talent_matcher._ensure_initialized():
+        return
+    candidate_index.sync(talent_matcher.model_version, len(talent_matcher.vectorizer.vocabulary_))
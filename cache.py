@@ -0,0 +1,131 @@
+"""Small caches shared by the blueprints.
+
+``TTLCache`` is an in-process LRU. ``RedisCache`` offers the same interface
+on a Redis-compatible server so several app processes can share entries;
+``make_cache`` picks it when ``CACHE_REDIS_URL`` is configured and the
+``redis`` package is installed, and falls back to ``TTLCache`` otherwise.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 1024) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value, computing and storing it on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+
+class RedisCache:
+    """TTLCache-compatible cache on a Redis server; values must be JSON serialisable.
+
+    Connection errors are logged and treated as misses, so a Redis outage
+    degrades to re-rendering rather than failing requests.
+    """
+
+    def __init__(self, url: str, namespace: str, ttl: float = 60.0) -> None:
+        import redis
+
+        self.ttl = ttl
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            raw = self._client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache read failed for {self.namespace}: {str(e)}")
+            return default
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        try:
+            self._client.set(self._key(key), json.dumps(value),
+                             px=int((self.ttl if ttl is None else ttl) * 1000))
+        except Exception as e:
+            logger.warning(f"Redis cache write failed for {self.namespace}: {str(e)}")
+
+    def delete(self, key: Hashable) -> None:
+        try:
+            self._client.delete(self._key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed for {self.namespace}: {str(e)}")
+
+    def clear(self) -> None:
+        try:
+            keys = list(self._client.scan_iter(match=f"{self.namespace}:*"))
+            if keys:
+                self._client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Redis cache clear failed for {self.namespace}: {str(e)}")
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value, computing and storing it on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+
+def make_cache(namespace: str, ttl: float = 60.0, max_entries: int = 1024, redis_url: Optional[str] = None):
+    """A RedisCache when a Redis URL is configured and usable, otherwise a TTLCache"""
+    redis_url = redis_url or os.environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            return RedisCache(redis_url, namespace, ttl=ttl)
+        except ImportError:
+            logger.warning("CACHE_REDIS_URL is set but the redis package is not installed; "
+                           f"using an in-process cache for {namespace}")
+    return TTLCache(ttl=ttl, max_entries=max_entries)
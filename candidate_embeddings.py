@@ -0,0 +1,334 @@
+"""Stored candidate embeddings.
+
+Each job seeker's profile text (name, video titles and descriptions, video
+tags) is vectorized once and kept in ``candidate_embedding`` along with a
+hash of the text, the vectorizer version that produced it and the
+candidate's skills. Uploads, edits, deletes, tag changes and profile
+updates call ``mark_candidates_stale`` or ``mark_video_owners_stale``. The
+video worker re-vectorizes stale rows periodically (see
+``ai_matching.refresh_candidate_embeddings``). Matching only reads the
+stored vectors.
+
+Rows whose text hash is unchanged are just marked fresh, not re-vectorized.
+
+Marking a candidate stale also bumps the row's ``generation``; a candidate
+without a row gets a placeholder row that no model version reads. A refresh
+remembers the generation it saw before reading the profile. It only writes
+where that generation is unchanged, so a change committed mid-refresh keeps
+the row stale for the next run instead of being overwritten.
+
+After a refit, ``stage_embeddings`` vectorizes candidates with the pending
+model into ``candidate_embedding_staging``, a batch at a time, while matching
+keeps using the current rows. ``promote_staged`` then swaps every staged
+vector in with one statement. Rows whose generation moved during staging are
+promoted as stale, so they are recomputed from the latest profile.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from extensions import db
+from models import CandidateEmbedding, CandidateEmbeddingStaging, Tag, User, Video, VideoTag
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_REFRESH_INTERVAL = 60  # seconds between background refreshes
+EMBEDDING_BATCH = 500  # candidates vectorized per refresh
+
+
+# Flags job seekers stale and bumps their generation; ``owners`` filters "user" u
+_MARK_STALE_SQL = '''
+    INSERT INTO candidate_embedding (user_id, model_version, source_hash, vector, skills, stale, generation)
+    SELECT u.id, '', '', '{{}}', '[]', TRUE, 1
+    FROM "user" u
+    WHERE u.user_type = 'jobseeker' AND {owners}
+    ON CONFLICT (user_id) DO UPDATE
+    SET stale = TRUE, generation = candidate_embedding.generation + 1
+'''
+
+
+def mark_candidates_stale(user_ids: Iterable[Optional[int]], in_transaction: bool = False) -> None:
+    """Flag candidates whose profile changed.
+
+    By default this runs on its own connection, after the caller has committed.
+    With ``in_transaction`` it joins the request's session instead and is
+    committed together with the caller's change.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return
+    statement = text(_MARK_STALE_SQL.format(owners='u.id = ANY(:ids)'))
+    params = {'ids': user_ids}
+    if in_transaction:
+        db.session.execute(statement, params)
+        return
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(statement, params)
+    except Exception as e:
+        logger.error(f"Error marking embeddings stale for {len(user_ids)} candidates: {str(e)}")
+
+
+def mark_video_owners_stale(video_ids: Iterable[int]) -> None:
+    """Flag the owners of videos whose tags changed"""
+    video_ids = sorted(set(video_ids))
+    if not video_ids:
+        return
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(
+                text(_MARK_STALE_SQL.format(owners='u.id IN (SELECT user_id FROM video WHERE id = ANY(:video_ids))')),
+                {'video_ids': video_ids}
+            )
+    except Exception as e:
+        logger.error(f"Error marking embeddings stale for {len(video_ids)} videos: {str(e)}")
+
+
+def due_candidates(model_version: str, user_ids: Optional[Iterable[int]] = None,
+                   limit: int = EMBEDDING_BATCH) -> Dict[int, int]:
+    """Job seekers with no embedding, a stale one, or one from another vectorizer version.
+
+    Returns {user id: generation}, 0 for candidates without a row.
+    """
+    query = db.session.query(User.id, CandidateEmbedding.generation).outerjoin(
+        CandidateEmbedding, CandidateEmbedding.user_id == User.id
+    ).filter(
+        User.user_type == 'jobseeker',
+        or_(
+            CandidateEmbedding.user_id.is_(None),
+            CandidateEmbedding.stale.is_(True),
+            CandidateEmbedding.model_version != model_version,
+        )
+    )
+    if user_ids is not None:
+        query = query.filter(User.id.in_(list(user_ids)))
+    return {user_id: generation or 0 for user_id, generation in query.order_by(User.id).limit(limit).all()}
+
+
+def profile_sources(user_ids: List[int]) -> Dict[int, Tuple[str, List[str]]]:
+    """Profile text and skills for many candidates, in three queries"""
+    if not user_ids:
+        return {}
+    names = dict(
+        (user_id, ' '.join(part for part in (first, last) if part))
+        for user_id, first, last in db.session.query(
+            User.id, User.first_name, User.last_name
+        ).filter(User.id.in_(user_ids)).all()
+    )
+
+    texts = defaultdict(list)
+    for user_id, title, description in db.session.query(
+        Video.user_id, Video.title, Video.description
+    ).filter(Video.user_id.in_(user_ids)).order_by(Video.id).all():
+        texts[user_id].extend(part for part in (title, description) if part)
+
+    skills = defaultdict(set)
+    for user_id, tag_name in db.session.query(Video.user_id, Tag.name).join(
+        VideoTag, VideoTag.video_id == Video.id
+    ).join(Tag, Tag.id == VideoTag.tag_id).filter(Video.user_id.in_(user_ids)).all():
+        skills[user_id].add(tag_name.lower())
+
+    sources = {}
+    for user_id in user_ids:
+        tag_names = sorted(skills[user_id])
+        parts = ([names[user_id]] if names.get(user_id) else []) + texts[user_id]
+        if tag_names:
+            parts.append(' '.join(tag_names))
+        sources[user_id] = (' '.join(parts), tag_names)
+    return sources
+
+
+def source_hash(profile_text: str) -> str:
+    return hashlib.sha256(profile_text.encode('utf-8')).hexdigest()
+
+
+def encode_vector(row) -> Dict:
+    """JSON form of one sparse row"""
+    row = sparse.csr_matrix(row)
+    return {'indices': row.indices.tolist(), 'values': [round(float(value), 6) for value in row.data]}
+
+
+def store_embeddings(rows: List[Dict]) -> None:
+    """Upsert embedding rows in one statement; does not commit.
+
+    Each row carries the generation its profile was read at. Rows whose
+    generation has moved on since then are left alone.
+    """
+    if not rows:
+        return
+    statement = pg_insert(CandidateEmbedding.__table__).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={column: statement.excluded[column]
+              for column in ('model_version', 'source_hash', 'vector', 'skills', 'stale', 'updated_at')},
+        where=CandidateEmbedding.__table__.c.generation == statement.excluded.generation
+    ))
+
+
+def mark_fresh(generations: Dict[int, int]) -> None:
+    """Clear ``stale`` on rows still at the given generations; does not commit"""
+    if not generations:
+        return
+    params = {}
+    rows = []
+    for index, (user_id, generation) in enumerate(sorted(generations.items())):
+        params[f"user_{index}"] = user_id
+        params[f"generation_{index}"] = generation
+        rows.append(f"(:user_{index}, :generation_{index})")
+    db.session.execute(text(f'''
+        UPDATE candidate_embedding
+        SET stale = FALSE
+        FROM (VALUES {', '.join(rows)}) AS seen(user_id, generation)
+        WHERE candidate_embedding.user_id = seen.user_id
+          AND candidate_embedding.generation = seen.generation
+    '''), params)
+
+
+def refresh_embeddings(vectorize, model_version: str, user_ids: Optional[Iterable[int]] = None,
+                       limit: int = EMBEDDING_BATCH) -> int:
+    """Re-vectorize due candidates with ``vectorize(texts) -> sparse matrix``; returns rows written"""
+    # Generations are read before the profiles, so a later change is never lost
+    due = due_candidates(model_version, user_ids, limit)
+    if not due:
+        return 0
+
+    sources = profile_sources(list(due))
+    existing = {
+        row.user_id: row for row in db.session.query(
+            CandidateEmbedding.user_id, CandidateEmbedding.source_hash, CandidateEmbedding.model_version
+        ).filter(CandidateEmbedding.user_id.in_(list(due))).all()
+    }
+
+    now = datetime.utcnow()
+    unchanged = {}
+    changed = []
+    for user_id in due:
+        profile_text, skills = sources[user_id]
+        digest = source_hash(profile_text)
+        current = existing.get(user_id)
+        if current is not None and current.source_hash == digest and current.model_version == model_version:
+            unchanged[user_id] = due[user_id]
+        else:
+            changed.append((user_id, profile_text, skills, digest))
+
+    mark_fresh(unchanged)
+
+    if changed:
+        matrix = sparse.csr_matrix(vectorize([profile_text for _, profile_text, _, _ in changed]))
+        store_embeddings([
+            {
+                'user_id': user_id,
+                'model_version': model_version,
+                'source_hash': digest,
+                'vector': encode_vector(matrix[index]),
+                'skills': skills,
+                'stale': False,
+                'generation': due[user_id],
+                'updated_at': now,
+            }
+            for index, (user_id, _, skills, digest) in enumerate(changed)
+        ])
+
+    db.session.commit()
+    logger.info(f"Refreshed {len(changed)} candidate embeddings ({len(unchanged)} unchanged)")
+    return len(changed)
+
+
+def stage_embeddings(vectorize, model_version: str, limit: int = EMBEDDING_BATCH) -> int:
+    """Vectorize the next batch of unstaged candidates with a pending model; returns rows staged"""
+    staging = CandidateEmbeddingStaging.__table__
+    # Leftovers from an abandoned pending version
+    db.session.execute(staging.delete().where(staging.c.model_version != model_version))
+
+    due = {
+        user_id: generation or 0 for user_id, generation in db.session.query(
+            User.id, CandidateEmbedding.generation
+        ).outerjoin(
+            CandidateEmbedding, CandidateEmbedding.user_id == User.id
+        ).outerjoin(
+            CandidateEmbeddingStaging, CandidateEmbeddingStaging.user_id == User.id
+        ).filter(
+            User.user_type == 'jobseeker',
+            CandidateEmbeddingStaging.user_id.is_(None),
+        ).order_by(User.id).limit(limit).all()
+    }
+    if not due:
+        db.session.commit()
+        return 0
+
+    sources = profile_sources(list(due))
+    matrix = sparse.csr_matrix(vectorize([sources[user_id][0] for user_id in due]))
+    statement = pg_insert(staging).values([
+        {
+            'user_id': user_id,
+            'model_version': model_version,
+            'source_hash': source_hash(sources[user_id][0]),
+            'vector': encode_vector(matrix[index]),
+            'skills': sources[user_id][1],
+            'generation': generation,
+        }
+        for index, (user_id, generation) in enumerate(due.items())
+    ])
+    db.session.execute(statement.on_conflict_do_nothing(index_elements=['user_id']))
+    db.session.commit()
+    logger.info(f"Staged {len(due)} candidate embeddings for model {model_version}")
+    return len(due)
+
+
+def promote_staged(model_version: str) -> int:
+    """Replace current embeddings with the staged ones in one transaction; returns rows promoted"""
+    params = {'model_version': model_version}
+    promoted = db.session.execute(text('''
+        UPDATE candidate_embedding e
+        SET model_version = s.model_version,
+            source_hash = s.source_hash,
+            vector = s.vector,
+            skills = s.skills,
+            stale = e.generation <> s.generation,
+            updated_at = now()
+        FROM candidate_embedding_staging s
+        WHERE s.user_id = e.user_id AND s.model_version = :model_version
+    '''), params).rowcount
+    promoted += db.session.execute(text('''
+        INSERT INTO candidate_embedding (user_id, model_version, source_hash, vector, skills, stale, generation, updated_at)
+        SELECT user_id, model_version, source_hash, vector, skills, FALSE, generation, now()
+        FROM candidate_embedding_staging
+        WHERE model_version = :model_version
+        ON CONFLICT (user_id) DO NOTHING
+    '''), params).rowcount
+    db.session.execute(text('DELETE FROM candidate_embedding_staging'))
+    db.session.commit()
+    logger.info(f"Promoted {promoted} staged embeddings to model {model_version}")
+    return promoted
+
+
+def load_vectors(user_ids: Optional[Iterable[int]], dimensions: int,
+                 model_version: str) -> Tuple[List[int], sparse.csr_matrix, List[List[str]]]:
+    """Stored vectors as one CSR matrix: (candidate ids, rows, skills per row)"""
+    query = db.session.query(
+        CandidateEmbedding.user_id, CandidateEmbedding.vector, CandidateEmbedding.skills
+    ).filter(CandidateEmbedding.model_version == model_version)
+    if user_ids is not None:
+        query = query.filter(CandidateEmbedding.user_id.in_(list(user_ids)))
+    rows = query.order_by(CandidateEmbedding.user_id).all()
+
+    ids, skills, indptr, indices, values = [], [], [0], [], []
+    for user_id, vector, candidate_skills in rows:
+        ids.append(user_id)
+        skills.append(candidate_skills or [])
+        indices.extend(vector.get('indices', []))
+        values.extend(vector.get('values', []))
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+        shape=(len(ids), dimensions)
+    )
+    return ids, matrix, skills
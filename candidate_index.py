@@ -0,0 +1,379 @@
+"""Approximate nearest-neighbour index over candidate embeddings.
+
+An IVF (inverted file) index built with NumPy: spherical k-means splits the
+stored TF-IDF vectors into ``n_lists`` clusters, and each candidate's vector
+is kept in its cluster's list. A query is compared with the centroids, and
+only the ``n_probe`` closest lists are scored exactly. Rows are
+L2-normalized, so every score is a cosine similarity.
+
+Changes are incremental. ``CandidateIndex.sync`` reads embedding rows written since
+the last sync into a small delta, which is scored exhaustively, and
+tombstones their old entries in the base lists. Candidates whose embedding
+row disappeared are tombstoned too. The base is rebuilt when the delta and
+tombstones grow past REBUILD_FRACTION of it, or when the vectorizer version
+changes.
+
+On disk, under INDEX_DIR:
+
+    base-<stamp>/    centroids, list offsets, ids and CSR vectors (.npy)
+    delta-<stamp>/   delta ids and CSR vectors, tombstones (.npy)
+    MANIFEST.json    the base and delta in use, the model version, the sync watermark
+
+Each directory is written completely before MANIFEST.json is replaced, and
+readers memory-map the arrays. Only the worker's maintenance process writes
+(see ``ai_matching.sync_candidate_index``). Every other process reloads when
+the manifest changes.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from extensions import db
+from models import CandidateEmbedding
+from candidate_embeddings import load_vectors
+from match_scoring import top_matches
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.environ.get('CANDIDATE_INDEX_DIR', os.path.join('instance', 'candidate_index'))
+MANIFEST_FILE = 'MANIFEST.json'
+INDEX_SYNC_INTERVAL = 60  # seconds between incremental syncs in the worker
+INDEX_CHECK_INTERVAL = 10  # seconds between readers' manifest checks
+SYNC_OVERLAP = timedelta(minutes=5)  # re-read window for rows committed out of timestamp order
+REBUILD_FRACTION = 0.2  # rebuild once delta + tombstones exceed this share of the base
+MAX_LISTS = 1024
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000  # rows used to train centroids
+DEFAULT_PROBES = 8
+DEFAULT_K = 20
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def _to_dense(vector, dimensions: int) -> np.ndarray:
+    if sparse.issparse(vector):
+        vector = vector.toarray()
+    vector = np.asarray(vector, dtype=np.float32).ravel()[:dimensions]
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _save_csr(path: str, prefix: str, matrix: sparse.csr_matrix) -> None:
+    np.save(os.path.join(path, f"{prefix}_data.npy"), matrix.data.astype(np.float32))
+    np.save(os.path.join(path, f"{prefix}_indices.npy"), matrix.indices.astype(np.int32))
+    np.save(os.path.join(path, f"{prefix}_indptr.npy"), matrix.indptr.astype(np.int64))
+
+
+def _load_csr(path: str, prefix: str, dimensions: int) -> sparse.csr_matrix:
+    arrays = [np.load(os.path.join(path, f"{prefix}_{part}.npy"), mmap_mode='r')
+              for part in ('data', 'indices', 'indptr')]
+    return sparse.csr_matrix(tuple(arrays), shape=(len(arrays[2]) - 1, dimensions), copy=False)
+
+
+def _write_dir(index_dir: str, prefix: str, write) -> str:
+    """Write a directory through a staging name, so readers never see it half-written"""
+    name = f"{prefix}-{datetime.utcnow():%Y%m%d%H%M%S%f}"
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=index_dir)
+    try:
+        write(staging)
+        os.replace(staging, os.path.join(index_dir, name))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return name
+
+
+def train_centroids(vectors: sparse.csr_matrix, n_lists: int, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of rows; returns unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(vectors.shape[0], min(vectors.shape[0], KMEANS_SAMPLE), replace=False)]
+    centroids = _normalize_rows(
+        sample[rng.choice(sample.shape[0], n_lists, replace=False)].toarray().astype(np.float32)
+    )
+    for _ in range(iterations):
+        assignment = np.asarray(sample @ centroids.T).argmax(axis=1)
+        members = sparse.csr_matrix(
+            (np.ones(len(assignment), dtype=np.float32), (assignment, np.arange(len(assignment)))),
+            shape=(n_lists, sample.shape[0])
+        )
+        sums = np.asarray((members @ sample).todense(), dtype=np.float32)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]  # a list with no members keeps its centroid
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class IvfIndex:
+    """Base lists plus delta and tombstones; immutable once loaded"""
+
+    def __init__(self, model_version: str, dimensions: int, centroids: np.ndarray, offsets: np.ndarray,
+                 ids: np.ndarray, vectors: sparse.csr_matrix, delta_ids: Optional[np.ndarray] = None,
+                 delta_vectors: Optional[sparse.csr_matrix] = None,
+                 tombstones: Optional[np.ndarray] = None) -> None:
+        self.model_version = model_version
+        self.dimensions = dimensions
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.delta_ids = delta_ids if delta_ids is not None else np.zeros(0, dtype=np.int64)
+        self.delta_vectors = (delta_vectors if delta_vectors is not None
+                              else sparse.csr_matrix((0, dimensions), dtype=np.float32))
+        self.tombstones = tombstones if tombstones is not None else np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def build(cls, model_version: str, ids: Sequence[int], vectors: sparse.csr_matrix,
+              n_lists: Optional[int] = None) -> 'IvfIndex':
+        """Cluster candidate vectors into inverted lists; rows without terms are skipped"""
+        vectors = sparse.csr_matrix(vectors, dtype=np.float32)
+        keep = np.flatnonzero(vectors.getnnz(axis=1))
+        ids = np.asarray(ids, dtype=np.int64)[keep]
+        vectors = vectors[keep]
+        dimensions = vectors.shape[1]
+        if len(ids) == 0:
+            return cls(model_version, dimensions, np.zeros((0, dimensions), dtype=np.float32),
+                       np.zeros(1, dtype=np.int64), ids, vectors)
+
+        n_lists = n_lists or min(MAX_LISTS, max(1, int(np.sqrt(len(ids)))))
+        centroids = train_centroids(vectors, min(n_lists, len(ids)))
+        assignment = np.asarray(vectors @ centroids.T).argmax(axis=1)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        return cls(model_version, dimensions, centroids, offsets, ids[order], vectors[order])
+
+    @property
+    def live_count(self) -> int:
+        base_live = len(self.ids) - int(np.isin(self.ids, self.tombstones).sum())
+        return base_live + len(self.delta_ids)
+
+    def member_ids(self) -> np.ndarray:
+        """Ids of every candidate currently in the index"""
+        base = self.ids[~np.isin(self.ids, self.tombstones)]
+        return np.union1d(base, self.delta_ids)
+
+    def vector_for(self, candidate_id: int) -> Optional[sparse.csr_matrix]:
+        """A member's indexed vector, or None"""
+        hit = np.flatnonzero(self.delta_ids == candidate_id)
+        if len(hit):
+            return self.delta_vectors[hit[0]]
+        if candidate_id in self.tombstones:
+            return None
+        hit = np.flatnonzero(self.ids == candidate_id)
+        return self.vectors[hit[0]] if len(hit) else None
+
+    def with_changes(self, ids: Sequence[int], vectors: sparse.csr_matrix,
+                     deleted: Sequence[int] = ()) -> 'IvfIndex':
+        """A new index with rows upserted into the delta and ``deleted`` removed"""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = sparse.csr_matrix(vectors, shape=(len(ids), self.dimensions), dtype=np.float32)
+        changed = np.union1d(ids, np.asarray(deleted, dtype=np.int64))
+        keep = np.flatnonzero(~np.isin(self.delta_ids, changed))
+        fresh = np.flatnonzero(vectors.getnnz(axis=1))  # rows without terms are dropped
+        delta_ids = np.concatenate([self.delta_ids[keep], ids[fresh]])
+        delta_vectors = sparse.vstack(
+            [self.delta_vectors[keep], vectors[fresh]], format='csr', dtype=np.float32
+        )
+        tombstones = np.union1d(self.tombstones, np.intersect1d(changed, self.ids))
+        return IvfIndex(self.model_version, self.dimensions, self.centroids, self.offsets, self.ids,
+                        self.vectors, delta_ids, delta_vectors, tombstones)
+
+    def needs_rebuild(self) -> bool:
+        return len(self.delta_ids) + len(self.tombstones) > REBUILD_FRACTION * max(len(self.ids), 1)
+
+    def search(self, vector, k: int = DEFAULT_K, n_probe: int = DEFAULT_PROBES,
+               exclude: Sequence[int] = ()) -> List[Tuple[int, float]]:
+        """Top-k (candidate id, cosine score) for a query vector"""
+        query = _to_dense(vector, self.dimensions)
+        ids, scores = [], []
+        if len(self.centroids):
+            closest = top_matches(self.centroids @ query, min(n_probe, len(self.centroids)), -np.inf)
+            rows = np.concatenate([np.arange(self.offsets[list_id], self.offsets[list_id + 1])
+                                   for list_id in closest])
+            base_ids = self.ids[rows]
+            live = ~np.isin(base_ids, self.tombstones)
+            ids.append(base_ids[live])
+            scores.append(self.vectors[rows[live]] @ query)
+        if len(self.delta_ids):
+            ids.append(self.delta_ids)
+            scores.append(self.delta_vectors @ query)
+        if not ids:
+            return []
+
+        ids = np.concatenate(ids)
+        scores = np.concatenate(scores).astype(np.float32)
+        if len(exclude):
+            scores[np.isin(ids, np.asarray(exclude, dtype=np.int64))] = -np.inf
+        best = top_matches(scores, k, -1.0)
+        return [(int(ids[row]), float(scores[row])) for row in best]
+
+    def save_base(self, index_dir: str) -> str:
+        def write(path):
+            np.save(os.path.join(path, 'centroids.npy'), self.centroids.astype(np.float32))
+            np.save(os.path.join(path, 'offsets.npy'), self.offsets)
+            np.save(os.path.join(path, 'ids.npy'), self.ids)
+            _save_csr(path, 'vectors', self.vectors)
+        return _write_dir(index_dir, 'base', write)
+
+    def save_delta(self, index_dir: str) -> str:
+        def write(path):
+            np.save(os.path.join(path, 'ids.npy'), self.delta_ids)
+            np.save(os.path.join(path, 'tombstones.npy'), self.tombstones)
+            _save_csr(path, 'vectors', self.delta_vectors)
+        return _write_dir(index_dir, 'delta', write)
+
+    @classmethod
+    def load(cls, index_dir: str, manifest: Dict) -> 'IvfIndex':
+        """Memory-map the base and delta a manifest names"""
+        dimensions = manifest['dimensions']
+        base = os.path.join(index_dir, manifest['base'])
+        index = cls(
+            manifest['model_version'], dimensions,
+            np.load(os.path.join(base, 'centroids.npy'), mmap_mode='r'),
+            np.load(os.path.join(base, 'offsets.npy'), mmap_mode='r'),
+            np.load(os.path.join(base, 'ids.npy'), mmap_mode='r'),
+            _load_csr(base, 'vectors', dimensions),
+        )
+        if manifest.get('delta'):
+            delta = os.path.join(index_dir, manifest['delta'])
+            index.delta_ids = np.load(os.path.join(delta, 'ids.npy'))
+            index.tombstones = np.load(os.path.join(delta, 'tombstones.npy'))
+            index.delta_vectors = sparse.csr_matrix(_load_csr(delta, 'vectors', dimensions))
+        return index
+
+
+def read_manifest(index_dir: str = INDEX_DIR) -> Optional[Dict]:
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(manifest: Dict, index_dir: str = INDEX_DIR) -> None:
+    """Point readers at a new base/delta, then delete directories nothing refers to"""
+    pointer = os.path.join(index_dir, f".{MANIFEST_FILE}.tmp")
+    with open(pointer, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(pointer, os.path.join(index_dir, MANIFEST_FILE))
+
+    in_use = {manifest['base'], manifest.get('delta')}
+    for name in os.listdir(index_dir):
+        if name.startswith(('base-', 'delta-')) and name not in in_use:
+            # Files stay readable by processes that still have them mapped
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+class CandidateIndex:
+    """Process-wide handle on the persisted index, reloaded when the manifest changes"""
+
+    def __init__(self, index_dir: str = INDEX_DIR, check_interval: float = INDEX_CHECK_INTERVAL) -> None:
+        self.index_dir = index_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index: Optional[IvfIndex] = None
+        self._manifest: Optional[Dict] = None
+        self._checked_at = 0.0
+
+    def current(self) -> Tuple[Optional[IvfIndex], Optional[Dict]]:
+        with self._lock:
+            if time.monotonic() - self._checked_at > self.check_interval:
+                self._checked_at = time.monotonic()
+                manifest = read_manifest(self.index_dir)
+                if manifest != self._manifest:
+                    try:
+                        self._index = IvfIndex.load(self.index_dir, manifest) if manifest else None
+                        self._manifest = manifest
+                    except OSError as e:
+                        # Superseded by a newer manifest while loading; retried on the next check
+                        logger.warning(f"Could not load candidate index: {str(e)}")
+            return self._index, self._manifest
+
+    def search(self, vector, model_version: str, k: int = DEFAULT_K, n_probe: int = DEFAULT_PROBES,
+               exclude: Sequence[int] = ()) -> Optional[List[Tuple[int, float]]]:
+        """Top-k (candidate id, score), or None if no index exists for ``model_version``"""
+        index, _ = self.current()
+        if index is None or index.model_version != model_version:
+            return None
+        return index.search(vector, k, n_probe, exclude)
+
+    def vector_for(self, candidate_id: int, model_version: str):
+        index, _ = self.current()
+        if index is None or index.model_version != model_version:
+            return None
+        return index.vector_for(candidate_id)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._index = None
+            self._manifest = None
+            self._checked_at = 0.0
+
+    def sync(self, model_version: str, dimensions: int) -> None:
+        """Bring the persisted index up to date with the embedding table; writer only"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._checked_at = 0.0
+        index, manifest = self.current()
+        started = datetime.utcnow()
+
+        if index is None or index.model_version != model_version or index.dimensions != dimensions:
+            self._rebuild(model_version, dimensions, started)
+            return
+
+        since = datetime.fromisoformat(manifest['watermark'])
+        changed_ids = [user_id for user_id, in db.session.query(CandidateEmbedding.user_id).filter(
+            CandidateEmbedding.model_version == model_version,
+            CandidateEmbedding.updated_at >= since,
+        ).all()]
+        ids, vectors, _ = load_vectors(changed_ids, dimensions, model_version)
+
+        stored = np.fromiter((user_id for user_id, in db.session.query(CandidateEmbedding.user_id).filter(
+            CandidateEmbedding.model_version == model_version
+        ).all()), dtype=np.int64)
+        deleted = np.setdiff1d(index.member_ids(), stored)
+
+        if not ids and not len(deleted):
+            return
+        updated = index.with_changes(ids, vectors, deleted)
+        if updated.needs_rebuild():
+            self._rebuild(model_version, dimensions, started)
+            return
+
+        self._publish({**manifest, 'delta': updated.save_delta(self.index_dir),
+                                'watermark': (started - SYNC_OVERLAP).isoformat()})
+        logger.info(f"Candidate index: {len(ids)} upserted, {len(deleted)} removed")
+
+    def _rebuild(self, model_version: str, dimensions: int, started: datetime) -> None:
+        ids, vectors, _ = load_vectors(None, dimensions, model_version)
+        index = IvfIndex.build(model_version, ids, vectors)
+        self._publish({
+            'model_version': model_version,
+            'dimensions': dimensions,
+            'base': index.save_base(self.index_dir),
+            'delta': None,
+            'watermark': (started - SYNC_OVERLAP).isoformat(),
+            'built_at': started.isoformat(),
+        })
+        logger.info(f"Rebuilt candidate index: {len(index.ids)} candidates in {len(index.centroids)} lists")
+
+    def _publish(self, manifest: Dict) -> None:
+        write_manifest(manifest, self.index_dir)
+        with self._lock:
+            self._index = IvfIndex.load(self.index_dir, manifest)
+            self._manifest = manifest
+            self._checked_at = time.monotonic()
+
+
+candidate_index = CandidateIndex()
@@ -0,0 +1,235 @@
+"""Video like and view counters.
+
+Likes are toggled with a single conditional INSERT or DELETE and the
+denormalised ``video.likes`` column is adjusted with an atomic
+``UPDATE ... SET likes = likes +/- 1``, so concurrent clicks never race and
+no click counts the ``video_like`` table.
+
+Views arrive far more often than likes, so they are buffered in-process and
+written every few seconds as one batched UPDATE of ``video.views`` plus one
+multi-row INSERT into the ``video_view_event`` log (see ``view_stats.py``).
+Shared playlist views go through the same kind of buffer into
+``playlist.view_count``. ``reconcile_like_counts`` corrects any drift
+against ``video_like`` and runs periodically from the video worker.
+"""
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from extensions import db
+from models import Video, VideoLike, VideoViewEvent
+from view_stats import invalidate_dashboard_stats
+from user_summary import refresh_user_summary
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL = 5.0  # seconds a view may wait in the buffer
+VIEW_FLUSH_THRESHOLD = 500  # pending views that force an immediate flush
+RECONCILE_INTERVAL = 15 * 60  # seconds between like count reconciliations
+
+
+def adjust_likes(video_id: int, delta: int):
+    """Atomically add ``delta`` to a video's like count; returns (likes, owner id)"""
+    return db.session.execute(
+        update(Video)
+        .where(Video.id == video_id)
+        .values(likes=func.greatest(func.coalesce(Video.likes, 0) + delta, 0))
+        .returning(Video.likes, Video.user_id)
+    ).first()
+
+
+def toggle_like(user_id: int, video_id: int) -> Tuple[bool, int]:
+    """Like or unlike a video for a user; returns (liked, like count).
+
+    Commits the session.
+    """
+    removed = db.session.execute(
+        VideoLike.__table__.delete()
+        .where(VideoLike.user_id == user_id, VideoLike.video_id == video_id)
+        .returning(VideoLike.id)
+    ).first()
+
+    if removed is not None:
+        liked, delta = False, -1
+    else:
+        inserted = db.session.execute(
+            pg_insert(VideoLike.__table__)
+            .values(user_id=user_id, video_id=video_id, created_at=func.now())
+            .on_conflict_do_nothing(constraint='uq_video_like_user_video')
+            .returning(VideoLike.id)
+        ).first()
+        # A concurrent request already inserted the like; the count is already correct
+        liked, delta = True, 1 if inserted is not None else 0
+
+    if delta:
+        likes, owner_id = adjust_likes(video_id, delta)
+    else:
+        likes, owner_id = db.session.query(Video.likes, Video.user_id).filter(Video.id == video_id).one()
+    db.session.commit()
+    invalidate_dashboard_stats([owner_id])
+    refresh_user_summary(owner_id)
+    return liked, likes or 0
+
+
+class CounterBuffer:
+    """In-process write-behind buffer of counter increments.
+
+    Increments accumulate per key and are handed to ``_write`` in one batch
+    every ``flush_interval`` seconds, or as soon as ``flush_threshold``
+    increments are waiting. Subclasses implement ``_write``.
+    """
+
+    def __init__(self, flush_interval: float = VIEW_FLUSH_INTERVAL,
+                 flush_threshold: int = VIEW_FLUSH_THRESHOLD) -> None:
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.app = None
+        self._pending: Dict[int, int] = {}
+        self._events: List[dict] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def init_app(self, app) -> None:
+        self.app = app
+        atexit.register(self.flush)
+
+    def increment(self, key: int, event: Optional[dict] = None) -> None:
+        """Count one increment; it reaches the database on the next flush"""
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            if event is not None:
+                self._events.append(event)
+            total = sum(self._pending.values())
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if total >= self.flush_threshold:
+            self.flush()
+
+    def pending(self, key: int) -> int:
+        """Increments recorded in this process but not yet flushed"""
+        with self._lock:
+            return self._pending.get(key, 0)
+
+    def flush(self) -> int:
+        """Write all buffered increments in one batch; returns the number written"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            events, self._events = self._events, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return 0
+
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    self._write(batch, events)
+            else:
+                self._write(batch, events)
+            return sum(batch.values())
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} {type(self).__name__} counters: {str(e)}")
+            # Put the increments back so the next flush retries them
+            with self._lock:
+                for key, count in batch.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+                self._events = events + self._events
+            return 0
+
+    @staticmethod
+    def _values_rows(batch: Dict[int, int]):
+        """Bind parameters and VALUES rows for a batch, in key order to avoid deadlocks"""
+        params = {}
+        rows = []
+        for index, (key, count) in enumerate(sorted(batch.items())):
+            params[f"id_{index}"] = key
+            params[f"n_{index}"] = count
+            rows.append(f"(:id_{index}, :n_{index})")
+        return params, ', '.join(rows)
+
+    def _write(self, batch: Dict[int, int], events: List[dict]) -> None:
+        raise NotImplementedError
+
+
+class ViewBuffer(CounterBuffer):
+    """Write-behind buffer for video view counts and the view event log"""
+
+    def record(self, video_id: int, viewer_type: str = 'anonymous', viewer_id: Optional[int] = None) -> None:
+        """Count a view; it reaches the database on the next flush"""
+        self.increment(video_id, {
+            'video_id': video_id,
+            'viewer_type': viewer_type,
+            'viewer_id': viewer_id,
+            'viewed_at': datetime.utcnow()
+        })
+
+    def _write(self, batch: Dict[int, int], events: List[dict]) -> None:
+        params, rows = self._values_rows(batch)
+
+        # Separate connection so a flush never commits a request's session
+        with db.engine.begin() as connection:
+            owner_ids = connection.execute(text(f'''
+                UPDATE video
+                SET views = COALESCE(video.views, 0) + batch.n
+                FROM (VALUES {rows}) AS batch(id, n)
+                WHERE video.id = batch.id
+                RETURNING video.user_id
+            '''), params).scalars().all()
+            if events:
+                connection.execute(VideoViewEvent.__table__.insert(), events)
+        invalidate_dashboard_stats(owner_ids)
+
+
+class PlaylistViewBuffer(CounterBuffer):
+    """Write-behind buffer for shared playlist view counts"""
+
+    def record(self, playlist_id: int) -> None:
+        """Count a view; it reaches the database on the next flush"""
+        self.increment(playlist_id)
+
+    def _write(self, batch: Dict[int, int], events: List[dict]) -> None:
+        params, rows = self._values_rows(batch)
+        with db.engine.begin() as connection:
+            connection.execute(text(f'''
+                UPDATE playlist
+                SET view_count = COALESCE(playlist.view_count, 0) + batch.n
+                FROM (VALUES {rows}) AS batch(id, n)
+                WHERE playlist.id = batch.id
+            '''), params)
+
+
+def reconcile_like_counts() -> int:
+    """Reset video.likes wherever it has drifted from video_like; returns rows fixed"""
+    try:
+        result = db.session.execute(text('''
+            UPDATE video
+            SET likes = actual.n
+            FROM (
+                SELECT video.id, COUNT(video_like.id) AS n
+                FROM video
+                LEFT JOIN video_like ON video_like.video_id = video.id
+                GROUP BY video.id
+            ) AS actual
+            WHERE video.id = actual.id
+              AND video.likes IS DISTINCT FROM actual.n
+        '''))
+        db.session.commit()
+        if result.rowcount:
+            logger.warning(f"Reconciled like counts for {result.rowcount} videos")
+        return result.rowcount
+    except Exception as e:
+        logger.error(f"Error reconciling like counts: {str(e)}")
+        db.session.rollback()
+        return 0
+
+
+view_buffer = ViewBuffer()
+playlist_view_buffer = PlaylistViewBuffer()
@@ -0,0 +1,40 @@
+"""Refit the talent matching vectorizer on the current corpus.
+
+The new version is saved as pending; the worker stages candidate embeddings
+for it and makes it current once every candidate has one. With --promote,
+this command does the staging itself and exits once the version is current.
+"""
+from app import create_app
+import argparse
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def fit_matching_model(promote=False):
+    """Fit and save a new model; with ``promote``, stage embeddings and switch to it now"""
+    app = create_app()
+    with app.app_context():
+        from ai_matching import refit_matching_model
+        from matching_model import current_version, pending_version
+        version = refit_matching_model(force=True)
+        while promote and version is None and pending_version() is not None:
+            version = refit_matching_model()
+        if version is None and pending_version() is None:
+            logger.error("No matching model was saved")
+            return False
+        if version is not None:
+            logger.info(f"Matching model {current_version()} is now current")
+        else:
+            logger.info(f"Matching model {pending_version()} saved; the worker will stage and promote it")
+        return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--promote', action='store_true',
+                        help='stage candidate embeddings and make the new model current before exiting')
+    args = parser.parse_args()
+    fit_matching_model(promote=args.promote)
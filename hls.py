@@ -0,0 +1,114 @@
+"""Adaptive bitrate HLS packaging.
+
+Encodes a video into a ladder of H.264/AAC renditions with one ffmpeg run
+and writes segmented HLS output plus a master playlist under ``HLS_DIR``:
+
+    static/uploads/hls/<video base name>/master.m3u8
+    static/uploads/hls/<video base name>/<rendition index>/index.m3u8
+    static/uploads/hls/<video base name>/<rendition index>/seg_000.ts ...
+
+Output is written to a temporary directory and moved into place once
+complete, so players never see a half-written ladder.
+"""
+import logging
+import os
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+HLS_DIR = 'static/uploads/hls'
+MASTER_PLAYLIST = 'master.m3u8'
+SEGMENT_SECONDS = 6
+
+# (height, video bitrate, audio bitrate)
+HLS_LADDER = [
+    (360, '800k', '96k'),
+    (720, '2800k', '128k'),
+    (1080, '5000k', '192k'),
+]
+
+
+def hls_name(video_filename):
+    """Directory name of a video's ladder, derived from its stored filename"""
+    return video_filename.rsplit('.', 1)[0]
+
+
+def manifest_path(video_filename):
+    """Manifest path relative to HLS_DIR, as stored on Video.hls_manifest"""
+    return f"{hls_name(video_filename)}/{MASTER_PLAYLIST}"
+
+
+def ladder_for(source_height):
+    """Renditions no taller than the source; the lowest rung is always produced"""
+    if not source_height:
+        return HLS_LADDER[:1]
+    rungs = [rung for rung in HLS_LADDER if rung[0] <= source_height]
+    return rungs or HLS_LADDER[:1]
+
+
+def _bufsize(bitrate):
+    return f"{int(bitrate[:-1]) * 3 // 2}k"
+
+
+def build_hls_command(video_path, output_dir, rungs, has_audio=True):
+    """Build the ffmpeg argument list for one packaging run"""
+    count = len(rungs)
+    split = f"[0:v]split={count}" + ''.join(f"[v{index}]" for index in range(count))
+    scales = [f"[v{index}]scale=-2:{height}[v{index}out]" for index, (height, _, _) in enumerate(rungs)]
+
+    command = ['ffmpeg', '-y', '-i', video_path, '-filter_complex', ';'.join([split] + scales)]
+    for index, (_, video_bitrate, audio_bitrate) in enumerate(rungs):
+        command += ['-map', f"[v{index}out]"]
+        command += [f"-b:v:{index}", video_bitrate,
+                    f"-maxrate:v:{index}", video_bitrate,
+                    f"-bufsize:v:{index}", _bufsize(video_bitrate)]
+        if has_audio:
+            command += ['-map', '0:a:0', f"-b:a:{index}", audio_bitrate]
+
+    # Keyframes forced on segment boundaries keep renditions switchable
+    command += ['-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+                '-sc_threshold', '0',
+                '-force_key_frames', f"expr:gte(t,n_forced*{SEGMENT_SECONDS})"]
+    if has_audio:
+        command += ['-c:a', 'aac', '-ac', '2']
+
+    stream_map = ' '.join(
+        f"v:{index},a:{index}" if has_audio else f"v:{index}" for index in range(count)
+    )
+    command += ['-f', 'hls',
+                '-hls_time', str(SEGMENT_SECONDS),
+                '-hls_playlist_type', 'vod',
+                '-hls_segment_filename', os.path.join(output_dir, '%v', 'seg_%03d.ts'),
+                '-master_pl_name', MASTER_PLAYLIST,
+                '-var_stream_map', stream_map,
+                os.path.join(output_dir, '%v', 'index.m3u8')]
+    return command
+
+
+def package_hls(video_path, video_filename, source_height=None, has_audio=True):
+    """Package a video into an HLS ladder and return the manifest path relative to HLS_DIR"""
+    rungs = ladder_for(source_height)
+    final_dir = os.path.join(HLS_DIR, hls_name(video_filename))
+    temp_dir = f"{final_dir}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+
+    command = build_hls_command(video_path, temp_dir, rungs, has_audio=has_audio)
+    logger.info(f"Packaging {video_path} into {len(rungs)} HLS renditions")
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0 or not os.path.exists(os.path.join(temp_dir, MASTER_PLAYLIST)):
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise RuntimeError(f"HLS packaging failed: {result.stderr.decode(errors='replace')[-2000:]}")
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(temp_dir, final_dir)
+    return manifest_path(video_filename)
+
+
+def remove_hls(manifest):
+    """Delete a packaged ladder given its stored manifest path"""
+    if not manifest:
+        return
+    directory = os.path.join(HLS_DIR, manifest.split('/', 1)[0])
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,263 @@
+"""Database-backed background job queue for video processing.
+
+Jobs live in the ``video_job`` table so no external broker is needed. Web
+requests enqueue work and return immediately; ``video_worker.py`` runs a pool
+of worker processes that claim pending jobs with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` and execute the handler registered for each job type.
+"""
+import logging
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from extensions import db
+from models import Video, VideoJob
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+VIDEO_PROCESSING = 'processing'
+VIDEO_READY = 'ready'
+VIDEO_FAILED = 'failed'
+
+# Stages run for every freshly uploaded video, in order
+INGEST_PIPELINE = ['probe', 'thumbnail', 'transcode']
+
+# Stages whose failure leaves the video unusable
+CRITICAL_JOB_TYPES = {'probe', 'transcode'}
+
+MAX_ATTEMPTS = 3
+STALE_JOB_TIMEOUT = timedelta(minutes=30)
+
+_handlers: Dict[str, Callable[[VideoJob], Optional[dict]]] = {}
+
+
+class JobError(Exception):
+    """Raised by job handlers for expected, non-retryable failures"""
+    pass
+
+
+def job_handler(job_type: str):
+    """Register a function as the handler for a job type"""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def enqueue_job(video_id: int, job_type: str, payload: Optional[dict] = None,
+                commit: bool = True) -> VideoJob:
+    """Add a pending job to the queue"""
+    job = VideoJob(
+        video_id=video_id,
+        job_type=job_type,
+        status=JOB_PENDING,
+        payload=payload or {}
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    logger.info(f"Enqueued {job_type} job for video {video_id}")
+    return job
+
+
+def enqueue_unique(video_id: int, job_type: str, payload: Optional[dict] = None) -> Optional[VideoJob]:
+    """Enqueue a job unless one of the same type is already waiting or running"""
+    existing = VideoJob.query.filter(
+        VideoJob.video_id == video_id,
+        VideoJob.job_type == job_type,
+        VideoJob.status.in_([JOB_PENDING, JOB_RUNNING])
+    ).first()
+    if existing is not None:
+        return None
+    return enqueue_job(video_id, job_type, payload=payload)
+
+
+def enqueue_pipeline(video_id: int, stages: List[str], payload: Optional[dict] = None,
+                     commit: bool = True) -> VideoJob:
+    """Enqueue the first stage of a pipeline; later stages follow on success"""
+    payload = dict(payload or {})
+    payload['next_stages'] = list(stages[1:])
+    return enqueue_job(video_id, stages[0], payload=payload, commit=commit)
+
+
+def enqueue_ingest(video: Video, commit: bool = True) -> VideoJob:
+    """Mark a newly saved video as processing and queue its ingest pipeline"""
+    video.status = VIDEO_PROCESSING
+    if video.id is None:
+        db.session.flush()
+    return enqueue_pipeline(video.id, INGEST_PIPELINE, commit=commit)
+
+
+def get_video_jobs(video_id: int) -> List[VideoJob]:
+    """Return all jobs for a video, oldest first"""
+    return VideoJob.query.filter_by(video_id=video_id).order_by(VideoJob.created_at, VideoJob.id).all()
+
+
+def claim_next_job() -> Optional[VideoJob]:
+    """Atomically claim the oldest pending job, skipping rows locked by other workers"""
+    try:
+        job = VideoJob.query.filter_by(status=JOB_PENDING)\
+            .order_by(VideoJob.created_at, VideoJob.id)\
+            .with_for_update(skip_locked=True)\
+            .first()
+        if job is None:
+            db.session.rollback()
+            return None
+
+        job.status = JOB_RUNNING
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = datetime.utcnow()
+        job.progress = 0.0
+        db.session.commit()
+        return job
+    except Exception as e:
+        logger.error(f"Error claiming job: {str(e)}")
+        db.session.rollback()
+        return None
+
+
+def update_job_progress(job: VideoJob, progress: float) -> None:
+    """Persist fractional progress (0.0 - 1.0) for a running job"""
+    try:
+        job.progress = max(0.0, min(1.0, float(progress)))
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error updating progress for job {job.id}: {str(e)}")
+        db.session.rollback()
+
+
+def run_job(job: VideoJob) -> bool:
+    """Execute a claimed job and record its outcome"""
+    handler = _handlers.get(job.job_type)
+    if handler is None:
+        _finish_job(job, JOB_FAILED, error=f"No handler registered for job type '{job.job_type}'")
+        return False
+
+    try:
+        logger.info(f"Running {job.job_type} job {job.id} for video {job.video_id} (attempt {job.attempts})")
+        result = handler(job)
+        _finish_job(job, JOB_COMPLETED, result=result,
+                    next_stages=(job.payload or {}).get('next_stages'))
+        return True
+
+    except Exception as e:
+        db.session.rollback()
+        error_message = str(e)
+        logger.error(f"Job {job.id} ({job.job_type}) failed: {error_message}\n{traceback.format_exc()}")
+
+        if not isinstance(e, JobError) and (job.attempts or 0) < MAX_ATTEMPTS:
+            job.status = JOB_PENDING
+            job.error = error_message
+            db.session.commit()
+            return False
+
+        # Non-critical stages should not stop the rest of the pipeline
+        _finish_job(job, JOB_FAILED, error=error_message,
+                    next_stages=None if job.job_type in CRITICAL_JOB_TYPES
+                    else (job.payload or {}).get('next_stages'))
+        return False
+
+    finally:
+        refresh_video_status(job.video_id)
+
+
+def _finish_job(job: VideoJob, status: str, result: Optional[dict] = None,
+                error: Optional[str] = None, next_stages: Optional[List[str]] = None) -> None:
+    """Record a job's outcome and queue the next pipeline stage in the same commit"""
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    if status == JOB_COMPLETED:
+        job.progress = 1.0
+    if next_stages:
+        enqueue_pipeline(job.video_id, next_stages, commit=False)
+    db.session.commit()
+
+
+def refresh_video_status(video_id: int) -> Optional[str]:
+    """Derive a video's processing status from its jobs"""
+    try:
+        video = Video.query.get(video_id)
+        if video is None:
+            return None
+
+        # Only ingest pipeline stages decide availability; maintenance jobs run in the background
+        jobs = [job for job in get_video_jobs(video_id) if 'next_stages' in (job.payload or {})]
+        if any(job.status in (JOB_PENDING, JOB_RUNNING) for job in jobs):
+            status = VIDEO_PROCESSING
+        elif any(job.status == JOB_FAILED and job.job_type in CRITICAL_JOB_TYPES for job in jobs):
+            status = VIDEO_FAILED
+        else:
+            status = VIDEO_READY
+
+        if video.status != status:
+            video.status = status
+            db.session.commit()
+            logger.info(f"Video {video_id} is now {status}")
+        return status
+    except Exception as e:
+        logger.error(f"Error refreshing status for video {video_id}: {str(e)}")
+        db.session.rollback()
+        return None
+
+
+def requeue_stale_jobs(timeout: timedelta = STALE_JOB_TIMEOUT) -> int:
+    """Return jobs left running by a crashed worker to the pending state"""
+    try:
+        cutoff = datetime.utcnow() - timeout
+        count = VideoJob.query.filter(
+            VideoJob.status == JOB_RUNNING,
+            VideoJob.started_at < cutoff
+        ).update({'status': JOB_PENDING}, synchronize_session=False)
+        db.session.commit()
+        if count:
+            logger.warning(f"Requeued {count} stale jobs")
+        return count
+    except Exception as e:
+        logger.error(f"Error requeueing stale jobs: {str(e)}")
+        db.session.rollback()
+        return 0
+
+
+def run_due_tasks(periodic_tasks, last_run: Dict[str, float]) -> None:
+    """Run each (interval, function) maintenance task whose interval has elapsed"""
+    now = time.monotonic()
+    for interval, task in periodic_tasks:
+        name = task.__name__
+        if now - last_run.get(name, float('-inf')) < interval:
+            continue
+        last_run[name] = now
+        try:
+            task()
+        except Exception as e:
+            logger.error(f"Periodic task {name} failed: {str(e)}")
+            db.session.rollback()
+
+
+def worker_loop(poll_interval: float = 2.0, stop_event=None, max_jobs: Optional[int] = None,
+                periodic_tasks=None) -> int:
+    """Claim and run jobs until stopped; must be called inside an app context"""
+    processed = 0
+    last_run: Dict[str, float] = {}
+    requeue_stale_jobs()
+    while stop_event is None or not stop_event.is_set():
+        if periodic_tasks:
+            run_due_tasks(periodic_tasks, last_run)
+        job = claim_next_job()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        run_job(job)
+        db.session.remove()
+        processed += 1
+        if max_jobs is not None and processed >= max_jobs:
+            break
+    return processed
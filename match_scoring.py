@@ -0,0 +1,172 @@
+"""Batch candidate scoring.
+
+A job is scored against every candidate with one sparse product. Stored
+TF-IDF rows are L2-normalized, so ``vectors @ job.T`` gives each
+candidate's cosine similarity without densifying anything. ``top_matches``
+picks the best k with ``argpartition`` and sorts only those.
+
+Skills are held as a binary candidates x skills sparse matrix. The overlap
+with a job's required and preferred skills is then one product each against
+a 0/1 mask of the job's skills, and only the returned candidates have their
+matched skill names spelled out.
+
+``candidate_matrix`` keeps the loaded matrices in-process. It reloads them
+only when the embedding table changes, i.e. when its row count or latest
+``updated_at`` moves.
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from extensions import db
+from models import CandidateEmbedding, CandidateMatch
+from candidate_embeddings import load_vectors
+
+logger = logging.getLogger(__name__)
+
+MATCH_LIMIT = 100  # candidates returned per job
+
+
+class CandidateSet:
+    """Immutable snapshot of every stored candidate vector and skill set"""
+
+    def __init__(self, ids: Sequence[int], vectors: sparse.csr_matrix, skills: List[List[str]]) -> None:
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = vectors
+        self.skill_names = sorted({skill for candidate_skills in skills for skill in candidate_skills})
+        self.skill_index = {name: index for index, name in enumerate(self.skill_names)}
+
+        indptr, indices = [0], []
+        for candidate_skills in skills:
+            indices.extend(sorted({self.skill_index[skill] for skill in candidate_skills}))
+            indptr.append(len(indices))
+        self.skills = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(self.ids), len(self.skill_names))
+        )
+
+    def rows_for(self, candidate_ids: Iterable[int]) -> np.ndarray:
+        """Row numbers of the given candidates that have a stored vector"""
+        wanted = np.unique(np.fromiter(candidate_ids, dtype=np.int64))
+        positions = np.searchsorted(self.ids, wanted)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == wanted[found]
+        return positions[found]
+
+    def skill_mask(self, names: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(len(self.skill_names), dtype=np.float32)
+        for name in names:
+            index = self.skill_index.get(name)
+            if index is not None:
+                mask[index] = 1
+        return mask
+
+    def candidate_skills(self, row: int) -> np.ndarray:
+        return self.skills.indices[self.skills.indptr[row]:self.skills.indptr[row + 1]]
+
+
+class CandidateMatrix:
+    """Process-wide candidate snapshot, reloaded when the embedding table changes"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._key = None
+        self._snapshot: Optional[CandidateSet] = None
+
+    def current(self, model_version: str, dimensions: int) -> CandidateSet:
+        count, updated_at = db.session.query(
+            func.count(CandidateEmbedding.user_id), func.max(CandidateEmbedding.updated_at)
+        ).filter(CandidateEmbedding.model_version == model_version).one()
+        key = (model_version, dimensions, count, updated_at)
+        with self._lock:
+            if key != self._key:
+                ids, vectors, skills = load_vectors(None, dimensions, model_version)
+                self._snapshot = CandidateSet(ids, vectors, skills)
+                self._key = key
+                logger.info(f"Loaded {len(ids)} candidate vectors for matching")
+            return self._snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._key = None
+            self._snapshot = None
+
+
+def top_matches(scores: np.ndarray, limit: Optional[int], threshold: float) -> np.ndarray:
+    """Indices of the ``limit`` best scores at or above ``threshold``, best first"""
+    eligible = np.flatnonzero(scores >= threshold)
+    if limit is not None and len(eligible) > limit:
+        eligible = eligible[np.argpartition(-scores[eligible], limit - 1)[:limit]]
+    return eligible[np.argsort(-scores[eligible], kind='stable')]
+
+
+def score_job(candidates: CandidateSet, job_vector, required_skills: Sequence[str],
+              preferred_skills: Sequence[str], rows: Optional[np.ndarray] = None,
+              limit: Optional[int] = MATCH_LIMIT, threshold: float = 0.0) -> List[Tuple[int, float, Dict]]:
+    """Score a job against candidates (all, or only ``rows``).
+
+    Returns (candidate id, score, skill match details) for the top matches.
+    """
+    vectors = candidates.vectors if rows is None else candidates.vectors[rows]
+    scores = np.asarray((vectors @ sparse.csr_matrix(job_vector).T).todense(), dtype=np.float32).ravel()
+    best = top_matches(scores, limit, threshold)
+    if len(best) == 0:
+        return []
+    best_rows = best if rows is None else rows[best]
+
+    required = sorted(set(required_skills))
+    preferred = sorted(set(preferred_skills))
+    required_mask = candidates.skill_mask(required)
+    preferred_mask = candidates.skill_mask(preferred)
+    skills = candidates.skills[best_rows]
+    total_skills = len(required) + len(preferred)
+    percentages = (
+        (skills @ required_mask + skills @ preferred_mask) / total_skills
+        if total_skills else np.zeros(len(best_rows))
+    )
+
+    required_ids = np.flatnonzero(required_mask)
+    preferred_ids = np.flatnonzero(preferred_mask)
+    results = []
+    for rank, row in enumerate(best_rows):
+        own = candidates.candidate_skills(row)
+        matched_required = [candidates.skill_names[index] for index in np.intersect1d(own, required_ids)]
+        matched_preferred = [candidates.skill_names[index] for index in np.intersect1d(own, preferred_ids)]
+        results.append((int(candidates.ids[row]), float(scores[best[rank]]), {
+            'matched_required_skills': matched_required,
+            'matched_preferred_skills': matched_preferred,
+            'missing_required_skills': sorted(set(required) - set(matched_required)),
+            'total_skill_match_percentage': float(percentages[rank]),
+        }))
+    return results
+
+
+def save_matches(job_posting_id: int, matches: List[Tuple[int, float, Dict]]) -> None:
+    """Upsert a job's match rows in one statement; does not commit"""
+    if not matches:
+        return
+    statement = pg_insert(CandidateMatch.__table__).values([
+        {
+            'job_posting_id': job_posting_id,
+            'candidate_id': candidate_id,
+            'match_score': score,
+            'skill_match_details': details,
+        }
+        for candidate_id, score, details in matches
+    ])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['job_posting_id', 'candidate_id'],
+        set_={
+            'match_score': statement.excluded.match_score,
+            'skill_match_details': statement.excluded.skill_match_details,
+            'updated_at': db.func.now(),
+        }
+    ))
+
+
+candidate_matrix = CandidateMatrix()
@@ -0,0 +1,252 @@
+"""Persisted TF-IDF model for talent matching.
+
+``fit_model`` learns the vocabulary and idf weights from the platform's own
+text: video titles, descriptions and scripts, tag names and job postings.
+``save_model`` writes them to a versioned directory under MODEL_DIR:
+
+    <MODEL_DIR>/<version>/vocabulary.json
+    <MODEL_DIR>/<version>/idf.npy
+    <MODEL_DIR>/<version>/meta.json
+    <MODEL_DIR>/CURRENT            the version in use
+    <MODEL_DIR>/PENDING            a refitted version still being staged
+    <MODEL_DIR>/CHECKED            when the corpus was last compared for a refit
+
+The version directory is complete before any pointer names it, so a reader
+never sees a half-written model. ``load_model`` memory-maps ``idf.npy``, so
+every worker on a host shares one copy of the weights.
+
+A refit does not switch CURRENT straight away. The new version is PENDING
+while ``ai_matching.refit_matching_model`` re-vectorizes candidates into the
+staging table, one batch per worker tick. Only when every candidate is
+staged are the vectors promoted and CURRENT switched, so matching never runs
+on a partial candidate set. The first model is the exception: it becomes
+current at once, since the seed vectors it replaces carry no signal. A refit
+is skipped when the corpus fingerprint matches the current model's.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+import hashlib
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from extensions import db
+from models import JobPosting, Tag, Video
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.environ.get('MATCHING_MODEL_DIR', os.path.join('instance', 'matching_model'))
+CURRENT_FILE = 'CURRENT'
+PENDING_FILE = 'PENDING'
+CHECKED_FILE = 'CHECKED'
+MODEL_REFIT_INTERVAL = 24 * 60 * 60  # seconds between corpus checks for a refit
+MODEL_REFIT_TICK = 60  # seconds between the worker's refit/staging steps
+MODEL_CHECK_INTERVAL = 5  # seconds between processes' checks for a newer current model
+MAX_FEATURES = 20000
+MODEL_KEEP = 3  # saved versions kept on disk, current included
+CORPUS_BATCH = 1000  # rows fetched per round trip while streaming the corpus
+
+VECTORIZER_PARAMS = {
+    'stop_words': 'english',
+    'ngram_range': (1, 2),
+    'sublinear_tf': True,
+}
+
+
+def _build_vectorizer(**params) -> TfidfVectorizer:
+    return TfidfVectorizer(**{**VECTORIZER_PARAMS, **params})
+
+
+def iter_corpus() -> Iterator[str]:
+    """Every text the matcher compares, one document per row"""
+    for title, description, script in db.session.query(
+        Video.title, Video.description, Video.script_content
+    ).yield_per(CORPUS_BATCH):
+        text = ' '.join(part for part in (title, description, script) if part)
+        if text:
+            yield text
+
+    for name, in db.session.query(Tag.name).yield_per(CORPUS_BATCH):
+        yield name
+
+    for title, description, requirements, responsibilities, required, preferred in db.session.query(
+        JobPosting.title, JobPosting.description, JobPosting.requirements,
+        JobPosting.responsibilities, JobPosting.required_skills, JobPosting.preferred_skills
+    ).yield_per(CORPUS_BATCH):
+        parts = [title, description, requirements, responsibilities,
+                 ' '.join(required or []), ' '.join(preferred or [])]
+        yield ' '.join(part for part in parts if part)
+
+
+def corpus_fingerprint(documents) -> str:
+    """Hash of the corpus, to tell whether a refit would change anything"""
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update(document.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def fit_model(documents, max_features: int = MAX_FEATURES) -> Tuple[TfidfVectorizer, int]:
+    """Fit a vectorizer on ``documents``; returns (vectorizer, documents seen)"""
+    seen = [0]
+
+    def counted():
+        for document in documents:
+            seen[0] += 1
+            yield document
+
+    vectorizer = _build_vectorizer(max_features=max_features)
+    vectorizer.fit(counted())
+    return vectorizer, seen[0]
+
+
+def _write_pointer(name: str, value: str, model_dir: str = MODEL_DIR) -> None:
+    pointer = os.path.join(model_dir, f".{name}.tmp")
+    with open(pointer, 'w') as f:
+        f.write(value)
+    os.replace(pointer, os.path.join(model_dir, name))
+
+
+def _read_pointer(name: str, model_dir: str = MODEL_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(model_dir, name)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_model(vectorizer: TfidfVectorizer, documents: int, corpus_hash: str,
+               model_dir: str = MODEL_DIR, make_current: bool = True) -> str:
+    """Write a fitted vectorizer as a new version; returns the version.
+
+    The version becomes current, or with ``make_current=False`` pending.
+    """
+    version = f"tfidf-{datetime.utcnow():%Y%m%d%H%M%S}-{len(vectorizer.vocabulary_)}"
+    os.makedirs(model_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=model_dir)
+    try:
+        vocabulary = {term: int(index) for term, index in vectorizer.vocabulary_.items()}
+        with open(os.path.join(staging, 'vocabulary.json'), 'w') as f:
+            json.dump(vocabulary, f)
+        np.save(os.path.join(staging, 'idf.npy'), np.asarray(vectorizer.idf_, dtype=np.float64))
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': version,
+                'created_at': datetime.utcnow().isoformat(),
+                'documents': documents,
+                'corpus_hash': corpus_hash,
+                'features': len(vocabulary),
+                'params': {**VECTORIZER_PARAMS, 'ngram_range': list(VECTORIZER_PARAMS['ngram_range'])},
+            }, f)
+        os.replace(staging, os.path.join(model_dir, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    _write_pointer(CURRENT_FILE if make_current else PENDING_FILE, version, model_dir)
+    logger.info(f"Saved matching model {version} ({len(vocabulary)} features, {documents} documents)"
+                f"{'' if make_current else ' as pending'}")
+    prune_models(model_dir)
+    return version
+
+
+def set_current(version: str, model_dir: str = MODEL_DIR) -> None:
+    """Make a saved version current and clear it from PENDING"""
+    _write_pointer(CURRENT_FILE, version, model_dir)
+    if pending_version(model_dir) == version:
+        os.remove(os.path.join(model_dir, PENDING_FILE))
+    prune_models(model_dir)
+
+
+def clear_pending(model_dir: str = MODEL_DIR) -> None:
+    try:
+        os.remove(os.path.join(model_dir, PENDING_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def prune_models(model_dir: str = MODEL_DIR, keep: int = MODEL_KEEP) -> None:
+    """Delete all but the newest ``keep`` versions; mapped files stay readable until unmapped"""
+    in_use = {current_version(model_dir), pending_version(model_dir)}
+    versions = sorted(
+        name for name in os.listdir(model_dir)
+        if name.startswith('tfidf-') and os.path.isdir(os.path.join(model_dir, name))
+    )
+    for version in versions[:-keep]:
+        if version not in in_use:
+            shutil.rmtree(os.path.join(model_dir, version), ignore_errors=True)
+
+
+def current_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    """The version CURRENT points at, or None if no model has been saved"""
+    return _read_pointer(CURRENT_FILE, model_dir)
+
+
+def pending_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    """A refitted version whose embeddings are still being staged, if any"""
+    return _read_pointer(PENDING_FILE, model_dir)
+
+
+def read_meta(version: str, model_dir: str = MODEL_DIR) -> Dict:
+    with open(os.path.join(model_dir, version, 'meta.json')) as f:
+        return json.load(f)
+
+
+def load_model(version: Optional[str] = None, model_dir: str = MODEL_DIR) -> Optional[Tuple[str, TfidfVectorizer]]:
+    """Load a saved version (default: current) with memory-mapped idf weights"""
+    version = version or current_version(model_dir)
+    if version is None:
+        return None
+    path = os.path.join(model_dir, version)
+    with open(os.path.join(path, 'vocabulary.json')) as f:
+        vocabulary = json.load(f)
+    vectorizer = _build_vectorizer(vocabulary=vocabulary)
+    vectorizer.idf_ = np.load(os.path.join(path, 'idf.npy'), mmap_mode='r')
+    return version, vectorizer
+
+
+def fit_and_save(force: bool = False, model_dir: str = MODEL_DIR) -> Optional[str]:
+    """Fit on the current corpus and save it, current if it is the first model, else pending.
+
+    Returns the new version, or None if the corpus is empty or (unless
+    ``force``) unchanged since the current model was fitted.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    _write_pointer(CHECKED_FILE, datetime.utcnow().isoformat(), model_dir)
+    corpus_hash = corpus_fingerprint(iter_corpus())
+    current = current_version(model_dir)
+    if current is not None and not force:
+        try:
+            if read_meta(current, model_dir).get('corpus_hash') == corpus_hash:
+                logger.info("Corpus unchanged since the current matching model; not refitting")
+                return None
+        except (OSError, ValueError):
+            pass
+
+    try:
+        vectorizer, documents = fit_model(iter_corpus())
+    except ValueError as e:
+        # Raised by scikit-learn when the corpus yields no terms
+        logger.warning(f"Not fitting matching model: {str(e)}")
+        return None
+    return save_model(vectorizer, documents, corpus_hash, model_dir, make_current=current is None)
+
+
+def refit_due(model_dir: str = MODEL_DIR, interval: float = MODEL_REFIT_INTERVAL) -> bool:
+    """True if there is no saved model or the corpus was last checked over ``interval`` ago"""
+    if current_version(model_dir) is None:
+        return True
+    checked = _read_pointer(CHECKED_FILE, model_dir)
+    try:
+        checked_at = datetime.fromisoformat(checked) if checked else None
+    except ValueError:
+        checked_at = None
+    if checked_at is None:
+        return True
+    return (datetime.utcnow() - checked_at).total_seconds() >= interval
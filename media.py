@@ -0,0 +1,113 @@
+"""Media serving layer for uploaded videos, thumbnails and tutorial clips.
+
+Responses carry a strong ETag and explicit Cache-Control and honour
+conditional (If-None-Match / If-Range) and byte-range requests, so seeking
+in a large video only transfers the requested slice. When a fronting web
+server is configured, the body is offloaded to it instead of being streamed
+by a Flask worker:
+
+    MEDIA_OFFLOAD = 'x-accel'     # nginx: X-Accel-Redirect
+    MEDIA_OFFLOAD = 'x-sendfile'  # Apache/lighttpd: X-Sendfile
+    MEDIA_ACCEL_PREFIX = '/protected/'  # internal nginx location for X-Accel-Redirect
+
+Both settings can also be supplied through environment variables of the same name.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+
+from flask import current_app, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+ONE_YEAR = 365 * 24 * 60 * 60
+ONE_DAY = 24 * 60 * 60
+
+OFFLOAD_X_ACCEL = 'x-accel'
+OFFLOAD_X_SENDFILE = 'x-sendfile'
+
+mimetypes.add_type('video/webm', '.webm')
+mimetypes.add_type('video/mp4', '.mp4')
+mimetypes.add_type('text/vtt', '.vtt')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+
+
+def _config(name, default=None):
+    value = current_app.config.get(name)
+    if value is None:
+        value = os.environ.get(name, default)
+    return value
+
+
+def file_etag(path, stat=None):
+    """Strong validator derived from the file's identity, size and mtime"""
+    stat = stat or os.stat(path)
+    key = f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def cache_control_value(max_age, immutable=False):
+    if not max_age:
+        # Cacheable, but revalidated with the ETag on every use
+        return "public, no-cache"
+    value = f"public, max-age={max_age}"
+    if immutable:
+        value += ", immutable"
+    return value
+
+
+def _offload_response(mode, path, stat, etag, mimetype, cache_control):
+    """Hand the body off to the fronting server; it handles ranges itself"""
+    response = current_app.response_class(status=200, mimetype=mimetype)
+    if mode == OFFLOAD_X_ACCEL:
+        prefix = _config('MEDIA_ACCEL_PREFIX', '/protected/').rstrip('/')
+        relative = os.path.relpath(path, os.path.abspath(current_app.root_path)).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = f"{prefix}/{relative}"
+    else:
+        response.headers['X-Sendfile'] = path
+
+    response.set_etag(etag)
+    response.last_modified = stat.st_mtime
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Accept-Ranges'] = 'bytes'
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        # Cache is still valid: nothing for the fronting server to send
+        response.headers.pop('X-Accel-Redirect', None)
+        response.headers.pop('X-Sendfile', None)
+    return response
+
+
+def send_media(directory, filename, max_age=ONE_YEAR, immutable=True, mimetype=None):
+    """Serve a file from ``directory`` with range, ETag and cache header support.
+
+    ``immutable`` should only be set for content-addressed filenames, i.e.
+    names that are never rewritten with different bytes. Raises NotFound if
+    the file does not exist or escapes ``directory``.
+    """
+    base = os.path.join(current_app.root_path, directory)
+    path = safe_join(base, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    path = os.path.abspath(path)
+
+    stat = os.stat(path)
+    etag = file_etag(path, stat)
+    mimetype = mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    cache_control = cache_control_value(max_age, immutable)
+
+    mode = _config('MEDIA_OFFLOAD')
+    if mode in (OFFLOAD_X_ACCEL, OFFLOAD_X_SENDFILE):
+        return _offload_response(mode, path, stat, etag, mimetype, cache_control)
+
+    # send_file evaluates If-None-Match/If-Range and answers 304/206/416 itself
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag,
+                         max_age=max_age, last_modified=stat.st_mtime)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
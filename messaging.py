@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from flask_wtf.csrf import generate_csrf, validate_csrf
 from models import Message, User
 from extensions import db
+from user_summary import get_user_summary, refresh_user_summary
 from datetime import datetime
 import logging
 
@@ -10,6 +11,13 @@ logger = logging.getLogger(__name__)
 
 messaging = Blueprint('messaging', __name__)
 
+@messaging.app_template_global()
+def unread_message_count():
+    """Unread messages for the navigation badge, read from the user summary"""
+    if not current_user.is_authenticated:
+        return 0
+    return get_user_summary(current_user.id)['unread_message_count']
+
 @messaging.route('/messages')
 @login_required
 def inbox():
@@ -57,6 +65,7 @@ def new_message(receiver_id):
 
                 db.session.add(message)
                 db.session.commit()
+                refresh_user_summary(receiver_id)
                 logger.info(f"Message sent successfully from user {current_user.id} to user {receiver_id}")
                 flash('Message sent successfully!', 'success')
                 return redirect(url_for('messaging.inbox'))
@@ -86,5 +95,6 @@ def view_message(message_id):
     if message.receiver_id == current_user.id and not message.read:
         message.read = True
         db.session.commit()
+        refresh_user_summary(current_user.id)
 
     return render_template('messaging/view_message.html', message=message)
\ No newline at end of file
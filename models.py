@@ -126,10 +126,24 @@ class Video(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
-    thumbnail = db.Column(db.String(255))
+    thumbnail = db.Column(db.String(255), index=True)
     views = db.Column(db.Integer, default=0)
     likes = db.Column(db.Integer, default=0)
     script_content = db.Column(db.Text)
+    status = db.Column(db.String(20), default='ready')  # processing, ready, failed
+    duration = db.Column(db.Float)  # seconds, from ffprobe
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    codec = db.Column(db.String(30))
+    bitrate = db.Column(db.BigInteger)  # bits per second
+    container = db.Column(db.String(50))
+    thumbnail_variants = db.Column(db.JSON)  # widths generated by the thumbnail engine
+    preview_vtt = db.Column(db.String(255))  # seek-preview sprite index
+    original_filename = db.Column(db.String(255))  # untouched upload kept for re-encoding
+    original_duration = db.Column(db.Float)  # seconds of original_filename, for validating trims
+    hls_manifest = db.Column(db.String(255))  # master playlist path relative to HLS_DIR
+    edit_decisions = db.Column(db.JSON)  # EDL applied to the original; None when unedited
+    render_cache = db.Column(db.JSON)  # rendered EDL filenames, most recently used first
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -137,6 +151,159 @@ class Video(db.Model):
     video_tags = db.relationship('VideoTag', back_populates='video', lazy='select', cascade='all, delete-orphan')
     playlist_entries = db.relationship('PlaylistVideo', back_populates='video', lazy='select')
 
+    __table_args__ = (
+        Index('idx_video_user_views', user_id, desc(views)),
+    )
+
+class VideoJob(db.Model):
+    """Model for queued background video processing jobs"""
+    __tablename__ = 'video_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('video.id', ondelete='CASCADE'), nullable=False)
+    job_type = db.Column(db.String(30), nullable=False)  # probe, thumbnail, transcode
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    payload = db.Column(db.JSON, default=dict)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    progress = db.Column(db.Float, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    # Relationships
+    video = db.relationship('Video', backref=db.backref('jobs', lazy='dynamic', cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        Index('idx_video_job_status_created', status, created_at),
+        Index('idx_video_job_video', video_id),
+    )
+
+    def to_dict(self):
+        """Serialize job state for status polling"""
+        return {
+            'id': self.id,
+            'type': self.job_type,
+            'status': self.status,
+            'progress': self.progress or 0.0,
+            'error': self.error
+        }
+
+    def __repr__(self):
+        return f'<VideoJob {self.id}: {self.job_type} for Video {self.video_id} ({self.status})>'
+
+class VideoUpload(db.Model):
+    """Model for tracking resumable chunked video uploads"""
+    __tablename__ = 'video_upload'
+
+    id = db.Column(db.String(36), primary_key=True)  # upload id handed to the client
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    offset = db.Column(db.BigInteger, nullable=False, default=0)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    script_content = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, completed
+    video_id = db.Column(db.Integer, db.ForeignKey('video.id', ondelete='SET NULL'))
+    expires_at = db.Column(db.DateTime)  # pushed back by every chunk; expired uploads are removed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_video_upload_user', user_id),
+        Index('idx_video_upload_expires', expires_at),
+    )
+
+    def __repr__(self):
+        return f'<VideoUpload {self.id}: {self.offset}/{self.total_size} bytes>'
+
+class VideoViewEvent(db.Model):
+    """Append-only log of individual video views, rolled up into VideoDailyStats"""
+    __tablename__ = 'video_view_event'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    video_id = db.Column(db.Integer, nullable=False)  # no FK: keeps inserts cheap, rows outlive deletes
+    viewer_type = db.Column(db.String(20), nullable=False)  # employer, jobseeker, anonymous
+    viewer_id = db.Column(db.Integer)
+    viewed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_video_view_event_viewed_at', viewed_at, postgresql_using='brin'),
+    )
+
+    def __repr__(self):
+        return f'<VideoViewEvent {self.id}: Video {self.video_id} by {self.viewer_type}>'
+
+class VideoDailyStats(db.Model):
+    """Per-video, per-day view totals rolled up from VideoViewEvent"""
+    __tablename__ = 'video_daily_stats'
+
+    video_id = db.Column(db.Integer, db.ForeignKey('video.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    employer_views = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_video_daily_stats_owner_day', owner_id, day),
+    )
+
+    def __repr__(self):
+        return f'<VideoDailyStats Video {self.video_id} on {self.day}: {self.views} views>'
+
+class StatsRollupState(db.Model):
+    """Watermarks for the incremental and nightly view rollups"""
+    __tablename__ = 'stats_rollup_state'
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_event_id = db.Column(db.BigInteger, nullable=False, default=0)
+    last_rebuilt_day = db.Column(db.Date)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserSummary(db.Model):
+    """Materialized per-user counts for dashboards, refreshed on upload, like, message and profile events"""
+    __tablename__ = 'user_summary'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    video_count = db.Column(db.Integer, nullable=False, default=0)
+    total_views = db.Column(db.Integer, nullable=False, default=0)
+    total_likes = db.Column(db.Integer, nullable=False, default=0)
+    playlist_count = db.Column(db.Integer, nullable=False, default=0)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    unread_message_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CandidateEmbedding(db.Model):
+    """Stored TF-IDF vector of a job seeker's profile, recomputed only when the profile changes"""
+    __tablename__ = 'candidate_embedding'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    model_version = db.Column(db.String(40), nullable=False)  # vectorizer the vector was built with
+    source_hash = db.Column(db.String(64), nullable=False)  # hash of the profile text
+    vector = db.Column(db.JSON, nullable=False)  # sparse: {'indices': [...], 'values': [...]}
+    skills = db.Column(db.JSON, default=lambda: [])  # lowercased tag names, for skill overlap
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    generation = db.Column(db.Integer, nullable=False, default=0)  # bumped on every profile change
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_candidate_embedding_stale', stale, postgresql_where=(stale == True)),  # noqa: E712
+    )
+
+class CandidateEmbeddingStaging(db.Model):
+    """Embedding computed with a pending vectorizer version, promoted once every candidate has one"""
+    __tablename__ = 'candidate_embedding_staging'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    model_version = db.Column(db.String(40), nullable=False)
+    source_hash = db.Column(db.String(64), nullable=False)
+    vector = db.Column(db.JSON, nullable=False)
+    skills = db.Column(db.JSON, default=lambda: [])
+    generation = db.Column(db.Integer, nullable=False, default=0)  # candidate_embedding.generation when read
+
 class Message(db.Model):
     __tablename__ = 'message'
 
@@ -151,6 +318,10 @@ class Message(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_id], back_populates='sent_messages')
     receiver = db.relationship('User', foreign_keys=[receiver_id], back_populates='received_messages')
 
+    __table_args__ = (
+        Index('idx_message_receiver_read', receiver_id, read),
+    )
+
 class JobPosting(db.Model):
     __tablename__ = 'job_posting'
 
@@ -179,6 +350,7 @@ class CandidateMatch(db.Model):
     job_posting_id = db.Column(db.Integer, db.ForeignKey('job_posting.id', ondelete='CASCADE'), nullable=False)
     candidate_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     match_score = db.Column(db.Float, nullable=False)
+    skill_match_details = db.Column(db.JSON)  # matched/missing skills from the last scoring run
     status = db.Column(db.String(20), default='pending')  # pending, accepted, rejected
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -206,6 +378,9 @@ class Playlist(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     is_public = db.Column(db.Boolean, default=True)
+    share_token = db.Column(db.String(64), unique=True)
+    view_count = db.Column(db.Integer, default=0)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped on every edit; keys the shared page cache
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -219,6 +394,22 @@ class Playlist(db.Model):
         Index('idx_playlist_created', desc(created_at)),
     )
 
+    def generate_share_token(self):
+        """Generate a new public share token, invalidating old links"""
+        self.share_token = secrets.token_urlsafe(16)
+        return self.share_token
+
+    def touch(self):
+        """Mark the playlist as edited so cached shared pages are re-rendered"""
+        self.version = Playlist.version + 1
+
+    @staticmethod
+    def touch_containing(video_id):
+        """Bump the version of every playlist holding a video whose shown details changed"""
+        Playlist.query.filter(Playlist.id.in_(
+            db.session.query(PlaylistVideo.playlist_id).filter(PlaylistVideo.video_id == video_id)
+        )).update({Playlist.version: Playlist.version + 1}, synchronize_session=False)
+
     def __repr__(self):
         return f'<Playlist {self.id}: {self.title}>'
 
@@ -229,7 +420,7 @@ class PlaylistVideo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     playlist_id = db.Column(db.Integer, db.ForeignKey('playlist.id', ondelete='CASCADE'), nullable=False)
     video_id = db.Column(db.Integer, db.ForeignKey('video.id', ondelete='CASCADE'), nullable=False)
-    position = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # Spaced POSITION_GAP apart, see playlist_order.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -237,9 +428,9 @@ class PlaylistVideo(db.Model):
     video = db.relationship('Video', back_populates='playlist_entries')
 
     __table_args__ = (
-        Index('idx_playlist_video_playlist', playlist_id),
+        db.UniqueConstraint('playlist_id', 'video_id', name='uq_playlist_video_playlist_video'),
+        Index('idx_playlist_video_playlist_position', playlist_id, position),
         Index('idx_playlist_video_video', video_id),
-        Index('idx_playlist_video_position', position),
     )
 
     def __repr__(self):
@@ -251,12 +442,18 @@ class Tag(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False, unique=True)
+    type = db.Column(db.String(20), nullable=False, default='user')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
     video_tags = db.relationship('VideoTag', back_populates='tag', lazy='select')
     playlist_tags = db.relationship('PlaylistTag', back_populates='tag', lazy='select')
 
+    # The trigram index for substring search needs pg_trgm; see add_tag_search_index.py
+    __table_args__ = (
+        Index('idx_tag_name_prefix', name, postgresql_ops={'name': 'text_pattern_ops'}),
+    )
+
     def __repr__(self):
         return f'<Tag {self.id}: {self.name}>'
 
@@ -267,6 +464,8 @@ class VideoTag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.Integer, db.ForeignKey('video.id', ondelete='CASCADE'), nullable=False)
     tag_id = db.Column(db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), nullable=False)
+    ai_suggested = db.Column(db.Boolean, default=False)
+    confidence_score = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -274,6 +473,7 @@ class VideoTag(db.Model):
     tag = db.relationship('Tag', back_populates='video_tags')
 
     __table_args__ = (
+        db.UniqueConstraint('video_id', 'tag_id', name='video_tag_video_id_tag_id_key'),
         Index('idx_video_tag_video', video_id),
         Index('idx_video_tag_tag', tag_id),
     )
@@ -292,6 +492,7 @@ class PlaylistTag(db.Model):
     tag = db.relationship('Tag', back_populates='playlist_tags')
 
     __table_args__ = (
+        db.UniqueConstraint('playlist_id', 'tag_id', name='playlist_tag_playlist_id_tag_id_key'),
         Index('idx_playlist_tag_playlist', playlist_id),
         Index('idx_playlist_tag_tag', tag_id),
     )
@@ -0,0 +1,133 @@
+"""Response and fragment caching for public pages.
+
+``cached_page`` stores the rendered HTML of a view for anonymous GET
+requests, keyed by path and query string, with a per-route TTL. Cached
+pages carry an ETag so repeat visitors revalidate with a 304 instead of
+downloading the page again. The CSRF token in ``base.html`` is per session,
+so it is swapped for a placeholder before a page is stored and the
+visitor's own token is substituted on the way out.
+
+``cached_include`` renders an included template once per fragment key, for
+pieces of the layout (footer, anonymous navigation) that are the same for
+every visitor but appear on every page.
+
+Both use an in-process LRU, or a shared Redis-compatible server when
+``CACHE_REDIS_URL`` is set (see ``cache.make_cache``).
+"""
+import hashlib
+import logging
+from functools import wraps
+from typing import Optional
+
+from flask import make_response, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from jinja2 import pass_context
+from markupsafe import Markup
+
+from cache import make_cache
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_TTL = 5 * 60  # seconds
+FRAGMENT_CACHE_TTL = 60 * 60  # seconds
+CSRF_PLACEHOLDER = '__CSRF_TOKEN__'
+
+
+class PageCache:
+    """Holds the page and fragment caches; backends are chosen in ``init_app``"""
+
+    def __init__(self) -> None:
+        self.pages = make_cache('page', ttl=PAGE_CACHE_TTL, max_entries=512)
+        self.fragments = make_cache('fragment', ttl=FRAGMENT_CACHE_TTL, max_entries=256)
+
+    def init_app(self, app) -> None:
+        redis_url = app.config.get('CACHE_REDIS_URL')
+        if redis_url:
+            self.pages = make_cache('page', ttl=PAGE_CACHE_TTL, max_entries=512, redis_url=redis_url)
+            self.fragments = make_cache('fragment', ttl=FRAGMENT_CACHE_TTL, max_entries=256,
+                                        redis_url=redis_url)
+
+    def clear(self) -> None:
+        self.pages.clear()
+        self.fragments.clear()
+
+
+page_cache = PageCache()
+
+
+def _is_cacheable_request() -> bool:
+    """Only anonymous GETs with nothing flashed render the same for everyone"""
+    return (
+        request.method in ('GET', 'HEAD')
+        and not current_user.is_authenticated
+        and not session.get('_flashes')
+    )
+
+
+def _store_page(key: str, response, ttl: int) -> Optional[dict]:
+    if response.status_code != 200 or response.mimetype != 'text/html' or response.direct_passthrough:
+        return None
+    body = response.get_data(as_text=True).replace(generate_csrf(), CSRF_PLACEHOLDER)
+    entry = {'body': body, 'etag': hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]}
+    page_cache.pages.set(key, entry, ttl)
+    return entry
+
+
+def _page_response(entry: dict):
+    # The page differs per visitor only by the CSRF token, so the ETag is weak
+    if entry['etag'] in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(entry['body'].replace(CSRF_PLACEHOLDER, generate_csrf()))
+    response.set_etag(entry['etag'], weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
+def serve_cached(key: str, ttl: int, render):
+    """Serve the page stored under ``key``, calling ``render`` to build it on a miss.
+
+    Requests that cannot share a page (signed in, pending flashes) always
+    get a fresh ``render()``.
+    """
+    if not _is_cacheable_request():
+        return render()
+
+    entry = page_cache.pages.get(key)
+    if entry is None:
+        response = make_response(render())
+        try:
+            entry = _store_page(key, response, ttl)
+        except Exception as e:
+            logger.error(f"Error caching page {key}: {str(e)}")
+            entry = None
+        if entry is None:
+            return response
+    return _page_response(entry)
+
+
+def cached_page(ttl: int = PAGE_CACHE_TTL):
+    """Cache a view's HTML for anonymous visitors for ``ttl`` seconds"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return serve_cached(request.full_path, ttl, lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+@pass_context
+def cached_include(context, template_name: str, key: Optional[str], ttl: int = FRAGMENT_CACHE_TTL) -> Markup:
+    """Render an included template, reusing the HTML stored under ``key``.
+
+    A ``key`` of None renders without caching, for fragments that depend on
+    the signed-in user.
+    """
+    template = context.environment.get_template(template_name)
+    if key is None:
+        return Markup(template.render(context.get_all()))
+    return Markup(page_cache.fragments.get_or_set(
+        f"{template_name}:{key}", lambda: template.render(context.get_all()), ttl
+    ))
@@ -1,10 +1,17 @@
 import logging
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
 from models import db, Playlist, PlaylistVideo, Video, Tag, VideoTag, PlaylistTag
 from sqlalchemy import desc
-import qrcode
-import io
+from user_summary import refresh_user_summary
+from counters import playlist_view_buffer
+from page_cache import serve_cached
+from werkzeug.exceptions import NotFound
+from media import ONE_YEAR, send_media
+from playlist_read import load_playlist_view
+from tag_service import TagChanges, add_tags, normalize_tag_name, publish, resolve_tags
+from playlist_order import append_video, move_video, reorder
+from playlist_qr import QR_DIR, QR_SIZES, QR_FORMATS, DEFAULT_QR_SIZE, qr_filename, ensure_qr_codes, issue_share_token
 from openai import OpenAI
 from .forms import PlaylistForm, AddVideoForm
 import json
@@ -15,6 +22,17 @@ logger.setLevel(logging.DEBUG)
 
 playlist = Blueprint('playlist', __name__)
 
+SHARED_PLAYLIST_TTL = 5 * 60  # seconds; edits bump the version so they show immediately
+
+def share_url(share_token):
+    """Absolute public URL for a share token"""
+    return url_for('playlist.view_shared_playlist', share_token=share_token, _external=True)
+
+@playlist.record_once
+def init_playlist_view_buffer(state):
+    """Give the playlist view buffer an app so timed and exit flushes have a database"""
+    playlist_view_buffer.init_app(state.app)
+
 @playlist.route('/<int:playlist_id>/suggest-tags', methods=['POST'])
 @login_required
 def suggest_tags(playlist_id):
@@ -58,29 +76,16 @@ def suggest_tags(playlist_id):
             suggested_tags = json.loads(response.choices[0].message.content)
             logger.debug(f"Generated tags: {suggested_tags}")
 
-            # Add new tags to the playlist
-            added_tags = []
-            for tag_name in suggested_tags:
-                # Create or get existing tag
-                tag = Tag.query.filter_by(name=tag_name.lower()).first()
-                if not tag:
-                    tag = Tag(name=tag_name.lower(), type='suggested')
-                    db.session.add(tag)
-                    db.session.flush()
-
-                # Check if tag is already added to playlist
-                existing_tag = PlaylistTag.query.filter_by(
-                    playlist_id=playlist_id,
-                    tag_id=tag.id
-                ).first()
-
-                if not existing_tag:
-                    playlist_tag = PlaylistTag(playlist_id=playlist_id, tag_id=tag.id)
-                    db.session.add(playlist_tag)
-                    added_tags.append(tag_name)
+            # Resolve all suggestions in one upsert and attach the ones the playlist lacks
+            changes = TagChanges()
+            tag_ids = resolve_tags({tag_name: 'suggested' for tag_name in suggested_tags}, changes)
+            added = add_tags(PlaylistTag, playlist_id, tag_ids.values(), changes)
+            added_tags = [tag_name for tag_name, tag_id in tag_ids.items() if tag_id in added]
 
             if added_tags:
+                playlist.touch()
                 db.session.commit()
+                publish(changes)
                 logger.info(f"Added {len(added_tags)} suggested tags to playlist {playlist_id}")
                 return jsonify({
                     'status': 'success',
@@ -122,31 +127,22 @@ def add_tag(playlist_id):
             return jsonify({'status': 'error', 'message': 'Tag name is required'}), 400
 
         # Normalize tag name - trim whitespace and convert to lowercase
-        tag_name = tag_name.strip().lower()
+        tag_name = normalize_tag_name(tag_name)
         if not tag_name:
             return jsonify({'status': 'error', 'message': 'Tag name cannot be empty'}), 400
 
-        # Create or get existing tag
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name, type='user')
-            db.session.add(tag)
-            db.session.flush()
-
-        # Check if tag is already added to playlist
-        existing_tag = PlaylistTag.query.filter_by(
-            playlist_id=playlist_id,
-            tag_id=tag.id
-        ).first()
-
-        if existing_tag:
+        # Create or get the tag, then attach it unless the playlist already has it
+        changes = TagChanges()
+        tag_id = resolve_tags({tag_name: 'user'}, changes).get(tag_name)
+        if tag_id is None or not add_tags(PlaylistTag, playlist_id, [tag_id], changes):
+            db.session.rollback()
             logger.warning(f"Tag {tag_name} already exists in playlist {playlist_id}")
             return jsonify({'status': 'error', 'message': 'Tag already exists in playlist'}), 400
 
-        # Add tag to playlist
-        playlist_tag = PlaylistTag(playlist_id=playlist_id, tag_id=tag.id)
-        db.session.add(playlist_tag)
+        tag = db.session.get(Tag, tag_id)
+        playlist.touch()
         db.session.commit()
+        publish(changes)
         logger.info(f"Successfully added tag {tag_name} to playlist {playlist_id}")
 
         return jsonify({
@@ -179,6 +175,7 @@ def remove_tag(playlist_id, tag_id):
         ).first_or_404()
 
         db.session.delete(playlist_tag)
+        playlist.touch()
         db.session.commit()
 
         return jsonify({'status': 'success'})
@@ -220,10 +217,11 @@ def create_playlist():
 
             # Generate share token if playlist is public
             if form.is_public.data:
-                playlist.generate_share_token()
+                issue_share_token(playlist, share_url)
 
             db.session.add(playlist)
             db.session.commit()
+            refresh_user_summary(current_user.id)
             logger.info(f"Created new playlist: {playlist.id} by user: {current_user.id}")
 
             flash('Playlist created successfully!', 'success')
@@ -240,7 +238,10 @@ def create_playlist():
 @login_required
 def view_playlist(playlist_id):
     """View a specific playlist and its videos"""
-    playlist = Playlist.query.get_or_404(playlist_id)
+    view = load_playlist_view(playlist_id)
+    if view is None:
+        abort(404)
+    playlist = view['playlist']
 
     # Check access permissions
     if not playlist.is_public and playlist.user_id != current_user.id:
@@ -251,36 +252,19 @@ def view_playlist(playlist_id):
     playlist_form = PlaylistForm()
     add_video_form = AddVideoForm()
 
-    # Populate video choices
-    add_video_form.video_id.choices = [
-        (v.id, v.title) for v in current_user.videos
-    ]
+    # Populate video choices without loading whole Video rows
+    add_video_form.video_id.choices = Video.query.with_entities(Video.id, Video.title).filter(
+        Video.user_id == current_user.id
+    ).order_by(desc(Video.created_at)).all()
 
-    # Increment view count for public playlists
+    # Count views of public playlists by anyone but the owner
     if playlist.is_public and (not current_user.is_authenticated or playlist.user_id != current_user.id):
-        playlist.view_count += 1
-        db.session.commit()
+        playlist_view_buffer.record(playlist.id)
 
-    # Get playlist videos with order
-    playlist_videos = db.session.query(
-        Video, PlaylistVideo.order
-    ).join(
-        PlaylistVideo, Video.id == PlaylistVideo.video_id
-    ).filter(
-        PlaylistVideo.playlist_id == playlist_id
-    ).order_by(
-        PlaylistVideo.order
-    ).all()
-
-    # Get tags for the playlist
-    tags = Tag.query.join(PlaylistTag).filter(PlaylistTag.playlist_id == playlist_id).all()
-
-    return render_template('playlist/view.html', 
-                         playlist=playlist, 
-                         playlist_videos=playlist_videos,
-                         tags=tags,
+    return render_template('playlist/view.html',
                          form=playlist_form,
-                         add_video_form=add_video_form)
+                         add_video_form=add_video_form,
+                         **view)
 
 @playlist.route('/playlists/<int:playlist_id>/add-video', methods=['POST'])
 @login_required
@@ -309,29 +293,13 @@ def add_video(playlist_id):
             flash('You can only add your own videos to playlists')
             return redirect(url_for('playlist.view_playlist', playlist_id=playlist_id))
 
-        # Check if video is already in playlist
-        existing = PlaylistVideo.query.filter_by(
-            playlist_id=playlist_id,
-            video_id=video_id
-        ).first()
-
-        if existing:
+        # Append in one locked insert; None means the video is already in the playlist
+        if append_video(playlist_id, video_id) is None:
+            db.session.rollback()
             flash('Video is already in playlist')
             return redirect(url_for('playlist.view_playlist', playlist_id=playlist_id))
 
-        # Get max order
-        max_order = db.session.query(db.func.max(PlaylistVideo.order)).filter(
-            PlaylistVideo.playlist_id == playlist_id
-        ).scalar() or 0
-
-        # Add video to playlist
-        playlist_video = PlaylistVideo(
-            playlist_id=playlist_id,
-            video_id=video_id,
-            order=max_order + 1
-        )
-
-        db.session.add(playlist_video)
+        playlist.touch()
         db.session.commit()
         logger.info(f"Added video {video_id} to playlist {playlist_id}")
 
@@ -345,65 +313,63 @@ def add_video(playlist_id):
 
 @playlist.route('/playlists/<int:playlist_id>/qr')
 def get_playlist_qr(playlist_id):
-    """Generate QR code for playlist sharing"""
+    """Redirect to the pre-rendered QR code for playlist sharing"""
     try:
         playlist = Playlist.query.get_or_404(playlist_id)
 
-        if not playlist.is_public:
+        if not playlist.is_public or not playlist.share_token:
             flash('Only public playlists can be shared via QR code')
             return redirect(url_for('playlist.view_playlist', playlist_id=playlist_id))
 
-        # Generate the share URL
-        share_url = url_for('playlist.view_shared_playlist', 
-                        share_token=playlist.share_token,
-                        _external=True)
-
-        # Create QR code using proper initialization
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=5
-        )
-        qr.add_data(share_url)
-        qr.make(fit=True)
-
-        # Create image and save to bytes
-        img = qr.make_image(fill_color="black", back_color="white")
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, 'PNG')
-        img_bytes.seek(0)
-
-        logger.info(f"Generated QR code for playlist {playlist_id}")
-        return send_file(img_bytes, mimetype='image/png')
+        fmt = request.args.get('format', 'png')
+        size = request.args.get('size', DEFAULT_QR_SIZE)
+        if fmt not in QR_FORMATS or size not in QR_SIZES:
+            return jsonify({'status': 'error', 'message': 'Unsupported QR format or size'}), 400
+
+        ensure_qr_codes(playlist.share_token, share_url(playlist.share_token))
+        return redirect(url_for('playlist.serve_playlist_qr', share_token=playlist.share_token,
+                                fmt=fmt, size=size if fmt == 'png' else None))
     except Exception as e:
         logger.error(f"Error generating QR code for playlist {playlist_id}: {str(e)}")
         flash('Error generating QR code')
         return redirect(url_for('playlist.view_playlist', playlist_id=playlist_id))
 
+@playlist.route('/playlists/shared/<share_token>/qr.<fmt>')
+def serve_playlist_qr(share_token, fmt):
+    """Serve a stored QR code; the token is in the URL, so it never changes"""
+    try:
+        size = request.args.get('size', DEFAULT_QR_SIZE)
+        if fmt not in QR_FORMATS or size not in QR_SIZES:
+            raise NotFound()
+        Playlist.query.with_entities(Playlist.id).filter_by(
+            share_token=share_token, is_public=True
+        ).first_or_404()
+
+        ensure_qr_codes(share_token, share_url(share_token))
+        return send_media(QR_DIR, qr_filename(share_token, fmt, size), max_age=ONE_YEAR, immutable=True)
+    except NotFound:
+        return "QR code not found", 404
+    except Exception as e:
+        logger.error(f"Error serving QR code for share token {share_token[:6]}...: {str(e)}")
+        return "QR code not found", 404
+
 @playlist.route('/playlists/shared/<share_token>')
 def view_shared_playlist(share_token):
     """View a shared playlist using its share token"""
-    playlist = Playlist.query.filter_by(share_token=share_token, is_public=True).first_or_404()
+    shared = Playlist.query.with_entities(Playlist.id, Playlist.version).filter_by(
+        share_token=share_token, is_public=True
+    ).first_or_404()
 
-    # Increment view count
-    playlist.view_count += 1
-    db.session.commit()
+    playlist_view_buffer.record(shared.id)
+
+    def render():
+        view = load_playlist_view(shared.id)
+        if view is None:
+            abort(404)
+        return render_template('playlist/shared.html', **view)
 
-    # Get playlist videos with order
-    playlist_videos = db.session.query(
-        Video, PlaylistVideo.order
-    ).join(
-        PlaylistVideo, Video.id == PlaylistVideo.video_id
-    ).filter(
-        PlaylistVideo.playlist_id == playlist.id
-    ).order_by(
-        PlaylistVideo.order
-    ).all()
-
-    return render_template('playlist/shared.html', 
-                         playlist=playlist, 
-                         playlist_videos=playlist_videos)
+    # The version changes on every edit, so stale pages are never served after one
+    return serve_cached(f"shared_playlist:{share_token}:{shared.version}", SHARED_PLAYLIST_TTL, render)
 
 @playlist.route('/playlists/<int:playlist_id>/toggle-public', methods=['POST'])
 @login_required
@@ -416,7 +382,8 @@ def toggle_public(playlist_id):
 
     playlist.is_public = not playlist.is_public
     if playlist.is_public and not playlist.share_token:
-        playlist.generate_share_token()
+        issue_share_token(playlist, share_url)
+    playlist.touch()
 
     db.session.commit()
     return jsonify({
@@ -442,6 +409,7 @@ def remove_video(playlist_id, video_id):
     ).first_or_404()
     
     db.session.delete(playlist_video)
+    playlist.touch()
     db.session.commit()
     
     flash('Video removed from playlist successfully!')
@@ -457,19 +425,23 @@ def reorder_videos(playlist_id):
         flash('You do not have permission to modify this playlist')
         return redirect(url_for('dashboard'))
         
-    video_order = request.get_json()
-    
-    for video_id, order in video_order.items():
-        playlist_video = PlaylistTag.query.filter_by(
-            playlist_id=playlist_id,
-            video_id=video_id
-        ).first()
-        
-        if playlist_video:
-            playlist_video.order = order
-            
+    data = request.get_json(silent=True) or {}
+
+    try:
+        # A single drag sends {"video_id": ..., "index": ...}; a full ordering maps video id to rank
+        if 'video_id' in data:
+            move_video(playlist_id, int(data['video_id']), int(data.get('index', 0)))
+        else:
+            ranked = sorted(data.items(), key=lambda item: int(item[1]))
+            reorder(playlist_id, [int(video_id) for video_id, _ in ranked])
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    playlist.touch()
     db.session.commit()
     return {'status': 'success'}
+
 @playlist.route('/playlists/<int:playlist_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_playlist(playlist_id):
@@ -488,7 +460,8 @@ def edit_playlist(playlist_id):
             playlist.description = form.description.data
             playlist.is_public = form.is_public.data
             if playlist.is_public and not playlist.share_token:
-                playlist.generate_share_token()
+                issue_share_token(playlist, share_url)
+            playlist.touch()
             db.session.commit()
             flash('Playlist updated successfully!')
             return redirect(url_for('playlist.view_playlist', playlist_id=playlist_id))
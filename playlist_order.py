@@ -0,0 +1,111 @@
+"""Playlist ordering.
+
+``playlist_video.position`` values are spaced POSITION_GAP apart, so moving
+one video only rewrites that video's row: it takes the midpoint between its
+new neighbours. When two neighbours have no integer left between them, the
+playlist is renumbered with one bulk ``UPDATE ... FROM (VALUES ...)``, the
+same statement used for a full reorder.
+
+Appends lock the playlist row, so concurrent adds cannot pick the same
+position. The unique (playlist_id, video_id) constraint turns a duplicate
+add into a no-op.
+"""
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+
+from extensions import db
+from models import PlaylistVideo
+
+logger = logging.getLogger(__name__)
+
+POSITION_GAP = 1024
+
+
+def ordered_entries(playlist_id: int) -> List[tuple]:
+    """(video_id, position) pairs of a playlist in display order"""
+    return db.session.query(PlaylistVideo.video_id, PlaylistVideo.position).filter(
+        PlaylistVideo.playlist_id == playlist_id
+    ).order_by(PlaylistVideo.position, PlaylistVideo.id).all()
+
+
+def append_video(playlist_id: int, video_id: int) -> Optional[int]:
+    """Add a video after the last one; returns its position, or None if already present.
+
+    Does not commit; the playlist row stays locked until the caller does.
+    """
+    db.session.execute(
+        text('SELECT id FROM playlist WHERE id = :playlist_id FOR UPDATE'),
+        {'playlist_id': playlist_id}
+    )
+    return db.session.execute(text('''
+        INSERT INTO playlist_video (playlist_id, video_id, position, created_at)
+        SELECT :playlist_id, :video_id, COALESCE(MAX(position), 0) + :gap, now()
+        FROM playlist_video
+        WHERE playlist_id = :playlist_id
+        ON CONFLICT ON CONSTRAINT uq_playlist_video_playlist_video DO NOTHING
+        RETURNING position
+    '''), {'playlist_id': playlist_id, 'video_id': video_id, 'gap': POSITION_GAP}).scalar()
+
+
+def apply_positions(playlist_id: int, positions: Dict[int, int]) -> int:
+    """Set many positions in one statement; returns the number of rows changed"""
+    if not positions:
+        return 0
+    params = {'playlist_id': playlist_id}
+    rows = []
+    for index, (video_id, position) in enumerate(sorted(positions.items())):
+        params[f"video_{index}"] = video_id
+        params[f"position_{index}"] = position
+        rows.append(f"(:video_{index}, :position_{index})")
+
+    result = db.session.execute(text(f'''
+        UPDATE playlist_video
+        SET position = ordering.position
+        FROM (VALUES {', '.join(rows)}) AS ordering(video_id, position)
+        WHERE playlist_video.playlist_id = :playlist_id
+          AND playlist_video.video_id = ordering.video_id
+          AND playlist_video.position IS DISTINCT FROM ordering.position
+    '''), params)
+    return result.rowcount
+
+
+def reorder(playlist_id: int, video_ids: Sequence[int]) -> int:
+    """Apply a full ordering; ``video_ids`` must list every video in the playlist.
+
+    Raises ValueError if it does not. Does not commit.
+    """
+    current = {video_id for video_id, _ in ordered_entries(playlist_id)}
+    if len(video_ids) != len(set(video_ids)) or set(video_ids) != current:
+        raise ValueError("Reorder must list each video in the playlist exactly once")
+    return apply_positions(playlist_id, {
+        video_id: (index + 1) * POSITION_GAP for index, video_id in enumerate(video_ids)
+    })
+
+
+def move_video(playlist_id: int, video_id: int, index: int) -> int:
+    """Move one video to ``index`` in display order; returns the number of rows changed.
+
+    Raises ValueError if the video is not in the playlist. Does not commit.
+    """
+    entries = ordered_entries(playlist_id)
+    others = [entry for entry in entries if entry[0] != video_id]
+    if len(others) == len(entries):
+        raise ValueError(f"Video {video_id} is not in playlist {playlist_id}")
+    index = max(0, min(index, len(others)))
+
+    before = others[index - 1][1] if index > 0 else 0
+    after = others[index][1] if index < len(others) else before + 2 * POSITION_GAP
+    position = (before + after) // 2
+
+    if before < position < after:
+        return apply_positions(playlist_id, {video_id: position})
+
+    # No room between the neighbours: renumber the whole playlist evenly
+    video_ids = [entry[0] for entry in others]
+    video_ids.insert(index, video_id)
+    logger.info(f"Renumbering positions of playlist {playlist_id}")
+    return apply_positions(playlist_id, {
+        entry_id: (slot + 1) * POSITION_GAP for slot, entry_id in enumerate(video_ids)
+    })
@@ -0,0 +1,112 @@
+"""Pre-rendered QR codes for shared playlists.
+
+A playlist's share URL only changes when its share token does, so the QR
+codes are rendered once per token and stored under ``QR_DIR``:
+
+    static/uploads/qr/<share token>_<size>.png
+    static/uploads/qr/<share token>.svg
+
+The token is part of every filename, so the files are served as immutable
+and a new token simply produces new files. ``issue_share_token`` is the one
+place tokens change; it renders the new codes and removes the old ones.
+"""
+import logging
+import os
+
+import qrcode
+import qrcode.image.svg
+
+logger = logging.getLogger(__name__)
+
+QR_DIR = 'static/uploads/qr'
+QR_BORDER = 4
+
+# PNG module sizes in pixels: on-screen sharing up to poster printing
+QR_SIZES = {
+    'sm': 4,
+    'md': 10,
+    'lg': 20,
+    'print': 40,
+}
+DEFAULT_QR_SIZE = 'md'
+QR_FORMATS = ('png', 'svg')
+
+
+def qr_filename(share_token, fmt='png', size=DEFAULT_QR_SIZE):
+    """Stored filename of one QR variant; SVG is resolution independent so it has no size"""
+    if fmt == 'svg':
+        return f"{share_token}.svg"
+    return f"{share_token}_{size}.png"
+
+
+def _qr_matrix(share_url):
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=QR_BORDER)
+    qr.add_data(share_url)
+    qr.make(fit=True)
+    return qr
+
+
+def _write_atomic(path, image):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as output:
+        image.save(output)
+    os.replace(tmp_path, path)
+
+
+def render_qr_codes(share_token, share_url):
+    """Render every PNG size and the SVG for a share token; returns the filenames"""
+    os.makedirs(QR_DIR, exist_ok=True)
+    qr = _qr_matrix(share_url)
+    filenames = []
+
+    for size, box_size in QR_SIZES.items():
+        qr.box_size = box_size
+        filename = qr_filename(share_token, 'png', size)
+        _write_atomic(os.path.join(QR_DIR, filename),
+                      qr.make_image(fill_color="black", back_color="white"))
+        filenames.append(filename)
+
+    filename = qr_filename(share_token, 'svg')
+    _write_atomic(os.path.join(QR_DIR, filename),
+                  qr.make_image(image_factory=qrcode.image.svg.SvgPathImage))
+    filenames.append(filename)
+
+    logger.info(f"Rendered {len(filenames)} QR codes for share token {share_token[:6]}...")
+    return filenames
+
+
+def ensure_qr_codes(share_token, share_url):
+    """Render a token's QR codes if they are missing, e.g. for tokens issued before pre-rendering"""
+    if not os.path.exists(os.path.join(QR_DIR, qr_filename(share_token, 'svg'))):
+        render_qr_codes(share_token, share_url)
+
+
+def remove_qr_codes(share_token):
+    """Delete every stored QR variant for a share token"""
+    for fmt in QR_FORMATS:
+        sizes = QR_SIZES if fmt == 'png' else [None]
+        for size in sizes:
+            path = os.path.join(QR_DIR, qr_filename(share_token, fmt, size))
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except Exception as e:
+                    logger.error(f"Error removing QR code {path}: {str(e)}")
+
+
+def issue_share_token(playlist, share_url_for):
+    """Give a playlist a new share token and pre-render its QR codes.
+
+    ``share_url_for`` maps a token to its absolute share URL. The playlist is
+    not committed; QR rendering failures are logged and left to
+    ``ensure_qr_codes`` on first request.
+    """
+    old_token = playlist.share_token
+    token = playlist.generate_share_token()
+    try:
+        render_qr_codes(token, share_url_for(token))
+    except Exception as e:
+        logger.error(f"Error rendering QR codes for playlist {playlist.id}: {str(e)}")
+    if old_token:
+        remove_qr_codes(old_token)
+    return token
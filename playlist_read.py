@@ -0,0 +1,40 @@
+"""Read model for playlist pages.
+
+``load_playlist_view`` fetches a playlist together with everything its page
+renders: the owner, the ordered entries with their videos and each video's
+owner and tags, and the playlist's own tags. It takes a fixed number of
+queries (PLAYLIST_VIEW_QUERIES) however many videos the playlist holds, so
+rendering never lazy-loads per video.
+"""
+from typing import Dict, Optional
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import Playlist, PlaylistTag, PlaylistVideo, Video, VideoTag
+
+# Playlist + owner, entries + videos + video owners, video tags, playlist tags
+PLAYLIST_VIEW_QUERIES = 4
+
+
+def load_playlist_view(playlist_id: int) -> Optional[Dict]:
+    """Playlist, ordered (video, position) pairs and tags, or None if it does not exist"""
+    playlist = Playlist.query.options(
+        joinedload(Playlist.user),
+        selectinload(Playlist.videos)
+            .joinedload(PlaylistVideo.video)
+            .joinedload(Video.user),
+        selectinload(Playlist.videos)
+            .joinedload(PlaylistVideo.video)
+            .selectinload(Video.video_tags)
+            .joinedload(VideoTag.tag),
+        selectinload(Playlist.playlist_tags).joinedload(PlaylistTag.tag),
+    ).filter(Playlist.id == playlist_id).first()
+    if playlist is None:
+        return None
+
+    entries = sorted(playlist.videos, key=lambda entry: (entry.position, entry.id))
+    return {
+        'playlist': playlist,
+        'playlist_videos': [(entry.video, entry.position) for entry in entries],
+        'tags': [playlist_tag.tag for playlist_tag in playlist.playlist_tags],
+    }
@@ -4,6 +4,8 @@ from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from models import User
 from extensions import db
+from user_summary import refresh_user_summary
+from candidate_embeddings import mark_candidates_stale
 import os
 import logging
 import traceback
@@ -111,6 +113,8 @@ def setup():
 
                 # Commit changes to database
                 db.session.commit()
+                refresh_user_summary(current_user.id)
+                mark_candidates_stale([current_user.id])
                 logger.info(f"[Request: {request_id}] Profile updated successfully for user {current_user.id}")
                 flash('Profile updated successfully!', 'success')
 
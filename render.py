@@ -0,0 +1,260 @@
+"""Edit rendering for the background job queue.
+
+Turns an edit specification (trim range, colour filters, text overlay) into
+an ffmpeg graph and runs it with ``-progress`` so the job can report how far
+the render has got. Trim-only edits are cut on a keyframe with stream copy
+when one sits close enough to the requested start; everything else is
+re-encoded.
+
+Edits are non-destructive: a video's edit decision list (EDL) is stored on
+the record and always rendered from the original upload. Each render is
+named after the hash of its EDL, so repeating or reverting an edit reuses
+the file that is already on disk.
+"""
+import hashlib
+import json
+import logging
+import subprocess
+import tempfile
+import time
+
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_FONT = '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'
+
+OVERLAY_POSITIONS = {
+    'top': ('(w-text_w)/2', 'h/10'),
+    'middle': ('(w-text_w)/2', '(h-text_h)/2'),
+    'bottom': ('(w-text_w)/2', 'h-h/10'),
+}
+
+CONTAINER_FORMATS = {
+    'mkv': 'matroska',
+    'm4v': 'mp4',
+}
+
+# Containers every supported browser can play without re-encoding
+BROWSER_PLAYABLE_EXTENSIONS = {'mp4', 'webm'}
+
+# Rendered EDL outputs kept per video, most recently used first
+RENDER_CACHE_LIMIT = 5
+
+# How far before the requested trim start a keyframe may sit for a stream-copy cut
+KEYFRAME_TOLERANCE = 0.5
+
+# Minimum interval between progress writes to the job row
+PROGRESS_INTERVAL = 1.0
+
+
+def edit_spec(trim_start=0.0, trim_end=0.0, filters=None, text_overlay=None):
+    """Normalise edit form values into the payload stored on a render job"""
+    return {
+        'trim_start': float(trim_start or 0),
+        'trim_end': float(trim_end or 0),
+        'filters': {key: float(value) for key, value in (filters or {}).items()
+                    if key in ('brightness', 'contrast', 'saturation')},
+        'text_overlay': text_overlay if text_overlay and text_overlay.get('text') else None,
+    }
+
+
+def normalize_edl(spec, duration=None):
+    """Canonical EDL for hashing, or None when the edit leaves the original untouched"""
+    if not needs_render(spec, duration):
+        return None
+    edl = dict(spec)
+    edl['trim_start'] = round(edl['trim_start'], 3)
+    edl['trim_end'] = round(edl['trim_end'], 3)
+    if duration and edl['trim_end'] >= duration:
+        edl['trim_end'] = 0.0
+    edl['filters'] = {key: round(value, 3) for key, value in edl['filters'].items()}
+    return edl
+
+
+def edl_hash(edl):
+    """Stable short hash identifying an EDL's rendered output"""
+    if not edl:
+        return None
+    encoded = json.dumps(edl, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def rendered_filename(original_filename, edl):
+    """Filename of the render of ``edl`` applied to an original upload.
+
+    An empty EDL maps to the original itself, or to the transcoded MP4 if
+    browsers cannot play the original container.
+    """
+    base, extension = original_filename.rsplit('.', 1)
+    playable = extension.lower() in BROWSER_PLAYABLE_EXTENSIONS
+    digest = edl_hash(edl)
+    if digest is None:
+        return original_filename if playable else f"{base}.mp4"
+    return f"{base}_edl_{digest}.{extension.lower() if playable else 'mp4'}"
+
+
+def update_render_cache(cache, filename, keep=RENDER_CACHE_LIMIT):
+    """Move ``filename`` to the front of a cache list; returns (cache, evicted filenames)"""
+    cache = [filename] + [name for name in (cache or []) if name != filename]
+    return cache[:keep], cache[keep:]
+
+
+def is_trimmed(spec, duration=None):
+    trim_start, trim_end = spec['trim_start'], spec['trim_end']
+    return trim_start > 0 or (trim_end > 0 and trim_end != duration)
+
+
+def needs_render(spec, duration=None):
+    """True if the edit changes the video itself rather than just its metadata"""
+    return is_trimmed(spec, duration) or bool(spec['filters']) or bool(spec['text_overlay'])
+
+
+def is_trim_only(spec, duration=None):
+    """True if the edit only cuts the clip, so frames can be copied rather than re-encoded"""
+    return is_trimmed(spec, duration) and not spec['filters'] and not spec['text_overlay']
+
+
+def find_cut_keyframe(input_path, start):
+    """Latest video keyframe at or shortly before ``start``, or None if there is none close enough"""
+    if start <= 0:
+        return 0.0
+    window_start = max(start - KEYFRAME_TOLERANCE, 0)
+    try:
+        probe = ffmpeg.probe(
+            input_path,
+            select_streams='v:0',
+            skip_frame='nokey',
+            show_entries='frame=best_effort_timestamp_time',
+            read_intervals=f"{window_start}%{start + 0.001}"
+        )
+    except ffmpeg.Error as e:
+        logger.warning(f"Keyframe probe failed for {input_path}: {e.stderr.decode(errors='replace') if e.stderr else e}")
+        return None
+
+    keyframes = []
+    for frame in probe.get('frames', []):
+        try:
+            keyframes.append(float(frame['best_effort_timestamp_time']))
+        except (KeyError, TypeError, ValueError):
+            continue
+    candidates = [time_point for time_point in keyframes if window_start <= time_point <= start]
+    return max(candidates) if candidates else None
+
+
+def output_duration(spec, duration):
+    """Length of the rendered clip, used to turn ffmpeg's out_time into a fraction"""
+    if not duration:
+        return None
+    end = spec['trim_end'] if 0 < spec['trim_end'] < duration else duration
+    return max(end - spec['trim_start'], 0.001)
+
+
+def container_format(extension):
+    """ffmpeg muxer for a file extension; needed because renders go to .part files"""
+    return CONTAINER_FORMATS.get(extension.lower(), extension.lower())
+
+
+def build_edit_graph(input_path, output_path, extension, spec, duration=None, has_audio=True):
+    """Build the ffmpeg-python output node for an edit"""
+    source = ffmpeg.input(input_path)
+    video_stream = source.video
+    audio_stream = source.audio if has_audio else None
+
+    if is_trimmed(spec, duration):
+        trim_args = {'start': spec['trim_start']}
+        if spec['trim_end'] > 0:
+            trim_args['end'] = spec['trim_end']
+        video_stream = video_stream.filter('trim', **trim_args).filter('setpts', 'PTS-STARTPTS')
+        if audio_stream is not None:
+            audio_stream = audio_stream.filter('atrim', **trim_args).filter('asetpts', 'PTS-STARTPTS')
+
+    filters = spec['filters']
+    if filters:
+        eq_args = {key: value / 100 for key, value in filters.items()}
+        video_stream = video_stream.filter('eq', **eq_args)
+
+    overlay = spec['text_overlay']
+    if overlay:
+        x, y = OVERLAY_POSITIONS.get(overlay.get('position'), OVERLAY_POSITIONS['middle'])
+        video_stream = video_stream.drawtext(
+            text=overlay['text'], fontcolor=overlay.get('color', 'white'),
+            fontsize=24, x=x, y=y, fontfile=OVERLAY_FONT
+        )
+
+    streams = [video_stream] if audio_stream is None else [video_stream, audio_stream]
+    output_args = {'format': container_format(extension)}
+    if extension == 'mp4':
+        output_args['movflags'] = '+faststart'
+    return ffmpeg.output(*streams, output_path, **output_args)
+
+
+def build_trim_copy_graph(input_path, output_path, extension, spec, cut_start, duration=None):
+    """Cut on a keyframe with stream copy; no decode or encode takes place"""
+    input_args = {'ss': cut_start} if cut_start > 0 else {}
+    source = ffmpeg.input(input_path, **input_args)
+
+    output_args = {'c': 'copy', 'avoid_negative_ts': 'make_zero', 'format': container_format(extension)}
+    trim_end = spec['trim_end']
+    if trim_end > 0 and (not duration or trim_end < duration):
+        output_args['t'] = trim_end - cut_start
+    if extension == 'mp4':
+        output_args['movflags'] = '+faststart'
+    return ffmpeg.output(source, output_path, **output_args)
+
+
+def build_render_graph(input_path, output_path, extension, spec, duration=None, has_audio=True):
+    """Pick the cheapest way to render an edit; returns (graph, mode)"""
+    if is_trim_only(spec, duration):
+        cut_start = find_cut_keyframe(input_path, spec['trim_start'])
+        if cut_start is not None:
+            graph = build_trim_copy_graph(input_path, output_path, extension, spec, cut_start, duration)
+            return graph, 'copy'
+        logger.info(f"No keyframe near {spec['trim_start']}s in {input_path}; re-encoding trim")
+    return build_edit_graph(input_path, output_path, extension, spec, duration, has_audio), 'encode'
+
+
+def run_with_progress(output_node, total_duration=None, on_progress=None):
+    """Run an ffmpeg graph, reporting fractional progress parsed from ``-progress``.
+
+    Raises ffmpeg.Error with the captured stderr if ffmpeg exits non-zero.
+    """
+    args = output_node.global_args('-progress', 'pipe:1', '-nostats')\
+        .overwrite_output().compile()
+
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr_file)
+        last_report = 0.0
+        for raw_line in process.stdout:
+            key, _, value = raw_line.decode(errors='replace').strip().partition('=')
+            if on_progress is None or not total_duration:
+                continue
+            # out_time_us and out_time_ms are both microseconds
+            if key in ('out_time_us', 'out_time_ms') and value.isdigit():
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    on_progress(min(int(value) / 1_000_000 / total_duration, 0.99))
+        process.wait()
+
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            raise ffmpeg.Error('ffmpeg', None, stderr_file.read())
+
+
+def render_edit(input_path, output_path, extension, spec, duration=None, has_audio=True, on_progress=None):
+    """Render an edit to ``output_path`` and return the mode used ('copy' or 'encode')"""
+    graph, mode = build_render_graph(input_path, output_path, extension, spec, duration, has_audio)
+    total = output_duration(spec, duration)
+    try:
+        run_with_progress(graph, total, on_progress)
+    except ffmpeg.Error as e:
+        if mode != 'copy':
+            raise
+        # Some streams cannot be cut by copying into this container; fall back to a re-encode
+        logger.warning(f"Stream-copy trim failed for {input_path}, re-encoding: "
+                       f"{e.stderr.decode(errors='replace')[-500:] if e.stderr else e}")
+        mode = 'encode'
+        graph = build_edit_graph(input_path, output_path, extension, spec, duration, has_audio)
+        run_with_progress(graph, total, on_progress)
+    return mode
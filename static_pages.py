@@ -1,58 +1,82 @@
 from flask import Blueprint, render_template
-from datetime import datetime
+from datetime import date
+
+from page_cache import cached_include, cached_page, page_cache
 
 static_pages = Blueprint('static_pages', __name__)
 
-@static_pages.context_processor
-def inject_now():
-    return {'now': datetime.utcnow()}
+# Marketing and legal copy changes only on deploy; the home page lists videos
+HOME_PAGE_TTL = 60
+STATIC_PAGE_TTL = 60 * 60
+
+@static_pages.record_once
+def init_page_cache(state):
+    """Pick the page cache backend from the app config"""
+    page_cache.init_app(state.app)
+
+@static_pages.app_template_global()
+def current_year():
+    """The year for copyright lines; unlike a timestamp it keeps fragments cacheable"""
+    return date.today().year
+
+static_pages.add_app_template_global(cached_include)
 
 @static_pages.route('/')
+@cached_page(HOME_PAGE_TTL)
 def index():
     """Render the home page"""
     return render_template('index.html')
 
 @static_pages.route('/employers')
+@cached_page(STATIC_PAGE_TTL)
 def employers():
     """Render the employers page"""
     return render_template('static/employers.html')
 
 @static_pages.route('/candidates')
+@cached_page(STATIC_PAGE_TTL)
 def candidates():
     """Render the candidates page"""
     return render_template('static/candidates.html')
 
 @static_pages.route('/pricing')
+@cached_page(STATIC_PAGE_TTL)
 def pricing():
     """Render the pricing page"""
     return render_template('static/pricing.html')
 
 @static_pages.route('/help-center')
+@cached_page(STATIC_PAGE_TTL)
 def help_center():
     """Render the help center page"""
     return render_template('static/help_center.html')
 
 @static_pages.route('/contact')
+@cached_page(STATIC_PAGE_TTL)
 def contact():
     """Render the contact page"""
     return render_template('static/contact.html')
 
 @static_pages.route('/faq')
+@cached_page(STATIC_PAGE_TTL)
 def faq():
     """Render the FAQ page"""
     return render_template('static/faq.html')
 
 @static_pages.route('/terms')
+@cached_page(STATIC_PAGE_TTL)
 def terms():
     """Render the terms page"""
     return render_template('static/terms.html')
 
 @static_pages.route('/privacy')
+@cached_page(STATIC_PAGE_TTL)
 def privacy():
     """Render the privacy policy page"""
     return render_template('static/privacy.html')
 
 @static_pages.route('/cookie-policy')
+@cached_page(STATIC_PAGE_TTL)
 def cookie_policy():
     """Render the cookie policy page"""
     return render_template('static/cookie.html')
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""Tag autocomplete.
+
+Tag names live in an in-process prefix trie. Each node keeps its most
+popular completions, with popularity being the number of videos carrying
+the tag, so a lookup is a walk of ``len(prefix)`` nodes and never touches
+the database. Multi-word tags are also reachable from the start of each
+word ("learning" finds "machine learning").
+
+The trie is loaded from the database with one grouped query in a
+background thread, started when the app is set up. It is reloaded every
+TAG_INDEX_REFRESH seconds so other processes' tags show up; until the first
+load completes, lookups are served by ``search_tags_db``. Tags created in this process are added straight away through
+``tag_index.add``.
+
+``search_tags_db`` is the fallback when the trie cannot be loaded. It is
+served by the prefix (text_pattern_ops) and trigram indexes on
+``tag.name`` that ``add_tag_search_index.py`` adds.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import func, or_
+
+from extensions import db
+from models import Tag, VideoTag
+
+logger = logging.getLogger(__name__)
+
+TAG_INDEX_REFRESH = 5 * 60  # seconds
+TAG_INDEX_RETRY = 10  # seconds before retrying a failed load; doubles per failure
+TOP_COMPLETIONS = 20  # completions cached per trie node
+DEFAULT_LIMIT = 10
+
+
+class _Node:
+    __slots__ = ('children', 'ends', 'names', 'top', 'dirty')
+
+    def __init__(self) -> None:
+        self.children: Dict[str, '_Node'] = {}
+        self.ends: List[str] = []  # tag names whose key ends at this node
+        self.names = 0  # tag names in this subtree
+        self.top: List[str] = []
+        self.dirty = False
+
+
+class TagTrie:
+    """Prefix trie of tag names with per-node top completions by popularity"""
+
+    def __init__(self, top_k: int = TOP_COMPLETIONS) -> None:
+        self.top_k = top_k
+        self.tags: Dict[str, Dict] = {}
+        self.names_by_id: Dict[int, str] = {}
+        self._root = _Node()
+
+    @staticmethod
+    def _keys(name: str) -> List[str]:
+        words = name.split()
+        return list(dict.fromkeys(' '.join(words[index:]) for index in range(len(words)))) or [name]
+
+    def _rank(self, name: str):
+        tag = self.tags[name]
+        return (-tag['count'], name)
+
+    def _path(self, key: str, create: bool = False) -> List[_Node]:
+        nodes = [self._root]
+        node = self._root
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return []
+                child = node.children[char] = _Node()
+            nodes.append(child)
+            node = child
+        return nodes
+
+    def _offer(self, node: _Node, name: str) -> None:
+        """Place ``name`` in a node's top list if it ranks high enough"""
+        if name in node.top:
+            node.top.sort(key=self._rank)
+            return
+        if len(node.top) < self.top_k or self._rank(name) < self._rank(node.top[-1]):
+            node.top.append(name)
+            node.top.sort(key=self._rank)
+            del node.top[self.top_k:]
+
+    def add(self, tag_id: int, name: str, tag_type: Optional[str] = None, count: Optional[int] = None) -> None:
+        """Insert a tag, or update its id, type and (if given) count if already present"""
+        name = name.strip().lower()
+        if not name:
+            return
+        self.names_by_id[tag_id] = name
+        if name in self.tags:
+            self.tags[name].update(id=tag_id, type=tag_type or self.tags[name]['type'])
+            if count is not None:
+                self.adjust(name, count - self.tags[name]['count'])
+            return
+
+        self.tags[name] = {'id': tag_id, 'name': name, 'type': tag_type, 'count': count or 0}
+        for key in self._keys(name):
+            path = self._path(key, create=True)
+            path[-1].ends.append(name)
+            for node in path:
+                node.names += 1
+                self._offer(node, name)
+
+    def adjust(self, name: str, delta: int) -> None:
+        """Change a tag's popularity by ``delta``"""
+        name = name.strip().lower()
+        if name not in self.tags or not delta:
+            return
+        self.tags[name]['count'] = max(self.tags[name]['count'] + delta, 0)
+        for key in self._keys(name):
+            for node in self._path(key):
+                if delta > 0:
+                    self._offer(node, name)
+                elif name in node.top:
+                    # A better name outside the cached list may now outrank it
+                    node.dirty = node.names > len(node.top)
+                    node.top.sort(key=self._rank)
+
+    def _collect(self, node: _Node) -> List[str]:
+        """Every name in a subtree, best ranked first"""
+        names = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            names.update(current.ends)
+            stack.extend(current.children.values())
+        return sorted(names, key=self._rank)
+
+    def complete(self, prefix: str, limit: int = DEFAULT_LIMIT, tag_type: Optional[str] = None) -> List[Dict]:
+        """Most popular tags with a word starting with ``prefix``"""
+        path = self._path(prefix.strip().lower())
+        if not path:
+            return []
+        node = path[-1]
+        if node.dirty:
+            node.top = self._collect(node)[:self.top_k]
+            node.dirty = False
+
+        names = node.top
+        if (tag_type is not None or limit > len(names)) and node.names > len(names):
+            # Type filters and long lists need the whole subtree, not just the cached head
+            names = self._collect(node)
+        matches = [self.tags[name] for name in names if tag_type is None or self.tags[name]['type'] == tag_type]
+        return [dict(tag) for tag in matches[:limit]]
+
+
+class TagIndex:
+    """Process-wide tag trie, loaded and refreshed in a background thread.
+
+    A load builds a new trie without holding the lock and swaps it in, so
+    lookups keep using the previous trie (or the database, before the first
+    load) meanwhile. A failed load is retried after a growing backoff.
+    """
+
+    def __init__(self, refresh_interval: float = TAG_INDEX_REFRESH) -> None:
+        self.refresh_interval = refresh_interval
+        self.app = None
+        self._trie: Optional[TagTrie] = None
+        self._loaded_at = 0.0
+        self._loading = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._added: List[tuple] = []  # tags added while a load is in flight
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """Start loading the trie as soon as the app is up"""
+        self.app = app
+        self._schedule_load()
+
+    def _load(self) -> TagTrie:
+        trie = TagTrie()
+        rows = db.session.query(
+            Tag.id, Tag.name, Tag.type, func.count(VideoTag.id)
+        ).outerjoin(VideoTag, VideoTag.tag_id == Tag.id).group_by(Tag.id).all()
+        for tag_id, name, tag_type, count in rows:
+            trie.add(tag_id, name, tag_type, count)
+        logger.info(f"Loaded {len(trie.tags)} tags into the autocomplete index")
+        return trie
+
+    def _run_load(self, app) -> None:
+        try:
+            with app.app_context():
+                trie = self._load()
+        except Exception as e:
+            with self._lock:
+                self._loading = False
+                self._failures += 1
+                backoff = min(TAG_INDEX_RETRY * 2 ** (self._failures - 1), self.refresh_interval)
+                self._retry_at = time.monotonic() + backoff
+                self._added = []
+            logger.error(f"Error loading the tag index, retrying in {backoff:.0f}s: {str(e)}")
+            return
+
+        with self._lock:
+            # Tags created in this process since the query started
+            for tag_id, name, tag_type in self._added:
+                trie.add(tag_id, name, tag_type)
+            self._added = []
+            self._trie = trie
+            self._loaded_at = time.monotonic()
+            self._loading = False
+            self._failures = 0
+
+    def _schedule_load(self) -> None:
+        """Start a background load if one is due and none is running"""
+        now = time.monotonic()
+        with self._lock:
+            if self._loading or now < self._retry_at:
+                return
+            if self._trie is not None and now - self._loaded_at <= self.refresh_interval:
+                return
+            self._loading = True
+        app = self.app or current_app._get_current_object()
+        thread = threading.Thread(target=self._run_load, args=(app,), name='tag-index-load', daemon=True)
+        thread.start()
+
+    def autocomplete(self, prefix: str, limit: int = DEFAULT_LIMIT, tag_type: Optional[str] = None) -> List[Dict]:
+        """Tags matching ``prefix``, most used first; falls back to the database"""
+        try:
+            self._schedule_load()
+            with self._lock:
+                if self._trie is not None:
+                    return self._trie.complete(prefix, limit, tag_type)
+        except Exception as e:
+            logger.error(f"Tag index unavailable, searching the database: {str(e)}")
+        return search_tags_db(prefix, limit, tag_type)
+
+    def add(self, tag_id: int, name: str, tag_type: Optional[str] = None) -> None:
+        """Make a newly created tag available to autocomplete in this process"""
+        with self._lock:
+            if self._loading:
+                self._added.append((tag_id, name, tag_type))
+            if self._trie is not None:
+                self._trie.add(tag_id, name, tag_type)
+
+    def adjust(self, name: str, delta: int) -> None:
+        """Record tag usage added (positive) or removed (negative)"""
+        with self._lock:
+            if self._trie is not None:
+                self._trie.adjust(name, delta)
+
+    def adjust_ids(self, tag_ids: Iterable[int], delta: int) -> None:
+        """Record usage changes for tags known by id"""
+        with self._lock:
+            if self._trie is not None:
+                for tag_id in tag_ids:
+                    name = self._trie.names_by_id.get(tag_id)
+                    if name is not None:
+                        self._trie.adjust(name, delta)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._trie = None
+            self._retry_at = 0.0
+
+
+def search_tags_db(prefix: str, limit: int = DEFAULT_LIMIT, tag_type: Optional[str] = None) -> List[Dict]:
+    """Indexed word-prefix search on tag.name, most used first"""
+    usage = db.session.query(
+        VideoTag.tag_id, func.count(VideoTag.id).label('count')
+    ).group_by(VideoTag.tag_id).subquery()
+
+    query = db.session.query(
+        Tag.id, Tag.name, Tag.type, func.coalesce(usage.c.count, 0)
+    ).outerjoin(usage, usage.c.tag_id == Tag.id)
+    prefix = prefix.strip().lower()
+    if prefix:
+        # Same word-start semantics as the trie; the second pattern is served by the trigram index
+        query = query.filter(or_(Tag.name.like(f"{prefix}%"), Tag.name.like(f"% {prefix}%")))
+    if tag_type is not None:
+        query = query.filter(Tag.type == tag_type)
+    rows = query.order_by(func.coalesce(usage.c.count, 0).desc(), Tag.name).limit(limit).all()
+    return [{'id': tag_id, 'name': name, 'type': kind, 'count': count}
+            for tag_id, name, kind, count in rows]
+
+
+tag_index = TagIndex()
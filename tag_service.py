@@ -0,0 +1,151 @@
+"""Tag writes.
+
+``resolve_tags`` turns any number of tag names into ids with at most two
+statements: one ``INSERT ... ON CONFLICT (name) DO NOTHING RETURNING`` for
+the new names, and one SELECT for the names that already existed.
+``add_tags`` and ``replace_tags`` change the video_tag / playlist_tag rows
+of one video or playlist. They diff against the current rows, so only
+added rows are inserted and only removed rows are deleted, each in one
+bulk statement.
+
+None of these functions commit. Once the caller has committed, it passes the
+result to ``publish``. That lets the autocomplete index see new tags and usage
+changes, and marks the affected candidates' embeddings stale.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from extensions import db
+from models import PlaylistTag, Tag, VideoTag
+from tag_index import tag_index
+from candidate_embeddings import mark_video_owners_stale
+
+logger = logging.getLogger(__name__)
+
+MAX_TAG_LENGTH = 50
+DEFAULT_TAG_TYPE = 'user'
+
+# Association model -> the column naming its owner
+_OWNER_COLUMNS = {
+    VideoTag: 'video_id',
+    PlaylistTag: 'playlist_id',
+}
+
+
+class TagChanges:
+    """What a write created and changed, for ``publish`` after commit"""
+
+    def __init__(self) -> None:
+        self.created: List[Dict] = []
+        self.added: Set[int] = set()
+        self.removed: Set[int] = set()
+        self.counts_usage = False
+        self.video_ids: Set[int] = set()  # videos whose tags changed
+
+
+def normalize_tag_name(name) -> Optional[str]:
+    """Lowercase, collapse whitespace and bound the length; None if nothing is left"""
+    if not isinstance(name, str):
+        return None
+    name = ' '.join(name.split()).lower()[:MAX_TAG_LENGTH]
+    return name or None
+
+
+def resolve_tags(names: Dict[str, str], changes: Optional[TagChanges] = None) -> Dict[str, int]:
+    """Map tag names to ids, creating missing tags.
+
+    ``names`` maps each name to the type to create it with; existing tags keep
+    their type. Returns {normalized name: id}.
+    """
+    wanted = {}
+    for name, tag_type in names.items():
+        normalized = normalize_tag_name(name)
+        if normalized and normalized not in wanted:
+            wanted[normalized] = tag_type or DEFAULT_TAG_TYPE
+    if not wanted:
+        return {}
+
+    created = db.session.execute(
+        pg_insert(Tag.__table__)
+        .values([{'name': name, 'type': tag_type} for name, tag_type in wanted.items()])
+        .on_conflict_do_nothing(index_elements=['name'])
+        .returning(Tag.id, Tag.name, Tag.type)
+    ).all()
+    ids = {name: tag_id for tag_id, name, _ in created}
+    if changes is not None:
+        changes.created.extend({'id': tag_id, 'name': name, 'type': tag_type} for tag_id, name, tag_type in created)
+
+    existing = [name for name in wanted if name not in ids]
+    if existing:
+        ids.update({
+            name: tag_id for tag_id, name in db.session.execute(
+                select(Tag.id, Tag.name).where(Tag.name.in_(existing))
+            ).all()
+        })
+    return ids
+
+
+def _current_tag_ids(model, owner_id: int) -> Set[int]:
+    owner_column = getattr(model, _OWNER_COLUMNS[model])
+    return set(db.session.execute(
+        select(model.tag_id).where(owner_column == owner_id)
+    ).scalars())
+
+
+def add_tags(model, owner_id: int, tag_ids: Iterable[int], changes: Optional[TagChanges] = None,
+             **values) -> Set[int]:
+    """Attach tags to a video or playlist in one insert; returns the ids newly attached.
+
+    ``values`` sets extra association columns, e.g. ``ai_suggested=True``.
+    """
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return set()
+    owner_field = _OWNER_COLUMNS[model]
+    added = set(db.session.execute(
+        pg_insert(model.__table__)
+        .values([{owner_field: owner_id, 'tag_id': tag_id, **values} for tag_id in sorted(tag_ids)])
+        .on_conflict_do_nothing(index_elements=[owner_field, 'tag_id'])
+        .returning(model.tag_id)
+    ).scalars())
+    if changes is not None:
+        changes.added |= added
+        if model is VideoTag and added:
+            changes.counts_usage = True
+            changes.video_ids.add(owner_id)
+    return added
+
+
+def replace_tags(model, owner_id: int, tag_ids: Iterable[int], changes: Optional[TagChanges] = None,
+                 **values) -> TagChanges:
+    """Make a video's or playlist's tags exactly ``tag_ids``, touching only the difference"""
+    changes = changes or TagChanges()
+    wanted = {int(tag_id) for tag_id in tag_ids}
+    current = _current_tag_ids(model, owner_id)
+
+    removed = current - wanted
+    if removed:
+        owner_column = getattr(model, _OWNER_COLUMNS[model])
+        db.session.execute(
+            model.__table__.delete().where(owner_column == owner_id, model.tag_id.in_(removed))
+        )
+        changes.removed |= removed
+        if model is VideoTag:
+            changes.counts_usage = True
+            changes.video_ids.add(owner_id)
+
+    add_tags(model, owner_id, wanted - current, changes, **values)
+    return changes
+
+
+def publish(changes: TagChanges) -> None:
+    """Feed committed tag changes to the autocomplete index and candidate embeddings"""
+    for tag in changes.created:
+        tag_index.add(tag['id'], tag['name'], tag['type'])
+    if changes.counts_usage:
+        tag_index.adjust_ids(changes.added, 1)
+        tag_index.adjust_ids(changes.removed, -1)
+    mark_video_owners_stale(changes.video_ids)
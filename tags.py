@@ -1,13 +1,19 @@
 from flask import Blueprint, jsonify, request, current_app
 from flask_login import login_required, current_user
 from models import Tag, Video, VideoTag, Playlist, PlaylistTag, db
-from sqlalchemy import func, desc
 import logging
 from openai import OpenAI
+from tag_index import tag_index
+from tag_service import TagChanges, publish, replace_tags, resolve_tags
 
 tags = Blueprint('tags', __name__)
 logger = logging.getLogger(__name__)
 
+@tags.record_once
+def init_tag_index(state):
+    """Load the autocomplete trie in the background at startup"""
+    tag_index.init_app(state.app)
+
 @tags.route('/api/tags/suggest', methods=['POST'])
 @login_required
 def suggest_tags():
@@ -38,23 +44,16 @@ def suggest_tags():
             }]
         )
 
-        # Extract tags from AI response
+        # Extract tags from AI response and resolve them in one upsert
         suggested_tags = []
         if response.choices:
             ai_tags = response.choices[0].message.content.split(',')
             logger.info(f"Generated {len(ai_tags)} tags from AI")
-            for tag_name in ai_tags:
-                tag_name = tag_name.strip().lower()
-                # Create or get existing tag
-                tag = Tag.query.filter_by(name=tag_name, type='video').first()
-                if not tag:
-                    tag = Tag(name=tag_name, type='video')
-                    db.session.add(tag)
-                    db.session.commit()
-                suggested_tags.append({
-                    'id': tag.id,
-                    'name': tag.name
-                })
+            changes = TagChanges()
+            tag_ids = resolve_tags({tag_name: 'video' for tag_name in ai_tags}, changes)
+            db.session.commit()
+            publish(changes)
+            suggested_tags = [{'id': tag_id, 'name': tag_name} for tag_name, tag_id in tag_ids.items()]
 
         return jsonify({
             'success': True,
@@ -63,6 +62,7 @@ def suggest_tags():
 
     except Exception as e:
         logger.error(f"Error suggesting tags: {str(e)}")
+        db.session.rollback()
         return jsonify({
             'success': False,
             'message': 'Failed to generate tag suggestions'
@@ -77,25 +77,16 @@ def search_tags():
         tag_type = request.args.get('type', 'all')
         limit = int(request.args.get('limit', 10))
 
-        # Base query
-        tag_query = Tag.query
-
-        # Apply filters
-        if query:
-            tag_query = tag_query.filter(Tag.name.ilike(f'%{query}%'))
-        if tag_type != 'all':
-            tag_query = tag_query.filter(Tag.type == tag_type)
-
-        # Get most used tags first
-        tags = tag_query.join(VideoTag).group_by(Tag.id).order_by(desc(func.count(VideoTag.id))).limit(limit).all()
+        # Served from the in-memory prefix index, most used first
+        tags = tag_index.autocomplete(query, limit, None if tag_type == 'all' else tag_type)
 
         logger.info(f"Found {len(tags)} tags matching query: {query}")
         return jsonify({
             'success': True,
             'tags': [{
-                'id': tag.id,
-                'name': tag.name,
-                'type': tag.type
+                'id': tag['id'],
+                'name': tag['name'],
+                'type': tag['type']
             } for tag in tags]
         })
 
@@ -123,15 +114,10 @@ def update_video_tags(video_id):
         data = request.get_json()
         tag_ids = data.get('tags', [])
 
-        # Remove existing tags
-        VideoTag.query.filter_by(video_id=video_id).delete()
-
-        # Add new tags
-        for tag_id in tag_ids:
-            video_tag = VideoTag(video_id=video_id, tag_id=tag_id)
-            db.session.add(video_tag)
-
+        # Insert only added and delete only removed associations
+        changes = replace_tags(VideoTag, video_id, tag_ids)
         db.session.commit()
+        publish(changes)
         logger.info(f"Successfully updated tags for video {video_id}")
         return jsonify({
             'success': True,
@@ -163,15 +149,11 @@ def update_playlist_tags(playlist_id):
         data = request.get_json()
         tag_ids = data.get('tags', [])
 
-        # Remove existing tags
-        PlaylistTag.query.filter_by(playlist_id=playlist_id).delete()
-
-        # Add new tags
-        for tag_id in tag_ids:
-            playlist_tag = PlaylistTag(playlist_id=playlist_id, tag_id=tag_id)
-            db.session.add(playlist_tag)
-
+        # Insert only added and delete only removed associations
+        changes = replace_tags(PlaylistTag, playlist_id, tag_ids)
+        playlist.touch()
         db.session.commit()
+        publish(changes)
         logger.info(f"Successfully updated tags for playlist {playlist_id}")
         return jsonify({
             'success': True,
@@ -15,6 +15,16 @@ def test_static_pages_routes(client):
     response = client.get('/')
     assert response.status_code == 200
 
+def test_static_pages_revalidate_with_etag(client):
+    """Test that cached static pages answer a matching If-None-Match with 304"""
+    response = client.get('/pricing')
+    assert response.status_code == 200
+    assert response.headers.get('ETag')
+    assert b'__CSRF_TOKEN__' not in response.data
+
+    response = client.get('/pricing', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
 def test_auth_routes(client):
     """Test authentication routes"""
     routes = ['/auth/login', '/auth/signup', '/auth/forgot-password']
@@ -54,3 +64,52 @@ def test_blueprint_registration(app):
     registered_blueprints = [bp.name for bp in app.blueprints.values()]
     for blueprint in expected_blueprints:
         assert blueprint in registered_blueprints
+
+def test_playlist_view_query_count(app):
+    """Test that the playlist read model loads a playlist in a fixed number of queries"""
+    from sqlalchemy import event
+    from extensions import db
+    from models import User, Video, Playlist, PlaylistVideo, Tag, VideoTag, PlaylistTag
+    from playlist_read import load_playlist_view, PLAYLIST_VIEW_QUERIES
+
+    with app.app_context():
+        owner = User(email='owner@example.com', password_hash='x', user_type='jobseeker')
+        db.session.add(owner)
+        db.session.flush()
+        playlist = Playlist(user_id=owner.id, title='Reel')
+        db.session.add(playlist)
+        db.session.flush()
+        for index in range(5):
+            video = Video(user_id=owner.id, title=f'Video {index}', filename=f'video_{index}.mp4')
+            tag = Tag(name=f'tag-{index}')
+            db.session.add_all([video, tag])
+            db.session.flush()
+            db.session.add_all([
+                PlaylistVideo(playlist_id=playlist.id, video_id=video.id, position=(5 - index) * 1024),
+                VideoTag(video_id=video.id, tag_id=tag.id),
+                PlaylistTag(playlist_id=playlist.id, tag_id=tag.id),
+            ])
+        db.session.commit()
+        playlist_id = playlist.id
+        db.session.expunge_all()
+
+        statements = []
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        try:
+            view = load_playlist_view(playlist_id)
+            # Everything the templates touch must already be loaded
+            for video, position in view['playlist_videos']:
+                video.user.email
+                [video_tag.tag.name for video_tag in video.video_tags]
+            [tag.name for tag in view['tags']]
+            view['playlist'].user.email
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+        assert len(statements) <= PLAYLIST_VIEW_QUERIES
+        positions = [position for _, position in view['playlist_videos']]
+        assert positions == sorted(positions)
+        assert len(view['tags']) == 5
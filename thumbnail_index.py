@@ -0,0 +1,104 @@
+"""Filename -> video lookup for thumbnail requests.
+
+Replaces scanning the uploads directory on a thumbnail cache miss. Every
+thumbnail file name (canonical poster, size variants and sprite files) maps
+back to its canonical ``Video.thumbnail`` value, which is resolved with one
+indexed query and then remembered in a bounded in-process LRU map.
+Misses are remembered only for MISS_TTL seconds, so a video saved after a
+request for its thumbnail is found again shortly.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from models import Video
+from thumbnails import thumbnail_base
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+MISS_TTL = 30.0  # seconds a name with no video is remembered
+
+
+def canonical_thumbnail_name(filename: str) -> str:
+    """Map any engine output file name back to the canonical <base>_thumb.jpg"""
+    base = thumbnail_base(filename)
+    for suffix in ('_sprite',):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    if '_thumb_' in base:
+        base = base.rsplit('_thumb_', 1)[0]
+    return f"{base}_thumb.jpg"
+
+
+class ThumbnailIndex:
+    """Bounded LRU map from canonical thumbnail name to video id"""
+
+    def __init__(self, max_entries: int = 10000, regeneration_cooldown: float = 600.0,
+                 miss_ttl: float = MISS_TTL) -> None:
+        self.max_entries = max_entries
+        self.regeneration_cooldown = regeneration_cooldown
+        self.miss_ttl = miss_ttl
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._misses: "OrderedDict[str, float]" = OrderedDict()  # name -> expiry
+        self._regeneration_requests: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, filename: str) -> Optional[int]:
+        """Return the id of the video owning a thumbnail file, or None"""
+        canonical = canonical_thumbnail_name(filename)
+        with self._lock:
+            video_id = self._entries.get(canonical, _MISSING)
+            if video_id is not _MISSING:
+                self._entries.move_to_end(canonical)
+                return video_id
+            expires_at = self._misses.get(canonical)
+            if expires_at is not None:
+                if time.monotonic() < expires_at:
+                    return None
+                del self._misses[canonical]
+
+        row = Video.query.with_entities(Video.id).filter(Video.thumbnail == canonical).first()
+        video_id = row[0] if row else None
+        self.remember(canonical, video_id)
+        return video_id
+
+    def remember(self, thumbnail: str, video_id: Optional[int]) -> None:
+        """Remember a thumbnail's video, or for ``miss_ttl`` seconds that it has none"""
+        with self._lock:
+            if video_id is None:
+                self._entries.pop(thumbnail, None)
+                self._misses[thumbnail] = time.monotonic() + self.miss_ttl
+                self._misses.move_to_end(thumbnail)
+                while len(self._misses) > self.max_entries:
+                    self._misses.popitem(last=False)
+                return
+            self._misses.pop(thumbnail, None)
+            self._entries[thumbnail] = video_id
+            self._entries.move_to_end(thumbnail)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, thumbnail: str) -> None:
+        with self._lock:
+            self._entries.pop(thumbnail, None)
+            self._misses.pop(thumbnail, None)
+
+    def should_regenerate(self, video_id: int) -> bool:
+        """Throttle regeneration requests so repeated misses queue at most one job"""
+        now = time.monotonic()
+        with self._lock:
+            requested_at = self._regeneration_requests.get(video_id)
+            if requested_at is not None and now - requested_at < self.regeneration_cooldown:
+                return False
+            self._regeneration_requests[video_id] = now
+            self._regeneration_requests.move_to_end(video_id)
+            while len(self._regeneration_requests) > self.max_entries:
+                self._regeneration_requests.popitem(last=False)
+            return True
+
+
+# Initialize the global thumbnail index
+thumbnail_index = ThumbnailIndex()
@@ -0,0 +1,140 @@
+"""Single-pass thumbnail engine.
+
+Decodes a video once with ffmpeg and writes every thumbnail the UI needs from
+that one run: a poster frame at several widths in JPEG and WebP, plus a
+seek-preview sprite sheet with a WebVTT index mapping time ranges to tiles.
+"""
+import logging
+import math
+import os
+
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMATS = ('jpg', 'webp')
+DEFAULT_WIDTH = 640  # the canonical <name>_thumb.jpg is the 640px JPEG
+
+SPRITE_TILE_WIDTH = 160
+SPRITE_COLUMNS = 10
+SPRITE_MAX_TILES = 100
+
+
+def thumbnail_base(thumbnail_filename):
+    """Strip the canonical suffix from a thumbnail filename"""
+    if thumbnail_filename.endswith('_thumb.jpg'):
+        return thumbnail_filename[:-len('_thumb.jpg')]
+    return os.path.splitext(thumbnail_filename)[0]
+
+
+def variant_filename(thumbnail_filename, width, fmt='jpg'):
+    """Filename of one size/format variant of a thumbnail"""
+    if width == DEFAULT_WIDTH and fmt == 'jpg':
+        return thumbnail_filename
+    return f"{thumbnail_base(thumbnail_filename)}_thumb_{width}.{fmt}"
+
+
+def sprite_filename(thumbnail_filename):
+    return f"{thumbnail_base(thumbnail_filename)}_sprite.jpg"
+
+
+def sprite_vtt_filename(thumbnail_filename):
+    return f"{thumbnail_base(thumbnail_filename)}_sprite.vtt"
+
+
+def all_thumbnail_files(thumbnail_filename):
+    """Every file the engine may have written for a thumbnail"""
+    files = [variant_filename(thumbnail_filename, width, fmt)
+             for width in THUMBNAIL_WIDTHS for fmt in THUMBNAIL_FORMATS]
+    files.append(sprite_filename(thumbnail_filename))
+    files.append(sprite_vtt_filename(thumbnail_filename))
+    return files
+
+
+def sprite_layout(duration):
+    """Return (interval, tile_count, columns, rows) for a sprite sheet"""
+    interval = max(1, math.ceil(duration / SPRITE_MAX_TILES))
+    tile_count = max(1, math.ceil(duration / interval))
+    columns = min(SPRITE_COLUMNS, tile_count)
+    rows = math.ceil(tile_count / columns)
+    return interval, tile_count, columns, rows
+
+
+def _vtt_timestamp(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def build_sprite_vtt(sprite_name, duration, width, height):
+    """Build the WebVTT cue list pointing each time range at its sprite tile"""
+    interval, tile_count, columns, _ = sprite_layout(duration)
+    tile_height = 2 * round(SPRITE_TILE_WIDTH * height / width / 2)
+
+    lines = ['WEBVTT', '']
+    for index in range(tile_count):
+        start = index * interval
+        end = min((index + 1) * interval, duration)
+        x = (index % columns) * SPRITE_TILE_WIDTH
+        y = (index // columns) * tile_height
+        lines.append(f"{_vtt_timestamp(start)} --> {_vtt_timestamp(end)}")
+        lines.append(f"{sprite_name}#xywh={x},{y},{SPRITE_TILE_WIDTH},{tile_height}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def generate_thumbnail_set(video_path, thumbnails_dir, thumbnail_filename, timestamp,
+                           duration=None, width=None, height=None):
+    """Write all poster sizes and the sprite sheet from a single ffmpeg run.
+
+    The sprite sheet and VTT are only produced when duration and frame size
+    are known. Returns the list of widths written.
+    """
+    os.makedirs(thumbnails_dir, exist_ok=True)
+    with_sprite = bool(duration and width and height)
+
+    source = ffmpeg.input(video_path)
+    branches = source.video.split()
+
+    # Poster frame, scaled to every width and encoded in every format
+    poster = branches[0].trim(start=timestamp, end=timestamp + 1).setpts('PTS-STARTPTS')
+    poster_sizes = poster.split()
+    outputs = []
+    written = []
+    for size_index, target_width in enumerate(THUMBNAIL_WIDTHS):
+        scaled = poster_sizes[size_index].filter('scale', target_width, -2).split()
+        for format_index, fmt in enumerate(THUMBNAIL_FORMATS):
+            path = os.path.join(thumbnails_dir, variant_filename(thumbnail_filename, target_width, fmt))
+            outputs.append(ffmpeg.output(scaled[format_index], path, vframes=1))
+            written.append(path)
+
+    if with_sprite:
+        interval, _, columns, rows = sprite_layout(duration)
+        sprite = branches[1]\
+            .filter('fps', fps=f"1/{interval}")\
+            .filter('scale', SPRITE_TILE_WIDTH, -2)\
+            .filter('tile', f"{columns}x{rows}")
+        sprite_path = os.path.join(thumbnails_dir, sprite_filename(thumbnail_filename))
+        outputs.append(ffmpeg.output(sprite, sprite_path, vframes=1))
+        written.append(sprite_path)
+
+    ffmpeg.run(ffmpeg.merge_outputs(*outputs), overwrite_output=True,
+               capture_stdout=True, capture_stderr=True)
+
+    for path in written:
+        if os.path.exists(path):
+            os.chmod(path, 0o644)
+
+    canonical = os.path.join(thumbnails_dir, thumbnail_filename)
+    if not os.path.exists(canonical) or os.path.getsize(canonical) == 0:
+        raise RuntimeError("ffmpeg did not produce the poster thumbnail")
+
+    if with_sprite:
+        vtt_path = os.path.join(thumbnails_dir, sprite_vtt_filename(thumbnail_filename))
+        with open(vtt_path, 'w') as vtt_file:
+            vtt_file.write(build_sprite_vtt(sprite_filename(thumbnail_filename), duration, width, height))
+        os.chmod(vtt_path, 0o644)
+
+    logger.info(f"Generated {len(written)} thumbnail outputs for {video_path}")
+    return list(THUMBNAIL_WIDTHS)
@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, send_from_directory
+from flask import Blueprint, jsonify
 from flask_login import login_required, current_user
 from extensions import db
+from media import send_media, ONE_DAY
 import os
 
 tutorial = Blueprint('tutorial', __name__)
@@ -28,6 +29,7 @@ def skip_tutorial():
 def serve_tutorial_video(filename):
     """Serve tutorial video files"""
     try:
-        return send_from_directory(TUTORIAL_VIDEOS_DIR, filename)
+        # Tutorial clips keep fixed names, so rely on ETag revalidation rather than immutable caching
+        return send_media(TUTORIAL_VIDEOS_DIR, filename, max_age=ONE_DAY, immutable=False)
     except:
         return jsonify({'error': 'Video not found'}), 404
@@ -0,0 +1,146 @@
+"""Per-user summary provider for dashboards and navigation.
+
+Counts and sums (videos, views, likes, playlists, messages) live in one
+materialized ``user_summary`` row per user. The row is recomputed with a
+single statement of COUNT/SUM subqueries whenever an upload, like, message
+or profile event touches it, and is also recomputed if it is older than
+SUMMARY_MAX_AGE so buffered view counts catch up. Reads go through a short
+cache, so a page view costs at most one primary-key lookup. The cache is
+shared through Redis when ``CACHE_REDIS_URL`` is set, so a refresh in one
+app process is seen by all; otherwise other processes may serve the old
+counts for up to SUMMARY_CACHE_TTL.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from cache import make_cache
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MAX_AGE = timedelta(minutes=10)
+SUMMARY_CACHE_TTL = 30  # seconds
+
+SUMMARY_FIELDS = ('video_count', 'total_views', 'total_likes', 'playlist_count',
+                  'message_count', 'unread_message_count')
+
+summary_cache = make_cache('user_summary', ttl=SUMMARY_CACHE_TTL, max_entries=4096)
+
+_REFRESH_SUMMARY = '''
+    INSERT INTO user_summary (user_id, video_count, total_views, total_likes, playlist_count,
+                              message_count, unread_message_count, updated_at)
+    SELECT :user_id,
+           videos.video_count, videos.total_views, videos.total_likes,
+           (SELECT COUNT(*) FROM playlist WHERE user_id = :user_id),
+           messages.message_count, messages.unread_message_count,
+           :now
+    FROM (
+        SELECT COUNT(*) AS video_count,
+               COALESCE(SUM(views), 0) AS total_views,
+               COALESCE(SUM(likes), 0) AS total_likes
+        FROM video WHERE user_id = :user_id
+    ) AS videos,
+    (
+        SELECT COUNT(*) AS message_count,
+               COUNT(*) FILTER (WHERE NOT COALESCE(read, FALSE)) AS unread_message_count
+        FROM message WHERE receiver_id = :user_id
+    ) AS messages
+    ON CONFLICT (user_id) DO UPDATE SET
+        video_count = EXCLUDED.video_count,
+        total_views = EXCLUDED.total_views,
+        total_likes = EXCLUDED.total_likes,
+        playlist_count = EXCLUDED.playlist_count,
+        message_count = EXCLUDED.message_count,
+        unread_message_count = EXCLUDED.unread_message_count,
+        updated_at = EXCLUDED.updated_at
+    RETURNING video_count, total_views, total_likes, playlist_count,
+              message_count, unread_message_count, updated_at
+'''
+
+
+def _cacheable(row) -> Dict:
+    """A summary row as a JSON-safe dict, so it can be held in a shared cache"""
+    summary = dict(row)
+    summary['updated_at'] = summary['updated_at'].isoformat() if summary['updated_at'] else None
+    return summary
+
+
+def _empty_summary() -> Dict:
+    summary = {field: 0 for field in SUMMARY_FIELDS}
+    summary['updated_at'] = None
+    return summary
+
+
+def refresh_user_summary(user_id: Optional[int]) -> Dict:
+    """Recompute and store a user's summary row.
+
+    Runs on its own connection, so it can be called right after a route
+    commits without touching the request's session.
+    """
+    if user_id is None:
+        return _empty_summary()
+    try:
+        with db.engine.begin() as connection:
+            row = connection.execute(
+                text(_REFRESH_SUMMARY), {'user_id': user_id, 'now': datetime.utcnow()}
+            ).mappings().one()
+        summary = _cacheable(row)
+        summary_cache.set(user_id, summary)
+        return summary
+    except Exception as e:
+        logger.error(f"Error refreshing summary for user {user_id}: {str(e)}")
+        summary_cache.delete(user_id)
+        return _empty_summary()
+
+
+def _load_summary(user_id: int) -> Dict:
+    row = db.session.execute(text('''
+        SELECT video_count, total_views, total_likes, playlist_count,
+               message_count, unread_message_count, updated_at
+        FROM user_summary WHERE user_id = :user_id
+    '''), {'user_id': user_id}).mappings().first()
+    if row is None or row['updated_at'] is None or row['updated_at'] < datetime.utcnow() - SUMMARY_MAX_AGE:
+        return refresh_user_summary(user_id)
+    return _cacheable(row)
+
+
+def get_user_summary(user_id: int) -> Dict:
+    """Counts and sums for a user, from cache, the summary row, or a fresh recompute"""
+    return summary_cache.get_or_set(user_id, lambda: _load_summary(user_id))
+
+
+def profile_completion(user, summary: Dict) -> Dict:
+    """Completion percentage and outstanding to-dos for a job seeker profile"""
+    checklist = [
+        (bool(user.profile_picture), "Add a profile picture"),
+        (bool(user.linkedin_url), "Link your LinkedIn profile"),
+        (summary['video_count'] > 0, "Upload your first video resume"),
+        (not hasattr(user, 'title') or bool(user.title), "Add your professional title"),
+    ]
+    completed = sum(1 for done, _ in checklist if done)
+    return {
+        'percentage': int((completed / len(checklist)) * 100),
+        'todos': [todo for done, todo in checklist if not done]
+    }
+
+
+def visibility_score(user, summary: Dict) -> Dict:
+    """How discoverable a job seeker is to employers, with suggested improvements"""
+    checks = [
+        (bool(user.profile_picture), 20, "Profile picture uploaded",
+         "Add a profile picture to increase visibility"),
+        (summary['video_count'] > 0, 30, "Video resume uploaded",
+         "Create a video resume to showcase your skills"),
+        (bool(user.linkedin_url), 20, "LinkedIn profile connected",
+         "Link your LinkedIn profile"),
+        (bool(getattr(user, 'title', None)), 30, "Professional title added",
+         "Add your professional title"),
+    ]
+    return {
+        'score': sum(points for done, points, _, _ in checks if done),
+        'factors': [factor for done, _, factor, _ in checks if done],
+        'improvements': [improvement for done, _, _, improvement in checks if not done]
+    }
@@ -2,8 +2,21 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from flask_wtf.csrf import generate_csrf
 from werkzeug.utils import secure_filename
-from models import Video, VideoLike, User, Tag, VideoTag
+from werkzeug.exceptions import ClientDisconnected, NotFound
+from models import Video, VideoLike, User, Tag, VideoTag, VideoUpload, VideoJob, Playlist
 from extensions import db
+from job_queue import enqueue_ingest, enqueue_job, enqueue_unique, get_video_jobs, JOB_COMPLETED
+from thumbnail_index import thumbnail_index
+from media import send_media, ONE_YEAR
+from hls import HLS_DIR, remove_hls
+from counters import toggle_like, view_buffer
+from tag_index import tag_index
+from tag_service import TagChanges, add_tags, normalize_tag_name, publish, replace_tags, resolve_tags
+from view_stats import viewer_type_for
+from user_summary import refresh_user_summary
+from candidate_embeddings import mark_candidates_stale
+from render import edit_spec, normalize_edl, rendered_filename, update_render_cache
+from thumbnails import DEFAULT_WIDTH, THUMBNAIL_WIDTHS, variant_filename, all_thumbnail_files
 from sqlalchemy import desc, exc as SQLAlchemyError, func
 from openai import OpenAI
 import os
@@ -12,9 +25,9 @@ import uuid
 import ffmpeg
 import logging
 import shutil
-from datetime import datetime
+import fcntl
+from datetime import datetime, timedelta
 import json
-import tempfile
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,11 +38,27 @@ VIDEOS_DIR = 'static/uploads/videos'
 THUMBNAILS_DIR = 'static/uploads/thumbnails'
 ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi', 'webm', 'mkv'}
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB chunks suggested to clients
+STREAM_BUFFER_SIZE = 1024 * 1024  # 1MB read buffer when appending chunks
+UPLOAD_EXPIRY = timedelta(hours=24)  # idle time after which an upload and its .part file are removed
+UPLOAD_CLEANUP_INTERVAL = 60 * 60  # seconds between expired upload sweeps in the worker
+UPLOAD_CLEANUP_BATCH = 500
 DEFAULT_THUMBNAIL = 'static/default-thumbnail.jpg'
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def processing_response(new_video, message='Video uploaded successfully! Processing has started.'):
+    """Build the JSON response returned while a new video is being processed"""
+    return jsonify({
+        'success': True,
+        'status': new_video.status,
+        'message': message,
+        'video_id': new_video.id,
+        'status_url': url_for('video.video_status', video_id=new_video.id),
+        'redirect_url': url_for('video.view', video_id=new_video.id)
+    })
+
 def ensure_directory_permissions():
     """Ensure upload directories exist with proper permissions"""
     try:
@@ -142,12 +171,7 @@ def upload_existing():
                 os.chmod(video_path, 0o644)
                 logger.info(f"Video file saved successfully: {video_path}")
 
-                # Generate thumbnail
-                success, error = generate_thumbnail(video_path, thumbnail_path)
-                if not success:
-                    logger.warning(f"Thumbnail generation warning: {error}")
-
-                # Create video record
+                # Create video record and queue thumbnail/probe work
                 try:
                     new_video = Video(
                         title=title,
@@ -158,14 +182,12 @@ def upload_existing():
                         script_content=script_content if script_content else None
                     )
                     db.session.add(new_video)
-                    db.session.commit()
+                    enqueue_ingest(new_video)
+                    refresh_user_summary(new_video.user_id)
+                    mark_candidates_stale([new_video.user_id])
                     logger.info(f"Video record created successfully: {new_video.id}")
 
-                    return jsonify({
-                        'success': True,
-                        'message': 'Video uploaded successfully!',
-                        'redirect_url': url_for('video.view', video_id=new_video.id)
-                    })
+                    return processing_response(new_video)
 
                 except Exception as e:
                     logger.error(f"Database error: {str(e)}")
@@ -276,12 +298,7 @@ def upload_post():
                         'message': 'Failed to save video file'
                     }), 500
 
-                # Generate thumbnail
-                success, error = generate_thumbnail(video_path, thumbnail_path)
-                if not success:
-                    logger.warning(f"Thumbnail generation warning: {error}")
-
-                # Create video record
+                # Create video record and queue thumbnail/probe work
                 try:
                     new_video = Video(
                         title=title,
@@ -292,13 +309,11 @@ def upload_post():
                         script_content=script_content if script_content else None
                     )
                     db.session.add(new_video)
-                    db.session.commit()
+                    enqueue_ingest(new_video)
+                    refresh_user_summary(new_video.user_id)
+                    mark_candidates_stale([new_video.user_id])
 
-                    return jsonify({
-                        'success': True,
-                        'message': 'Video uploaded successfully!',
-                        'redirect_url': url_for('video.view', video_id=new_video.id)
-                    })
+                    return processing_response(new_video)
 
                 except Exception as e:
                     logger.error(f"Database error: {str(e)}")
@@ -325,24 +340,61 @@ def upload_post():
             'message': 'An unexpected error occurred'
         }), 500
 
+def probe_video(video_path):
+    """Run ffprobe once and return the metadata stored on the Video record"""
+    probe = ffmpeg.probe(video_path)
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    if not video_stream:
+        return None
+
+    format_info = probe.get('format', {})
+    duration = format_info.get('duration') or video_stream.get('duration')
+    bitrate = format_info.get('bit_rate') or video_stream.get('bit_rate')
+
+    return {
+        'duration': float(duration) if duration else None,
+        'width': int(video_stream['width']),
+        'height': int(video_stream['height']),
+        'codec': video_stream.get('codec_name', 'unknown'),
+        'bitrate': int(bitrate) if bitrate else None,
+        'container': format_info.get('format_name'),
+        'has_audio': any(stream['codec_type'] == 'audio' for stream in probe['streams'])
+    }
+
+def apply_video_metadata(video_record, metadata):
+    """Copy probed metadata onto a Video record"""
+    for field in ('duration', 'width', 'height', 'codec', 'bitrate', 'container'):
+        setattr(video_record, field, metadata.get(field))
+
+def swap_rendered_file(video_record, filename, edl=None):
+    """Point a video at a rendered file and refresh everything derived from it"""
+    evicted = []
+    video_record.filename = filename
+    if edl:
+        video_record.render_cache, evicted = update_render_cache(video_record.render_cache, filename)
+    db.session.commit()
+
+    cleanup_files(*[os.path.join(VIDEOS_DIR, name) for name in evicted if name != filename])
+    enqueue_job(video_record.id, 'probe')
+    enqueue_unique(video_record.id, 'thumbnail')
+    enqueue_unique(video_record.id, 'package')
+
 def validate_video_format(video_path):
     try:
-        probe = ffmpeg.probe(video_path)
-        video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
-        if not video_stream:
+        metadata = probe_video(video_path)
+        if not metadata:
             return False, "No video stream found in the file", None
-
-        metadata = {
-            'width': int(video_stream['width']),
-            'height': int(video_stream['height']),
-            'duration': float(video_stream.get('duration', 0)),
-            'codec': video_stream.get('codec_name', 'unknown')
-        }
         return True, None, metadata
     except Exception as e:
         logger.error(f"Error validating video format: {str(e)}")
         return False, str(e), None
 
+def thumbnail_timestamp(duration):
+    """Pick a representative frame time that exists in a clip of this duration"""
+    if not duration or duration <= 0:
+        return 0
+    return min(1.0, duration / 2)
+
 def generate_thumbnail_at_timestamp(video_path, thumbnail_path, timestamp):
     try:
         logger.info(f"Generating thumbnail for {video_path} at timestamp {timestamp}s")
@@ -360,12 +412,13 @@ def generate_thumbnail_at_timestamp(video_path, thumbnail_path, timestamp):
         logger.error(f"Error generating thumbnail: {str(e)}")
         return False
 
-def generate_thumbnail(video_path, thumbnail_path):
+def generate_thumbnail(video_path, thumbnail_path, duration=None):
     logger.info(f"Generating thumbnail for {video_path}")
     os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
 
     try:
-        timestamps = [1, 5, 10]
+        # With a known duration one ffmpeg run is enough; otherwise fall back to the first frame
+        timestamps = [thumbnail_timestamp(duration)] if duration else [1, 0]
         for timestamp in timestamps:
             success = generate_thumbnail_at_timestamp(video_path, thumbnail_path, timestamp)
             if success and os.path.exists(thumbnail_path) and os.path.getsize(thumbnail_path) > 0:
@@ -381,6 +434,60 @@ def generate_thumbnail(video_path, thumbnail_path):
             logger.error(f"Error copying default thumbnail: {str(copy_error)}")
             return False, str(copy_error)
 
+@video.record_once
+def init_view_buffer(state):
+    """Give the view buffer an app so timed and exit flushes have a database"""
+    view_buffer.init_app(state.app)
+
+@video.app_template_global()
+def thumbnail_url(video_record, width=DEFAULT_WIDTH, fmt='jpg'):
+    """URL of the closest generated thumbnail variant for a video"""
+    if not video_record.thumbnail:
+        return url_for('static', filename='default-thumbnail.jpg')
+    widths = video_record.thumbnail_variants or []
+    if width not in widths:
+        return url_for('video.get_thumbnail', filename=video_record.thumbnail)
+    return url_for('video.get_thumbnail', filename=variant_filename(video_record.thumbnail, width, fmt))
+
+@video.app_template_global()
+def thumbnail_srcset(video_record, fmt='jpg'):
+    """srcset attribute value listing every generated width of a thumbnail"""
+    widths = [width for width in THUMBNAIL_WIDTHS if width in (video_record.thumbnail_variants or [])]
+    return ', '.join(
+        f"{url_for('video.get_thumbnail', filename=variant_filename(video_record.thumbnail, width, fmt))} {width}w"
+        for width in widths
+    )
+
+@video.app_template_global()
+def plyr_config(video_record):
+    """data-plyr-config JSON for a video's player, with seek previews once its sprite exists"""
+    config = {}
+    if video_record.preview_vtt:
+        config['previewThumbnails'] = {
+            'enabled': True,
+            'src': url_for('video.get_thumbnail', filename=video_record.preview_vtt),
+        }
+    return json.dumps(config)
+
+@video.app_template_global()
+def hls_url(video_record):
+    """URL of a video's HLS master playlist, or None until it has been packaged"""
+    if not video_record.hls_manifest:
+        return None
+    return url_for('video.serve_hls', filename=video_record.hls_manifest)
+
+@video.app_template_filter('format_duration')
+def format_duration(seconds):
+    """Format a duration in seconds as M:SS or H:MM:SS"""
+    if not seconds:
+        return ''
+    total = int(round(seconds))
+    hours, remainder = divmod(total, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
 @video.route('/videos')
 @video.route('/video/list')
 @login_required
@@ -403,8 +510,8 @@ def list_videos():
 @video.route('/video/<int:video_id>')
 def view(video_id):
     video = Video.query.get_or_404(video_id)
-    video.views += 1
-    db.session.commit()
+    view_buffer.record(video.id, viewer_type_for(current_user),
+                       current_user.id if current_user.is_authenticated else None)
 
     user_like = None
     if current_user.is_authenticated:
@@ -416,6 +523,44 @@ def view(video_id):
     can_edit = current_user.is_authenticated and video.user_id == current_user.id
     return render_template('video/view.html', video=video, user_like=user_like, can_edit=can_edit)
 
+@video.route('/video/<int:video_id>/status')
+@login_required
+def video_status(video_id):
+    """Report background processing status for a video"""
+    try:
+        video = Video.query.get_or_404(video_id)
+        if video.user_id != current_user.id:
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+        jobs = get_video_jobs(video_id)
+        return jsonify({
+            'success': True,
+            'video_id': video.id,
+            'status': video.status,
+            'jobs': [job.to_dict() for job in jobs],
+            'redirect_url': url_for('video.view', video_id=video.id)
+        })
+    except Exception as e:
+        logger.error(f"Error getting status for video {video_id}: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to get video status'}), 500
+
+@video.route('/video/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Report progress of a single background job, e.g. an edit render"""
+    try:
+        job = VideoJob.query.get_or_404(job_id)
+        if job.video.user_id != current_user.id:
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+
+        response = {'success': True, 'video_id': job.video_id, 'job': job.to_dict()}
+        if job.status == JOB_COMPLETED:
+            response['redirect_url'] = url_for('video.view', video_id=job.video_id)
+        return jsonify(response)
+    except Exception as e:
+        logger.error(f"Error getting status for job {job_id}: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to get job status'}), 500
+
 @video.route('/video/<int:video_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit(video_id):
@@ -454,118 +599,82 @@ def edit(video_id):
                     logger.error(f"JSON parsing error: {str(e)}")
                     return jsonify({'success': False, 'message': 'Invalid filter or overlay data'}), 400
 
-                # Get trim values with validation
+                # Edits always apply to the original upload, never to a previous render
+                original_filename = video.original_filename or video.filename
+                original_path = os.path.join(VIDEOS_DIR, original_filename)
+                if not os.path.exists(original_path):
+                    logger.error(f"Original video file not found: {original_path}")
+                    return jsonify({'success': False, 'message': 'Source video file not found'}), 404
+
+                source_duration = video.original_duration
+                if source_duration is None and video.filename == original_filename:
+                    source_duration = video.duration
+                elif source_duration is None:
+                    # Edited before original_duration was recorded: probe once and keep it
+                    original_metadata = probe_video(original_path)
+                    source_duration = original_metadata['duration'] if original_metadata else None
+                    video.original_duration = source_duration
+
+                # Get trim values with validation against the original's duration
                 try:
                     trim_start = float(request.form.get('trim_start', 0))
                     trim_end = float(request.form.get('trim_end', 0))
                     if trim_start < 0 or trim_end < 0:
                         raise ValueError("Trim values cannot be negative")
+                    if source_duration:
+                        if trim_end == 0 or trim_end > source_duration:
+                            trim_end = source_duration
+                        if trim_start >= trim_end:
+                            raise ValueError("Trim start must be before trim end")
+                    elif trim_end and trim_start >= trim_end:
+                        raise ValueError("Trim start must be before trim end")
                 except ValueError as e:
                     logger.error(f"Invalid trim values: {str(e)}")
                     return jsonify({'success': False, 'message': 'Invalid trim values'}), 400
 
-                # Create temporary directory for processing
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    input_path = os.path.join(VIDEOS_DIR, video.filename)
-                    if not os.path.exists(input_path):
-                        logger.error(f"Source video file not found: {input_path}")
-                        return jsonify({'success': False, 'message': 'Source video file not found'}), 404
-
-                    output_filename = f"edited_{video.filename}"
-                    output_path = os.path.join(temp_dir, output_filename)
-                    final_path = os.path.join(VIDEOS_DIR, output_filename)
-
-                    try:
-                        # Build filter complex string
-                        filter_complex = []
-
-                        # Apply trimming if specified
-                        if trim_start > 0 or trim_end > 0:
-                            logger.info(f"Applying trim: start={trim_start}, end={trim_end}")
-                            filter_complex.append(f"trim=start={trim_start}:end={trim_end},setpts=PTS-STARTPTS")
-
-                        # Apply filters if specified
-                        if filters:
-                            logger.info("Applying video filters")
-                            if 'brightness' in filters:
-                                brightness_value = float(filters['brightness']) / 100
-                                filter_complex.append(f"eq=brightness={brightness_value}")
-                            if 'contrast' in filters:
-                                contrast_value = float(filters['contrast']) / 100
-                                filter_complex.append(f"eq=contrast={contrast_value}")
-                            if 'saturation' in filters:
-                                saturation_value = float(filters['saturation']) / 100
-                                filter_complex.append(f"eq=saturation={saturation_value}")
-
-                        # Apply text overlay if specified
-                        if text_overlay and text_overlay.get('text'):
-                            logger.info("Applying text overlay")
-                            text = text_overlay.get('text', '').replace("'", "\\'")  # Escape single quotes
-                            color = text_overlay.get('color', 'white')
-                            position = text_overlay.get('position', 'center')
-
-                            # Convert position to FFmpeg coordinates
-                            position_map = {
-                                'top': 'x=(w-text_w)/2:y=h/10',
-                                'middle': 'x=(w-text_w)/2:y=(h-text_h)/2',
-                                'bottom': 'x=(w-text_w)/2:y=h-h/10'
-                            }
-
-                            overlay_position = position_map.get(position, position_map['middle'])
-                            filter_complex.append(
-                                f"drawtext=text='{text}':fontcolor={color}:fontsize=24:{overlay_position}:fontfile=/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-                            )
-
-                        # Create FFmpeg command
-                        stream = ffmpeg.input(input_path)
-
-                        if filter_complex:
-                            filter_str = ','.join(filter_complex)
-                            logger.info(f"Applying filter complex: {filter_str}")
-                            stream = stream.filter(filter_str)
-
-                        # Save the processed video
-                        stream = ffmpeg.output(stream, output_path, acodec='copy')
-                        logger.info("Running FFmpeg command")
-                        ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
-
-                        # Verify the output file exists and has content
-                        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                            raise Exception("Failed to generate output video")
-
-                        # Move the processed video to final location
-                        logger.info(f"Moving processed video to {final_path}")
-                        shutil.move(output_path, final_path)
-                        os.chmod(final_path, 0o644)
-
-                        # Update video record
-                        old_filename = video.filename
-                        video.filename = output_filename
-                        video.title = title
-                        video.description = description
-                        db.session.commit()
-
-                        # Delete old video file if different from new one
-                        if old_filename != output_filename:
-                            old_path = os.path.join(VIDEOS_DIR, old_filename)
-                            if os.path.exists(old_path):
-                                os.remove(old_path)
-                                logger.info(f"Deleted old video file: {old_path}")
-
-                        logger.info("Video update completed successfully")
-                        return jsonify({
-                            'success': True,
-                            'message': 'Video updated successfully!',
-                            'redirect_url': url_for('video.view', video_id=video.id)
-                        })
-
-                    except ffmpeg.Error as e:
-                        error_message = e.stderr.decode() if hasattr(e, 'stderr') else str(e)
-                        logger.error(f"FFmpeg error: {error_message}")
-                        return jsonify({
-                            'success': False,
-                            'message': 'Error processing video. Please try again.'
-                        }), 500
+                try:
+                    edl = normalize_edl(edit_spec(trim_start, trim_end, filters, text_overlay), source_duration)
+                except (TypeError, ValueError, AttributeError) as e:
+                    logger.error(f"Invalid edit values: {str(e)}")
+                    return jsonify({'success': False, 'message': 'Invalid filter or overlay data'}), 400
+
+                # Title, description and the EDL apply immediately; pixels are rendered in the background
+                if (video.title, video.description) != (title, description):
+                    mark_candidates_stale([video.user_id], in_transaction=True)
+                    Playlist.touch_containing(video.id)
+                video.title = title
+                video.description = description
+                video.original_filename = original_filename
+                video.edit_decisions = edl
+                target_filename = rendered_filename(original_filename, edl)
+
+                if video.filename == target_filename:
+                    db.session.commit()
+                    return jsonify({
+                        'success': True,
+                        'message': 'Video updated successfully!',
+                        'redirect_url': url_for('video.view', video_id=video.id)
+                    })
+
+                # Repeated or reverted edits are already on disk
+                if os.path.exists(os.path.join(VIDEOS_DIR, target_filename)):
+                    logger.info(f"Render cache hit for video {video.id}: {target_filename}")
+                    swap_rendered_file(video, target_filename, edl)
+                    return jsonify({
+                        'success': True,
+                        'message': 'Video updated successfully!',
+                        'redirect_url': url_for('video.view', video_id=video.id)
+                    })
+
+                job = enqueue_job(video.id, 'render', payload={'edl': edl})
+                logger.info(f"Queued render job {job.id} for video {video.id}")
+                return jsonify({
+                    'success': True,
+                    'message': 'Your edit is being rendered.',
+                    'job_id': job.id,
+                    'status_url': url_for('video.job_status', job_id=job.id),
+                    'redirect_url': url_for('video.view', video_id=video.id)
+                }), 202
 
             except Exception as e:
                 logger.error(f"Error updating video: {str(e)}")
@@ -641,15 +750,35 @@ def delete(video_id):
                 logger.warning(f"Thumbnail file not found: {thumbnail_path}")
                 file_deletion_errors.append("Thumbnail file not found")
 
+            # Remove resized variants and the seek-preview sprite
+            if video.thumbnail:
+                cleanup_files(*[os.path.join(THUMBNAILS_DIR, name)
+                                for name in all_thumbnail_files(video.thumbnail)
+                                if name != video.thumbnail])
+
+            # Remove the kept original upload, cached renders and the HLS ladder
+            if video.original_filename:
+                derived_files = {video.original_filename, rendered_filename(video.original_filename, None)}
+                derived_files.update(video.render_cache or [])
+                derived_files.discard(video.filename)
+                cleanup_files(*[os.path.join(VIDEOS_DIR, name) for name in derived_files])
+            remove_hls(video.hls_manifest)
+
         except OSError as e:
             logger.error(f"Error deleting video files: {str(e)}")
             file_deletion_errors.append(f"File system error: {str(e)}")
 
         # Delete video record
         try:
+            # Before the delete, while its playlist entries still exist
+            Playlist.touch_containing(video.id)
             db.session.delete(video)
             db.session.commit()
             session_lock = False
+            if video.thumbnail:
+                thumbnail_index.forget(video.thumbnail)
+            refresh_user_summary(video.user_id)
+            mark_candidates_stale([video.user_id])
             logger.info(f"Video record {video_id} deleted successfully")
 
             return jsonify({
@@ -695,29 +824,12 @@ def like(video_id):
         if current_user.user_type != 'jobseeker':
             return jsonify({'error': 'Only job seekers can like videos'}), 403
 
-        video = Video.query.get_or_404(video_id)
-        existing_like = VideoLike.query.filter_by(
-            user_id=current_user.id,
-            video_id=video_id
-        ).first()
-
-        if existing_like:
-            db.session.delete(existing_like)
-            video.likes = VideoLike.query.filter_by(video_id=video_id).count()
-            db.session.commit()
-            return jsonify({
-                'status': 'unliked',
-                'likes': video.likes
-            })
-        else:
-            new_like = VideoLike(user_id=current_user.id, video_id=video_id)
-            db.session.add(new_like)
-            video.likes = VideoLike.query.filter_by(video_id=video_id).count() + 1
-            db.session.commit()
-            return jsonify({
-                'status': 'liked',
-                'likes': video.likes
-            })
+        Video.query.get_or_404(video_id)
+        liked, likes = toggle_like(current_user.id, video_id)
+        return jsonify({
+            'status': 'liked' if liked else 'unliked',
+            'likes': likes
+        })
 
     except Exception as e:
         logger.error(f"Error processing like for video {video_id}: {str(e)}")
@@ -728,24 +840,23 @@ def like(video_id):
 def get_thumbnail(filename):
     """Get video thumbnail image"""
     try:
-        if os.path.exists(os.path.join(THUMBNAILS_DIR, filename)) and os.path.getsize(os.path.join(THUMBNAILS_DIR, filename)) > 0:
-            return send_from_directory(THUMBNAILS_DIR, filename)
-
-        video_filename = filename.replace('_thumb.jpg', '')
-        video_files = [f for f in os.listdir(VIDEOS_DIR) if f.startswith(video_filename.split('_')[0])]
-
-        if video_files:
-            video_path = os.path.join(VIDEOS_DIR, video_files[0])
-            thumbnail_path = os.path.join(THUMBNAILS_DIR, filename)
+        thumbnail_path = os.path.join(THUMBNAILS_DIR, filename)
+        if os.path.exists(thumbnail_path) and os.path.getsize(thumbnail_path) > 0:
+            # Thumbnails keep their name when regenerated after edits, so revalidate every use via the ETag
+            return send_media(THUMBNAILS_DIR, filename, max_age=0, immutable=False)
 
-            success = generate_thumbnail_at_timestamp(video_path, thumbnail_path, 1)
-            if success and os.path.exists(thumbnail_path) and os.path.getsize(thumbnail_path) > 0:
-                return send_from_directory(THUMBNAILS_DIR, filename)
+        # Missing file: queue regeneration in the background and answer immediately
+        video_id = thumbnail_index.lookup(filename)
+        if video_id is not None and thumbnail_index.should_regenerate(video_id):
+            enqueue_unique(video_id, 'thumbnail')
 
-        return send_from_directory('static', 'default-thumbnail.jpg')
+        response = send_from_directory('static', 'default-thumbnail.jpg')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
 
     except Exception as e:
         logger.error(f"Error serving thumbnail {filename}: {str(e)}")
+        db.session.rollback()
         return send_from_directory('static', 'default-thumbnail.jpg')
 
 @video.route('/video/preview/new', methods=['POST'])
@@ -788,16 +899,11 @@ def preview_new_route(): #Renamed to avoid conflict
         os.chmod(video_path, 0o644)
         logger.info("Video file saved successfully")
 
-        # Generate thumbnail
+        # Thumbnail is generated by the background worker
         thumbnail_filename = f"{filename.split('.')[0]}_thumb.jpg"
         thumbnail_path = os.path.join(THUMBNAILS_DIR, thumbnail_filename)
-        logger.info(f"Generating thumbnail at: {thumbnail_path}")
-
-        success, error = generate_thumbnail(video_path, thumbnail_path)
-        if not success:
-            logger.warning(f"Thumbnail generation warning: {error}")
 
-        # Create video record
+        # Create video record and queue thumbnail/probe work
         new_video = Video(
             title=title if title else 'Recorded Video',
             description=description if description else '',
@@ -808,14 +914,12 @@ def preview_new_route(): #Renamed to avoid conflict
         )
 
         db.session.add(new_video)
-        db.session.commit()
+        enqueue_ingest(new_video)
+        refresh_user_summary(new_video.user_id)
+        mark_candidates_stale([new_video.user_id])
         logger.info(f"Video record created successfully with ID: {new_video.id}")
 
-        return jsonify({
-            'success': True,
-            'video_id': new_video.id,
-            'redirect_url': url_for('video.view', video_id=new_video.id)
-        })
+        return processing_response(new_video)
 
     except Exception as e:
         logger.error(f"Error handling video preview: {str(e)}")
@@ -903,14 +1007,11 @@ def upload_new():
             os.chmod(video_path, 0o644)
             logger.info(f"Video file saved successfully: {video_path}")
 
-            # Generate thumbnail
+            # Thumbnail is generated by the background worker
             thumbnail_filename = f"{filename.split('.')[0]}_thumb.jpg"
             thumbnail_path = os.path.join(THUMBNAILS_DIR, thumbnail_filename)
-            success, error = generate_thumbnail(video_path, thumbnail_path)
-            if not success:
-                logger.warning(f"Thumbnail generation warning: {error}")
 
-            # Create video record
+            # Create video record and queue thumbnail/probe work
             new_video = Video(
                 title=title,
                 description=description,
@@ -920,14 +1021,12 @@ def upload_new():
                 script_content=script_content if script_content else None
             )
             db.session.add(new_video)
-            db.session.commit()
+            enqueue_ingest(new_video)
+            refresh_user_summary(new_video.user_id)
+            mark_candidates_stale([new_video.user_id])
             logger.info(f"Video record created successfully: {new_video.id}")
 
-            return jsonify({
-                'success': True,
-                'message': 'Video uploaded successfully!',
-                'redirect_url': url_for('video.view', video_id=new_video.id)
-            })
+            return processing_response(new_video)
 
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
@@ -947,6 +1046,268 @@ def upload_new():
             'error': 'An unexpected error occurred. Please try again.'
         }), 500
 
+@video.route('/video/uploads', methods=['POST'])
+@login_required
+def create_chunked_upload():
+    """Start a resumable chunked upload and return its id"""
+    try:
+        if current_user.user_type != 'jobseeker':
+            return jsonify({
+                'success': False,
+                'message': 'Access denied. This page is only for job seekers.'
+            }), 403
+
+        if not ensure_directory_permissions():
+            logger.error("Failed to set directory permissions")
+            return jsonify({
+                'success': False,
+                'message': 'Server configuration error. Please try again later.'
+            }), 500
+
+        data = request.get_json(silent=True) or request.form
+        original_filename = (data.get('filename') or '').strip()
+        title = (data.get('title') or '').strip()
+        description = (data.get('description') or '').strip()
+        script_content = (data.get('script_content') or '').strip()
+
+        try:
+            total_size = int(data.get('size', 0))
+        except (TypeError, ValueError):
+            total_size = 0
+
+        if not original_filename or not allowed_file(original_filename):
+            return jsonify({
+                'success': False,
+                'message': f'Invalid file type. Allowed types are: {", ".join(ALLOWED_EXTENSIONS)}'
+            }), 400
+
+        if total_size <= 0 or total_size > MAX_FILE_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'File size must be between 1 byte and {MAX_FILE_SIZE // (1024 * 1024)}MB'
+            }), 400
+
+        if not title:
+            return jsonify({
+                'success': False,
+                'message': 'Title is required'
+            }), 400
+
+        upload_id = str(uuid.uuid4())
+        filename = secure_filename(f"{upload_id}_{original_filename}")
+
+        # Create the empty destination file that chunks are appended to
+        partial_path = os.path.join(VIDEOS_DIR, f"{filename}.part")
+        open(partial_path, 'wb').close()
+        os.chmod(partial_path, 0o644)
+
+        upload_record = VideoUpload(
+            id=upload_id,
+            user_id=current_user.id,
+            filename=filename,
+            original_filename=original_filename,
+            total_size=total_size,
+            offset=0,
+            title=title,
+            description=description,
+            script_content=script_content if script_content else None,
+            expires_at=datetime.utcnow() + UPLOAD_EXPIRY
+        )
+        db.session.add(upload_record)
+        db.session.commit()
+        logger.info(f"Started chunked upload {upload_id} ({total_size} bytes) for user {current_user.id}")
+
+        return jsonify({
+            'success': True,
+            'upload_id': upload_id,
+            'offset': 0,
+            'chunk_size': UPLOAD_CHUNK_SIZE,
+            'upload_url': url_for('video.chunked_upload', upload_id=upload_id)
+        }), 201
+
+    except Exception as e:
+        logger.error(f"Error creating chunked upload: {str(e)}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'Failed to start upload'
+        }), 500
+
+@video.route('/video/uploads/<upload_id>', methods=['GET', 'HEAD', 'PATCH'])
+@login_required
+def chunked_upload(upload_id):
+    """Report the current offset of, or append a chunk to, a resumable upload.
+
+    No row lock is held while a chunk streams in. Writers to one upload are
+    serialized by a lock on its .part file; the committed offset is checked
+    again once that lock is held, before the file is touched, and advanced
+    under a row lock once the chunk is on disk.
+    """
+    try:
+        upload_record = VideoUpload.query.filter_by(id=upload_id, user_id=current_user.id).first()
+        if upload_record is None:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Upload not found'}), 404
+
+        if request.method in ('GET', 'HEAD'):
+            response = upload_status_response(upload_record)
+            db.session.rollback()
+            return response
+
+        if upload_record.status == 'completed':
+            response = upload_status_response(upload_record)
+            db.session.rollback()
+            return response
+
+        try:
+            client_offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Upload-Offset header is required'}), 400
+
+        if client_offset != upload_record.offset:
+            # Client is out of sync; tell it where to resume from
+            response = upload_status_response(upload_record, status_code=409)
+            db.session.rollback()
+            return response
+
+        partial_path = os.path.join(VIDEOS_DIR, f"{upload_record.filename}.part")
+        remaining = upload_record.total_size - upload_record.offset
+        # End the read transaction so no connection is held while the body streams
+        db.session.rollback()
+        try:
+            destination = open(partial_path, 'r+b')
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Upload data is missing, please restart'}), 410
+
+        with destination:
+            try:
+                fcntl.flock(destination.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another request is appending to this upload right now
+                return upload_status_response(upload_record, status_code=409)
+
+            # A chunk may have been committed since the offset was checked; the
+            # file must not be truncated unless it still ends at client_offset
+            upload_record = VideoUpload.query.filter_by(id=upload_id, user_id=current_user.id)\
+                .populate_existing().first()
+            if upload_record is None:
+                db.session.rollback()
+                return jsonify({'success': False, 'message': 'Upload not found'}), 404
+            if upload_record.status == 'completed' or upload_record.offset != client_offset:
+                response = upload_status_response(upload_record, status_code=409)
+                db.session.rollback()
+                return response
+            db.session.rollback()
+
+            written = append_upload_chunk(destination, client_offset, remaining)
+
+            upload_record = VideoUpload.query.filter_by(id=upload_id, user_id=current_user.id)\
+                .with_for_update().populate_existing().first()
+            if upload_record is None or upload_record.offset != client_offset:
+                db.session.rollback()
+                if upload_record is None:
+                    return jsonify({'success': False, 'message': 'Upload not found'}), 404
+                return upload_status_response(upload_record, status_code=409)
+            upload_record.offset += written
+            upload_record.expires_at = datetime.utcnow() + UPLOAD_EXPIRY
+            db.session.commit()
+
+        if upload_record.offset < upload_record.total_size:
+            return upload_status_response(upload_record)
+
+        return finalize_chunked_upload(upload_record)
+
+    except Exception as e:
+        logger.error(f"Error handling chunked upload {upload_id}: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'An error occurred during upload'}), 500
+
+def append_upload_chunk(destination, offset, max_bytes):
+    """Stream the request body onto the open partial file at offset without buffering it"""
+    written = 0
+    # Discard any bytes past the last committed offset from an interrupted chunk
+    destination.truncate(offset)
+    destination.seek(offset)
+    try:
+        while written < max_bytes:
+            block = request.stream.read(min(STREAM_BUFFER_SIZE, max_bytes - written))
+            if not block:
+                break
+            destination.write(block)
+            written += len(block)
+    except ClientDisconnected:
+        logger.warning(f"Client disconnected mid-chunk after {written} bytes: {destination.name}")
+    destination.flush()
+    os.fsync(destination.fileno())
+    return written
+
+def expire_uploads():
+    """Periodic task: remove uploads idle past their expiry, with any .part file left behind"""
+    expired = VideoUpload.query.filter(VideoUpload.expires_at < datetime.utcnow())\
+        .order_by(VideoUpload.expires_at).limit(UPLOAD_CLEANUP_BATCH).all()
+    if not expired:
+        return 0
+    cleanup_files(*[os.path.join(VIDEOS_DIR, f"{upload.filename}.part")
+                    for upload in expired if upload.status != 'completed'])
+    VideoUpload.query.filter(VideoUpload.id.in_([upload.id for upload in expired]))\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    logger.info(f"Expired {len(expired)} chunked uploads")
+    return len(expired)
+
+def upload_status_response(upload_record, status_code=200):
+    """Build the offset response for a chunked upload"""
+    payload = {
+        'success': status_code < 400,
+        'upload_id': upload_record.id,
+        'offset': upload_record.offset,
+        'size': upload_record.total_size,
+        'status': upload_record.status,
+        'video_id': upload_record.video_id
+    }
+    if upload_record.video_id:
+        payload['status_url'] = url_for('video.video_status', video_id=upload_record.video_id)
+        payload['redirect_url'] = url_for('video.view', video_id=upload_record.video_id)
+    response = jsonify(payload)
+    response.status_code = status_code
+    response.headers['Upload-Offset'] = str(upload_record.offset)
+    response.headers['Upload-Length'] = str(upload_record.total_size)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def finalize_chunked_upload(upload_record):
+    """Move a completed upload into place and hand it to the ingest pipeline"""
+    partial_path = os.path.join(VIDEOS_DIR, f"{upload_record.filename}.part")
+    video_path = os.path.join(VIDEOS_DIR, upload_record.filename)
+    os.replace(partial_path, video_path)
+    logger.info(f"Chunked upload {upload_record.id} complete: {video_path}")
+
+    try:
+        new_video = Video(
+            title=upload_record.title,
+            description=upload_record.description,
+            filename=upload_record.filename,
+            thumbnail=f"{upload_record.filename.split('.')[0]}_thumb.jpg",
+            user_id=upload_record.user_id,
+            script_content=upload_record.script_content
+        )
+        db.session.add(new_video)
+        db.session.flush()
+
+        upload_record.status = 'completed'
+        upload_record.video_id = new_video.id
+        enqueue_ingest(new_video)
+        refresh_user_summary(new_video.user_id)
+        mark_candidates_stale([new_video.user_id])
+        logger.info(f"Video record created successfully: {new_video.id}")
+
+        return processing_response(new_video)
+    except Exception:
+        # Keep the data so a retry of the final chunk can finalize again
+        os.replace(video_path, partial_path)
+        raise
+
 def cleanup_files(*file_paths):
     """Helper function to clean up files"""
     for path in file_paths:
@@ -960,13 +1321,31 @@ def cleanup_files(*file_paths):
 @video.route('/static/uploads/videos/<path:filename>')
 def serve_video(filename):
     """Serve video files from the uploads directory"""
-    logger.info(f"Serving video file: {filename}")
     try:
-        return send_from_directory(VIDEOS_DIR, filename)
+        if filename.endswith('.part'):
+            raise NotFound()
+        # Video filenames are uuid-prefixed and never rewritten in place
+        return send_media(VIDEOS_DIR, filename, max_age=ONE_YEAR, immutable=True)
+    except NotFound:
+        return "Video not found", 404
     except Exception as e:
         logger.error(f"Error serving video file {filename}: {str(e)}")
         return "Video not found", 404
 
+@video.route('/static/uploads/hls/<path:filename>')
+def serve_hls(filename):
+    """Serve HLS playlists and segments"""
+    try:
+        # Segments never change once written; playlists are replaced on re-packaging
+        if filename.endswith('.ts'):
+            return send_media(HLS_DIR, filename, max_age=ONE_YEAR, immutable=True)
+        return send_media(HLS_DIR, filename, max_age=60, immutable=False)
+    except NotFound:
+        return "Stream not found", 404
+    except Exception as e:
+        logger.error(f"Error serving HLS file {filename}: {str(e)}")
+        return "Stream not found", 404
+
 @video.route('/csrf-token')
 def get_csrf_token():
     """Generate and return a new CSRF token"""
@@ -1010,34 +1389,23 @@ def suggest_video_tags(video_id):
             logger.error(f"OpenAI API error: {str(e)}")
             return jsonify({'status': 'error', 'message': 'Failed to generate suggestions'}), 500
 
-        suggested_tags = []
-        existing_tags = {tag.name.lower() for tag in video.tags}
-
-        for tag_data in tags_data:
-            if not isinstance(tag_data, dict) or 'name' not in tag_data or 'type' not in tag_data:
-                continue
-
-            tag_name = tag_data['name'].lower()
-            if tag_name not in existing_tags:
-                tag = Tag.query.filter_by(name=tag_name).first()
-                if not tag:
-                    tag = Tag(name=tag_name, type=tag_data['type'])
-                    db.session.add(tag)
-                    db.session.flush()
-
-                video_tag = VideoTag(
-                    video_id=video.id,
-                    tag_id=tag.id,
-                    ai_suggested=True
-                )
-                db.session.add(video_tag)
-                suggested_tags.append({
-                    'name': tag_name,
-                    'type': tag_data['type']
-                })
+        # Resolve every suggestion in one upsert, then attach only the tags the video lacks
+        types = {
+            normalize_tag_name(tag_data['name']): tag_data['type'] for tag_data in tags_data
+            if isinstance(tag_data, dict) and 'name' in tag_data and 'type' in tag_data
+        }
+        types.pop(None, None)
+        changes = TagChanges()
+        tag_ids = resolve_tags(types, changes)
+        added = add_tags(VideoTag, video.id, tag_ids.values(), changes, ai_suggested=True)
+        suggested_tags = [
+            {'name': name, 'type': types[name]}
+            for name, tag_id in tag_ids.items() if tag_id in added
+        ]
 
         if suggested_tags:
             db.session.commit()
+            publish(changes)
             logger.info(f"Added {len(suggested_tags)} suggested tags to video {video_id}")
             return jsonify({
                 'status': 'success',
@@ -1063,19 +1431,10 @@ def update_video_tags(video_id):
         tag_ids = request.json.get('tag_ids', [])
         logger.info(f"Updating tags for video {video_id} with tags: {tag_ids}")
 
-        # Remove existing tags
-        VideoTag.query.filter_by(video_id=video.id).delete()
-
-        # Add new tags
-        for tag_id in tag_ids:
-            video_tag = VideoTag(
-                video_id=video.id,
-                tag_id=tag_id,
-                ai_suggested=False
-            )
-            db.session.add(video_tag)
-
+        # Insert only added and delete only removed associations
+        changes = replace_tags(VideoTag, video.id, tag_ids, ai_suggested=False)
         db.session.commit()
+        publish(changes)
         logger.info(f"Updated tags for video {video_id}")
         return jsonify({'status': 'success', 'message': 'Tags updated successfully'})
 
@@ -1133,25 +1492,25 @@ def add_tag():
                 'message': 'Tag name is required'
             }), 400
 
-        # Check if tag already exists
-        existing_tag = Tag.query.filter_by(name=tag_name).first()
-        if existing_tag:
+        # Create the tag unless it already exists, in one statement
+        changes = TagChanges()
+        resolve_tags({tag_name: tag_type}, changes)
+        if not changes.created:
             return jsonify({
                 'success': False,
                 'message': 'Tag already exists'
             }), 400
 
-        # Create new tag
-        new_tag = Tag(name=tag_name, type=tag_type)
-        db.session.add(new_tag)
         db.session.commit()
+        publish(changes)
+        new_tag = changes.created[0]
 
         return jsonify({
             'success': True,
             'tag': {
-                'id': new_tag.id,
-                'name': new_tag.name,
-                'type': new_tag.type
+                'id': new_tag['id'],
+                'name': new_tag['name'],
+                'type': new_tag['type']
             }
         })
 
@@ -1175,13 +1534,13 @@ def search_tags():
                 'tags': []
             })
 
-        tags = Tag.query.filter(Tag.name.ilike(f'%{query}%')).all()
+        tags = tag_index.autocomplete(query)
         return jsonify({
             'status': 'success',
             'tags': [{
-                'id': tag.id,
-                'name': tag.name,
-                'type': tag.type
+                'id': tag['id'],
+                'name': tag['name'],
+                'type': tag['type']
             } for tag in tags]
         })
 
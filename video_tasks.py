@@ -0,0 +1,206 @@
+"""Background job handlers for the video ingest pipeline"""
+import logging
+import os
+
+import ffmpeg
+
+from extensions import db
+from job_queue import job_handler, enqueue_unique, update_job_progress, JobError
+from models import Playlist, Video
+from video import (VIDEOS_DIR, THUMBNAILS_DIR, validate_video_format, probe_video,
+                   apply_video_metadata, generate_thumbnail, thumbnail_timestamp, cleanup_files,
+                   swap_rendered_file)
+from thumbnails import generate_thumbnail_set, sprite_vtt_filename
+from hls import package_hls, remove_hls
+from render import BROWSER_PLAYABLE_EXTENSIONS, edit_spec, edl_hash, render_edit, rendered_filename
+
+logger = logging.getLogger(__name__)
+
+
+def _get_video(job):
+    video = Video.query.get(job.video_id)
+    if video is None:
+        raise JobError(f"Video {job.video_id} no longer exists")
+    return video
+
+
+def _video_path(video):
+    path = os.path.join(VIDEOS_DIR, video.filename)
+    if not os.path.exists(path):
+        raise JobError(f"Source video file not found: {path}")
+    return path
+
+
+@job_handler('probe')
+def probe_job(job):
+    """Probe the file once and store its metadata on the video record"""
+    video = _get_video(job)
+    is_valid, error, metadata = validate_video_format(_video_path(video))
+    if not is_valid:
+        raise JobError(error or "Invalid video file")
+
+    apply_video_metadata(video, metadata)
+    if not video.original_filename:
+        video.original_filename = video.filename
+    if video.filename == video.original_filename:
+        video.original_duration = metadata.get('duration')
+    db.session.commit()
+    return metadata
+
+
+@job_handler('thumbnail')
+def thumbnail_job(job):
+    """Generate all thumbnail sizes and the seek-preview sprite in one ffmpeg pass"""
+    video = _get_video(job)
+    if not video.thumbnail:
+        video.thumbnail = f"{video.filename.split('.')[0]}_thumb.jpg"
+        db.session.commit()
+
+    video_path = _video_path(video)
+    try:
+        widths = generate_thumbnail_set(
+            video_path, THUMBNAILS_DIR, video.thumbnail,
+            timestamp=thumbnail_timestamp(video.duration),
+            duration=video.duration, width=video.width, height=video.height
+        )
+    except Exception as e:
+        error_message = e.stderr.decode() if getattr(e, 'stderr', None) else str(e)
+        logger.warning(f"Thumbnail set generation failed for video {video.id}: {error_message}")
+        success, error = generate_thumbnail(video_path, os.path.join(THUMBNAILS_DIR, video.thumbnail),
+                                            duration=video.duration)
+        video.thumbnail_variants = None
+        video.preview_vtt = None
+        Playlist.touch_containing(video.id)
+        db.session.commit()
+        return {'thumbnail': video.thumbnail, 'fallback': not success}
+
+    vtt_filename = sprite_vtt_filename(video.thumbnail)
+    video.thumbnail_variants = widths
+    video.preview_vtt = vtt_filename if os.path.exists(os.path.join(THUMBNAILS_DIR, vtt_filename)) else None
+    Playlist.touch_containing(video.id)
+    db.session.commit()
+    return {'thumbnail': video.thumbnail, 'widths': widths, 'preview_vtt': video.preview_vtt}
+
+
+@job_handler('transcode')
+def transcode_job(job):
+    """Re-encode containers browsers cannot play into H.264/AAC MP4"""
+    video = _get_video(job)
+    input_path = _video_path(video)
+    extension = video.filename.rsplit('.', 1)[-1].lower()
+    if extension in BROWSER_PLAYABLE_EXTENSIONS:
+        enqueue_unique(video.id, 'package')
+        return {'skipped': True, 'filename': video.filename}
+
+    output_filename = f"{video.filename.rsplit('.', 1)[0]}.mp4"
+    output_path = os.path.join(VIDEOS_DIR, output_filename)
+    temp_path = f"{output_path}.part"
+
+    try:
+        stream = ffmpeg.input(input_path)
+        stream = ffmpeg.output(stream, temp_path, format='mp4', vcodec='libx264',
+                               acodec='aac', preset='veryfast', movflags='+faststart')
+        ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+    except ffmpeg.Error as e:
+        cleanup_files(temp_path)
+        error_message = e.stderr.decode() if e.stderr else str(e)
+        raise JobError(f"Transcode failed: {error_message}")
+
+    os.replace(temp_path, output_path)
+    os.chmod(output_path, 0o644)
+
+    # The uploaded file stays on disk as the original for future re-encodes
+    if not video.original_filename:
+        video.original_filename = video.filename
+    video.filename = output_filename
+    metadata = probe_video(output_path)
+    if metadata:
+        apply_video_metadata(video, metadata)
+        # A container re-encode keeps the original's length
+        if video.original_duration is None:
+            video.original_duration = metadata.get('duration')
+    db.session.commit()
+    enqueue_unique(video.id, 'package')
+    logger.info(f"Transcoded video {video.id} to {output_filename}")
+    return {'skipped': False, 'filename': output_filename}
+
+
+@job_handler('package')
+def package_job(job):
+    """Package the playable file into an adaptive bitrate HLS ladder"""
+    video = _get_video(job)
+    video_path = _video_path(video)
+    metadata = probe_video(video_path)
+    if not metadata:
+        raise JobError("No video stream found in the file")
+
+    try:
+        manifest = package_hls(video_path, video.filename,
+                               source_height=metadata['height'], has_audio=metadata['has_audio'])
+    except RuntimeError as e:
+        raise JobError(str(e))
+
+    previous = video.hls_manifest
+    video.hls_manifest = manifest
+    db.session.commit()
+    if previous and previous != manifest:
+        remove_hls(previous)
+    logger.info(f"Packaged video {video.id} as {manifest}")
+    return {'hls_manifest': manifest}
+
+
+@job_handler('render')
+def render_job(job):
+    """Render a video's EDL from the original upload and swap it in once complete"""
+    video = _get_video(job)
+    if 'edl' not in (job.payload or {}):
+        raise JobError("Render job has no edit decision list")
+    edl = job.payload['edl']
+
+    # A newer edit replaced this one while it was queued; nothing to render
+    if edl_hash(edl) != edl_hash(video.edit_decisions):
+        return {'superseded': True}
+
+    original_filename = video.original_filename or video.filename
+    input_path = os.path.join(VIDEOS_DIR, original_filename)
+    if not os.path.exists(input_path):
+        raise JobError(f"Original video file not found: {input_path}")
+
+    output_filename = rendered_filename(original_filename, edl)
+    output_path = os.path.join(VIDEOS_DIR, output_filename)
+    mode = 'cached'
+
+    if not os.path.exists(output_path):
+        metadata = probe_video(input_path)
+        if not metadata:
+            raise JobError("No video stream found in the file")
+
+        temp_path = f"{output_path}.part"
+        extension = output_filename.rsplit('.', 1)[-1]
+        try:
+            # An empty EDL only converts the original into a playable container
+            mode = render_edit(input_path, temp_path, extension, edl or edit_spec(),
+                               duration=metadata['duration'], has_audio=metadata['has_audio'],
+                               on_progress=lambda progress: update_job_progress(job, progress))
+        except ffmpeg.Error as e:
+            cleanup_files(temp_path)
+            error_message = e.stderr.decode(errors='replace') if e.stderr else str(e)
+            raise JobError(f"Render failed: {error_message[-2000:]}")
+
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            cleanup_files(temp_path)
+            raise JobError("Render produced no output")
+
+        os.replace(temp_path, output_path)
+        os.chmod(output_path, 0o644)
+
+    # Swap only if this is still the video's current EDL; otherwise the render just stays cached.
+    # populate_existing reloads the locked row over the instance read at the start of the job.
+    video = Video.query.filter_by(id=job.video_id).with_for_update().populate_existing().first()
+    if video is None or edl_hash(edl) != edl_hash(video.edit_decisions):
+        db.session.rollback()
+        return {'filename': output_filename, 'mode': mode, 'superseded': True}
+    swap_rendered_file(video, output_filename, edl)
+
+    logger.info(f"Rendered edit for video {video.id} to {output_filename} ({mode})")
+    return {'filename': output_filename, 'mode': mode}
@@ -0,0 +1,86 @@
+"""Worker process pool for the background video job queue.
+
+Usage: python video_worker.py [--processes N] [--poll-interval SECONDS]
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import sys
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(processName)s] - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(poll_interval, stop_event, run_maintenance=False):
+    """Entry point for a single worker process"""
+    from app import create_app
+    from job_queue import worker_loop
+    from counters import RECONCILE_INTERVAL, reconcile_like_counts
+    from view_stats import ROLLUP_INTERVAL, roll_up_views
+    from candidate_embeddings import EMBEDDING_REFRESH_INTERVAL
+    from ai_matching import refit_matching_model, refresh_candidate_embeddings, sync_candidate_index
+    from candidate_index import INDEX_SYNC_INTERVAL
+    from matching_model import MODEL_REFIT_TICK
+    from video import UPLOAD_CLEANUP_INTERVAL, expire_uploads
+    import video_tasks  # noqa: F401 - registers job handlers
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    app = create_app()
+    # Only one worker runs maintenance so it is not repeated per process
+    periodic_tasks = [
+        (RECONCILE_INTERVAL, reconcile_like_counts),
+        (ROLLUP_INTERVAL, roll_up_views),
+        (EMBEDDING_REFRESH_INTERVAL, refresh_candidate_embeddings),
+        (MODEL_REFIT_TICK, refit_matching_model),
+        (INDEX_SYNC_INTERVAL, sync_candidate_index),
+        (UPLOAD_CLEANUP_INTERVAL, expire_uploads),
+    ] if run_maintenance else None
+    with app.app_context():
+        processed = worker_loop(poll_interval=poll_interval, stop_event=stop_event,
+                                periodic_tasks=periodic_tasks)
+        logger.info(f"Worker exiting after {processed} jobs")
+
+
+def start_worker_pool(processes=2, poll_interval=2.0):
+    """Start worker processes and return them with their shared stop event"""
+    stop_event = multiprocessing.Event()
+    workers = []
+    for index in range(processes):
+        worker = multiprocessing.Process(
+            target=_worker_main,
+            args=(poll_interval, stop_event, index == 0),
+            name=f"video-worker-{index + 1}"
+        )
+        worker.start()
+        workers.append(worker)
+    logger.info(f"Started {processes} video workers")
+    return workers, stop_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background video processing workers')
+    parser.add_argument('--processes', type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    args = parser.parse_args()
+
+    workers, stop_event = start_worker_pool(args.processes, args.poll_interval)
+
+    def shutdown(signum, frame):
+        logger.info("Shutting down video workers...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for worker in workers:
+        worker.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Video view rollups and the analytics reads built on them.
+
+Views are appended to ``video_view_event`` by the view buffer in
+``counters.py``. ``roll_up_views`` runs periodically in the video worker.
+It folds new events into ``video_daily_stats`` incrementally, past a
+watermark event id. Once a day it also rebuilds finished days' rows from
+the raw events, which picks up any event whose id committed after the
+watermark had passed it. Every day since the last rebuilt one is covered,
+so days that ended while the worker was down are rebuilt too. Dashboard reads then only touch ``video_daily_stats`` through
+its (owner_id, day) index.
+
+``dashboard_stats`` gathers every figure on the analytics dashboard in two
+statements and caches the result per user for a short TTL; like and view
+writes invalidate the owner's entry. The cache is shared through Redis when
+``CACHE_REDIS_URL`` is set, so an invalidation reaches every app process;
+without it each process only drops its own entry and others may lag by up
+to DASHBOARD_CACHE_TTL.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from sqlalchemy import func, text
+
+from cache import make_cache
+from extensions import db
+from models import StatsRollupState, Video, VideoDailyStats, VideoViewEvent
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = 'video_views'
+ROLLUP_INTERVAL = 5 * 60  # seconds between incremental rollups
+ROLLUP_LAG = timedelta(seconds=30)  # let in-flight inserts commit before rolling past them
+REBUILD_DAYS_PER_RUN = 7  # catch-up after downtime continues on the next run
+DASHBOARD_DAYS = 30
+DASHBOARD_TOP_VIDEOS = 5
+DASHBOARD_CACHE_TTL = 60  # seconds
+
+dashboard_cache = make_cache('dashboard', ttl=DASHBOARD_CACHE_TTL, max_entries=2048)
+
+_UPSERT_DAILY_STATS = '''
+    INSERT INTO video_daily_stats (video_id, day, owner_id, views, employer_views)
+    SELECT video_view_event.video_id,
+           CAST(video_view_event.viewed_at AS DATE),
+           video.user_id,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE video_view_event.viewer_type = 'employer')
+    FROM video_view_event
+    JOIN video ON video.id = video_view_event.video_id
+    WHERE {condition}
+    GROUP BY video_view_event.video_id, CAST(video_view_event.viewed_at AS DATE), video.user_id
+    ON CONFLICT (video_id, day) DO UPDATE
+    SET views = video_daily_stats.views + EXCLUDED.views,
+        employer_views = video_daily_stats.employer_views + EXCLUDED.employer_views
+'''
+
+
+def viewer_type_for(user) -> str:
+    """Classify a viewer for the employer/job seeker split"""
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    return str(user.user_type)
+
+
+def _rollup_state() -> StatsRollupState:
+    """Lock (creating if needed) the rollup watermark row for this transaction"""
+    state = StatsRollupState.query.filter_by(name=ROLLUP_NAME).with_for_update().first()
+    if state is None:
+        state = StatsRollupState(name=ROLLUP_NAME, last_event_id=0)
+        db.session.add(state)
+        db.session.flush()
+    return state
+
+
+def _roll_up_increment(state: StatsRollupState) -> int:
+    cutoff = datetime.utcnow() - ROLLUP_LAG
+    upper = db.session.query(func.max(VideoViewEvent.id)).filter(
+        VideoViewEvent.id > state.last_event_id,
+        VideoViewEvent.viewed_at < cutoff
+    ).scalar()
+    if upper is None:
+        return 0
+
+    result = db.session.execute(
+        text(_UPSERT_DAILY_STATS.format(
+            condition='video_view_event.id > :lower AND video_view_event.id <= :upper'
+        )),
+        {'lower': state.last_event_id, 'upper': upper}
+    )
+    state.last_event_id = upper
+    return result.rowcount
+
+
+def _rebuild_day(state: StatsRollupState, day) -> None:
+    """Recompute one day's rows from raw events up to the current watermark"""
+    VideoDailyStats.query.filter_by(day=day).delete(synchronize_session=False)
+    db.session.execute(
+        text(_UPSERT_DAILY_STATS.format(
+            condition='video_view_event.viewed_at >= :start AND video_view_event.viewed_at < :end '
+                      'AND video_view_event.id <= :upper'
+        )),
+        {'start': day, 'end': day + timedelta(days=1), 'upper': state.last_event_id}
+    )
+    state.last_rebuilt_day = day
+
+
+def roll_up_views() -> int:
+    """Fold new view events into video_daily_stats; returns daily rows touched"""
+    try:
+        state = _rollup_state()
+        touched = _roll_up_increment(state)
+
+        yesterday = datetime.utcnow().date() - timedelta(days=1)
+        day = yesterday if state.last_rebuilt_day is None else state.last_rebuilt_day + timedelta(days=1)
+        rebuilt = 0
+        while day <= yesterday and rebuilt < REBUILD_DAYS_PER_RUN:
+            _rebuild_day(state, day)
+            logger.info(f"Rebuilt daily view stats for {day}")
+            day += timedelta(days=1)
+            rebuilt += 1
+
+        db.session.commit()
+        return touched
+    except Exception as e:
+        logger.error(f"Error rolling up view events: {str(e)}")
+        db.session.rollback()
+        return 0
+
+
+def _fill_days(views_by_day: Dict, start, days: int) -> List[Dict]:
+    return [
+        {'date': day.strftime('%Y-%m-%d'), 'views': views_by_day.get(day.strftime('%Y-%m-%d'), 0)}
+        for day in (start + timedelta(days=offset) for offset in range(days))
+    ]
+
+
+def _load_dashboard_stats(owner_id: int, days: int) -> Dict:
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    # Every scalar plus the daily series in a single round trip
+    row = db.session.execute(text('''
+        SELECT
+            (SELECT COALESCE(SUM(views), 0) FROM video WHERE user_id = :owner_id) AS total_views,
+            (SELECT COALESCE(SUM(likes), 0) FROM video WHERE user_id = :owner_id) AS total_likes,
+            (SELECT COALESCE(SUM(employer_views), 0) FROM video_daily_stats
+             WHERE owner_id = :owner_id) AS employer_views,
+            (SELECT COUNT(*) FROM bookmark_candidate WHERE jobseeker_id = :owner_id) AS employer_bookmarks,
+            (SELECT json_agg(json_build_array(to_char(day, 'YYYY-MM-DD'), views))
+             FROM (
+                 SELECT day, SUM(views) AS views
+                 FROM video_daily_stats
+                 WHERE owner_id = :owner_id AND day >= :start
+                 GROUP BY day
+             ) AS daily) AS daily
+    '''), {'owner_id': owner_id, 'start': start}).mappings().one()
+
+    # Plain JSON-safe dicts so the result can outlive the session and sit in a shared cache
+    top_videos = [
+        {**video._asdict(), 'created_at': video.created_at.isoformat() if video.created_at else None}
+        for video in db.session.query(
+            Video.id, Video.title, Video.views, Video.likes, Video.created_at
+        ).filter(
+            Video.user_id == owner_id
+        ).order_by(Video.views.desc()).limit(DASHBOARD_TOP_VIDEOS).all()
+    ]
+
+    views_by_day = {day: int(views or 0) for day, views in (row['daily'] or [])}
+    return {
+        'total_views': int(row['total_views']),
+        'total_likes': int(row['total_likes']),
+        'employer_views': int(row['employer_views']),
+        'employer_bookmarks': int(row['employer_bookmarks']),
+        'daily_views': _fill_days(views_by_day, start, days),
+        'top_videos': top_videos,
+    }
+
+
+def dashboard_stats(owner_id: int, days: int = DASHBOARD_DAYS) -> Dict:
+    """All analytics dashboard figures for a user, cached for DASHBOARD_CACHE_TTL seconds"""
+    stats = dashboard_cache.get_or_set((owner_id, days), lambda: _load_dashboard_stats(owner_id, days))
+    top_videos = [
+        {**video, 'created_at': datetime.fromisoformat(video['created_at']) if video['created_at'] else None}
+        for video in stats['top_videos']
+    ]
+    return {**stats, 'top_videos': top_videos}
+
+
+def invalidate_dashboard_stats(owner_ids: Iterable[int]) -> None:
+    """Drop cached dashboard figures after likes or views change"""
+    for owner_id in set(owner_ids):
+        dashboard_cache.delete((owner_id, DASHBOARD_DAYS))